@@ -0,0 +1,187 @@
+"""
+Дайджесты подразделений: прошлая неделя против прогноза, пиковые часы,
+доля ФОТ и динамика отзывов, посчитанные заранее
+"""
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from uuid import UUID
+from fastapi import APIRouter, Query
+from loguru import logger
+
+from app.api.v1.endpoints import (
+    error_detail,
+    load_plan_vs_fact,
+    load_hourly_sales,
+    load_payroll,
+    load_reviews
+)
+from app.models.requests import PlanVsFactRequest, HourlySalesRequest, PayrollRequest, DepartmentInfoRequest
+from app.models.responses import (
+    DepartmentDigest,
+    DigestWeek,
+    DigestPeakHours,
+    DigestPayroll,
+    DigestReviews
+)
+from app.core.config import get_settings
+from app.core.exceptions import MCPError
+from app.core.responses import ModelResponse, PassthroughResponse, negotiated_passthrough
+from app.services import summaries
+from app.services.digests import digest_store
+
+router = APIRouter(prefix="/api/v1/mcp", tags=["Digests"])
+settings = get_settings()
+
+# Пиковые часы считаются по последним четырём неделям
+PEAK_HOURS_DAYS = 28
+# Динамика отзывов: последние 30 дней против предыдущих 30
+REVIEWS_WINDOW_DAYS = 30
+
+
+def _period(department_id: str, date_start: date, date_end: date) -> Dict[str, Any]:
+    return {"department_id": department_id, "date_start": date_start, "date_end": date_end}
+
+
+async def _last_week(department_id: str, day: date) -> DigestWeek:
+    week_start = day - timedelta(days=6)
+    result = await load_plan_vs_fact(PlanVsFactRequest(**_period(department_id, day - timedelta(days=13), day)))
+    current = [row for row in result.data if row.date >= week_start]
+    previous = [row for row in result.data if row.date < week_start]
+    
+    summary = summaries.plan_vs_fact(current)
+    previous_actual = sum(row.actual_sales for row in previous) if previous else None
+    week_over_week = None
+    if previous_actual:
+        week_over_week = round((summary["actual_sales"] - previous_actual) / previous_actual * 100, 2)
+    return DigestWeek(
+        date_start=week_start,
+        date_end=day,
+        actual_sales=summary["actual_sales"],
+        predicted_sales=summary["predicted_sales"],
+        error_percentage=summary["error_percentage"],
+        mape=summary["mape"],
+        previous_actual_sales=previous_actual and round(previous_actual, 2),
+        week_over_week=week_over_week
+    )
+
+
+async def _peak_hours(department_id: str, day: date) -> DigestPeakHours:
+    date_start = day - timedelta(days=PEAK_HOURS_DAYS - 1)
+    result = await load_hourly_sales(HourlySalesRequest(**_period(department_id, date_start, day)))
+    hourly_mean = summaries.hourly_sales(result.data, top=0)["hourly_mean"]
+    return DigestPeakHours(
+        days=PEAK_HOURS_DAYS,
+        top_hours=sorted(hourly_mean, key=hourly_mean.get, reverse=True)[:3],
+        hourly_mean=hourly_mean
+    )
+
+
+async def _payroll(department_id: str, day: date) -> DigestPayroll:
+    result = await load_payroll(PayrollRequest(**_period(department_id, day - timedelta(days=6), day)))
+    summary = summaries.payroll(result.data, top=0)
+    return DigestPayroll(payroll_total=summary["payroll_total"], work_hours=summary["work_hours"])
+
+
+def _mean_rating(reviews) -> Optional[float]:
+    return round(sum(review.rating for review in reviews) / len(reviews), 2) if reviews else None
+
+
+async def _reviews(department_id: str, day: date) -> DigestReviews:
+    result = await load_reviews(department_id, settings.digest_reviews_count)
+    recent_start = day - timedelta(days=REVIEWS_WINDOW_DAYS - 1)
+    previous_start = recent_start - timedelta(days=REVIEWS_WINDOW_DAYS)
+    recent = [review for review in result.data if recent_start <= review.date_created.date() <= day]
+    previous = [review for review in result.data if previous_start <= review.date_created.date() < recent_start]
+    
+    recent_mean, previous_mean = _mean_rating(recent), _mean_rating(previous)
+    return DigestReviews(
+        count=len(result.data),
+        mean_rating=_mean_rating(result.data),
+        recent_count=len(recent),
+        recent_mean_rating=recent_mean,
+        previous_count=len(previous),
+        previous_mean_rating=previous_mean,
+        rating_trend=round(recent_mean - previous_mean, 2) if recent_mean and previous_mean else None
+    )
+
+
+_PARTS: Dict[str, Callable[[str, date], Awaitable[Any]]] = {
+    "last_week": _last_week,
+    "peak_hours": _peak_hours,
+    "payroll": _payroll,
+    "reviews": _reviews
+}
+
+
+async def build_digest(department_id: str, day: date) -> DepartmentDigest:
+    """
+    Дайджест за неделю, заканчивающуюся днём day. Части загружаются
+    параллельно через кэшированные загрузчики; ошибка части попадает в errors.
+    """
+    async def load_part(name: str):
+        try:
+            return name, await _PARTS[name](department_id, day), None
+        except Exception as e:
+            if not isinstance(e, MCPError):
+                logger.error(f"Ошибка части {name} дайджеста department_id={department_id}: {e}")
+            return name, None, error_detail(e)
+    
+    digest = DepartmentDigest.model_construct(
+        department_id=UUID(department_id), date=day, computed_at=datetime.now(), errors={}
+    )
+    for name, part, error in await asyncio.gather(*(load_part(name) for name in _PARTS)):
+        setattr(digest, name, part)
+        if error is not None:
+            digest.errors[name] = error
+    
+    # Доля ФОТ от фактических продаж той же недели
+    if digest.payroll is not None and digest.last_week is not None and digest.last_week.actual_sales:
+        digest.payroll.actual_sales = digest.last_week.actual_sales
+        digest.payroll.payroll_share = round(digest.payroll.payroll_total / digest.last_week.actual_sales * 100, 2)
+    return digest
+
+
+async def build_digest_body(department_id: str, day: date) -> bytes:
+    digest = await build_digest(department_id, day)
+    return digest.__pydantic_serializer__.to_json(digest)
+
+
+def _stored(department_id: UUID) -> bytes:
+    body = digest_store.get(str(department_id))
+    if body is None:
+        raise MCPError(
+            error_type="digest_not_found",
+            message="Дайджест подразделения ещё не посчитан",
+            details={"department_id": str(department_id)},
+            status_code=404
+        )
+    return body
+
+
+async def load_digest(request: DepartmentInfoRequest) -> DepartmentDigest:
+    return DepartmentDigest.model_validate_json(_stored(request.department_id))
+
+
+@router.get("/digest/{department_id}", response_model=DepartmentDigest)
+async def get_department_digest(department_id: UUID):
+    """
+    Получить готовый дайджест подразделения: последняя неделя против прогноза,
+    пиковые часы, доля ФОТ и динамика отзывов. Отдаётся из хранилища как есть,
+    без запросов к внешним API.
+    """
+    return negotiated_passthrough(PassthroughResponse(content=_stored(department_id)))
+
+
+@router.post("/digest/{department_id}", response_model=DepartmentDigest)
+async def refresh_department_digest(
+    department_id: UUID,
+    day: Optional[date] = Query(None, description="Последний день недели дайджеста, по умолчанию вчера")
+):
+    """
+    Посчитать и сохранить дайджест подразделения сейчас, не дожидаясь ночного пересчёта
+    """
+    day = day or date.today() - timedelta(days=1)
+    digest = await build_digest(str(department_id), day)
+    await asyncio.to_thread(digest_store.put, str(department_id), day, digest.__pydantic_serializer__.to_json(digest))
+    return ModelResponse(digest)
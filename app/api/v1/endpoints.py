@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse, HTMLResponse
-from typing import List, AsyncGenerator
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import Response, StreamingResponse, HTMLResponse
+from typing import List, AsyncGenerator, AsyncIterator, Awaitable, Callable, Iterable, Literal, Optional, get_args
 from datetime import date, datetime
 import json
 import asyncio
 import os
+from collections import deque
+from functools import partial
 from loguru import logger
 
 from app.models.requests import (
@@ -13,7 +15,11 @@ from app.models.requests import (
     PlanVsFactRequest,
     PayrollRequest,
     DepartmentInfoRequest,
-    ReviewsRequest
+    ReviewsRequest,
+    BatchPeriodRequest,
+    SnapshotRequest,
+    SnapshotPart,
+    ExportDataset
 )
 from app.models.responses import (
     ForecastResponse,
@@ -21,31 +27,187 @@ from app.models.responses import (
     PlanVsFactResponse,
     PayrollResponse,
     DepartmentInfo,
+    ReviewsResponse,
     ForecastItem,
     HourlySalesItem,
     PlanVsFactItem,
-    ReviewsResponse,
-    Review
+    Review,
+    ForecastBatchItem,
+    ForecastBatchResponse,
+    HourlySalesBatchItem,
+    HourlySalesBatchResponse,
+    PlanVsFactBatchItem,
+    PlanVsFactBatchResponse,
+    ErrorDetail,
+    DepartmentSnapshot,
+    FORECAST_ITEMS,
+    HOURLY_SALES_ITEMS,
+    PLAN_VS_FACT_ITEMS,
+    REVIEWS
 )
 from app.services.http_client import HTTPClient
+from app.services import export, spreadsheet
 from app.utils.cache import cache_manager
 from app.core.config import get_settings
-from app.core.exceptions import ExternalAPIError
+from app.core.exceptions import MCPError, ExternalAPIError, DeadlineExceededError, ValidationError, FeatureUnavailableError
+from app.core.responses import FastJSONResponse, ModelResponse, passthrough_response, negotiated_passthrough
+from app.core.conditional import content_digest, entity_tag, etag_matches, not_modified
+from app.core.streaming import stream_format, streaming_rows_response
+from app.utils.periods import split_period
+from app.utils.columnar import column_arrays, columnar_body
+from app.utils.projection import parse_fields, parse_dates, parse_hours, filter_rows, rows_include
+from app.utils import metrics
 
 router = APIRouter(prefix="/api/v1/mcp", tags=["MCP"])
 settings = get_settings()
 
 
-@router.post("/forecast", response_model=ForecastResponse)
+# Валидаторы элементов для эндпоинтов Aqniet, загружаемых частями
+_CHUNK_ITEMS = {
+    "forecast/batch": FORECAST_ITEMS,
+    "sales/hourly": HOURLY_SALES_ITEMS,
+    "forecast/comparison": PLAN_VS_FACT_ITEMS
+}
+
+
+def _use_chunks(request) -> bool:
+    min_days = settings.upstream_chunk_min_days
+    return bool(min_days) and (request.date_end - request.date_start).days + 1 >= min_days
+
+
 @cache_manager.cached(ttl=settings.cache_ttl)
-async def get_forecast(request: ForecastRequest):
+async def load_aqniet_chunk(endpoint: str, department_id: str, date_start: date, date_end: date) -> list:
     """
-    Получить прогноз продаж по дням для указанного подразделения
+    Часть длинного периода; кэшируется отдельно, поэтому месяцы, общие
+    для разных запросов, загружаются из апстрима один раз
     """
+    try:
+        async with HTTPClient() as client:
+            params = {
+                "from_date": date_start.isoformat(),
+                "to_date": date_end.isoformat(),
+                "department_id": department_id
+            }
+            data = await client.get_aqniet(endpoint, params=params)
+            return _CHUNK_ITEMS[endpoint].validate_python(data)
+    except MCPError:
+        raise
+    except Exception as e:
+        raise ExternalAPIError(message=str(e), endpoint=endpoint)
+
+
+async def _load_chunk_with_retries(endpoint: str, department_id: str, date_start: date, date_end: date) -> list:
+    retries = settings.upstream_chunk_retries
+    for attempt in range(retries + 1):
+        try:
+            return await load_aqniet_chunk(endpoint, department_id, date_start, date_end)
+        except DeadlineExceededError:
+            raise
+        except MCPError as e:
+            # Ошибки запроса (4xx) повторять бесполезно
+            status_code = e.detail["error"]["details"].get("status_code")
+            if attempt == retries or (status_code and status_code < 500):
+                raise
+            delay = settings.upstream_chunk_retry_delay * 2 ** attempt
+            logger.warning(f"Часть {endpoint} {date_start} - {date_end} не загружена: "
+                           f"{e.detail['error']['message']}, повтор через {delay}s")
+            metrics.increment("chunks.retries")
+            await asyncio.sleep(delay)
+
+
+async def _load_chunked(endpoint: str, request) -> list:
+    """
+    Загружает длинный период частями параллельно (не более
+    upstream_chunk_concurrency одновременно) и склеивает их в порядке дат
+    """
+    chunks = split_period(request.date_start, request.date_end, settings.upstream_chunk_days)
+    logger.debug(f"{endpoint}: период {request.date_start} - {request.date_end} разбит на {len(chunks)} частей")
+    semaphore = asyncio.Semaphore(settings.upstream_chunk_concurrency)
+    
+    async def load_chunk(date_start: date, date_end: date) -> list:
+        async with semaphore:
+            return await _load_chunk_with_retries(endpoint, str(request.department_id), date_start, date_end)
+    
+    results = await asyncio.gather(*(load_chunk(start, end) for start, end in chunks))
+    return [item for chunk in results for item in chunk]
+
+
+# Описания общих параметров выборки строк
+FIELDS_QUERY = "Поля строк через запятую, например date,predicted_sales"
+DATES_QUERY = "Только эти даты: 2025-07-01,2025-07-10..2025-07-12"
+COLUMNAR_QUERY = "columnar - параллельные массивы со смещением дней от date_start"
+
+
+def _rows_response(result, response_model, fields=None, **filters) -> ModelResponse:
+    """
+    Отбирает строки ответа и ограничивает их поля до сериализации.
+    Кэшированная модель не изменяется.
+    """
+    if any(value is not None for value in filters.values()):
+        result = response_model.model_construct(data=filter_rows(result.data, **filters))
+    return ModelResponse(result, include=rows_include(fields))
+
+
+def _columnar_response(result, item_model, loader, request, fields=None, **filters) -> FastJSONResponse:
+    """
+    Ряд в виде параллельных массивов: ключи и даты не повторяются в каждой строке.
+    
+    Массивы всего ряда строятся один раз и хранятся рядом с записью кэша
+    загрузчика, повторные запросы только выбирают колонки. Отфильтрованные
+    строки транспонируются заново.
+    """
+    columns = list(item_model.model_fields)
+    start_date = request.date_start
+    rows = result.data
+    arrays = None
+    if any(value is not None for value in filters.values()):
+        rows = filter_rows(rows, **filters)
+    else:
+        arrays = loader.view("columns", lambda value: column_arrays(value.data, columns, start_date), request)
+    if arrays is None:
+        arrays = column_arrays(rows, columns, start_date)
+    return FastJSONResponse(columnar_body(arrays, len(rows), start_date, fields))
+
+
+async def _conditional_response(if_none_match: Optional[str], variant: dict, render, loader, *args, **kwargs) -> Response:
+    """
+    Ответ закэшированного загрузчика с ETag.
+    
+    ETag строится из хэша содержимого, хранящегося вместе с записью кэша,
+    и варианта представления (формат, поля, фильтры), поэтому при совпадении
+    If-None-Match пустой 304 отдаётся без сериализации данных.
+    """
+    result = await loader(*args, **kwargs)
+    digest = loader.digest(*args, **kwargs)
+    response = None
+    if digest is None:
+        # Значения нет в кэше (отключён или запись уже вытеснена) - хэшируем готовое тело
+        response = render(result)
+        digest = content_digest(response.body)
+    
+    etag = entity_tag(digest, variant)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if response is None:
+        response = render(result)
+    response.headers["ETag"] = etag
+    return response
+
+
+# Эндпоинты отдают ModelResponse: данные апстрима валидируются один раз
+# в загрузчике, и FastAPI не проверяет результат повторно по response_model.
+# Загрузчики кэшируют модели, а не готовые ответы.
+
+
+@cache_manager.cached(ttl=settings.cache_ttl)
+async def load_forecast(request: ForecastRequest) -> ForecastResponse:
     logger.info(f"Запрос прогноза для department_id={request.department_id}, "
                 f"период: {request.date_start} - {request.date_end}")
     
     try:
+        if _use_chunks(request):
+            return ForecastResponse.model_construct(data=await _load_chunked("forecast/batch", request))
+        
         async with HTTPClient() as client:
             params = {
                 "from_date": request.date_start.isoformat(),
@@ -56,15 +218,9 @@ async def get_forecast(request: ForecastRequest):
             data = await client.get_aqniet("forecast/batch", params=params)
             
             # Преобразуем ответ в наш формат
-            forecast_items = [
-                ForecastItem(
-                    date=item["date"],
-                    predicted_sales=item["predicted_sales"]
-                )
-                for item in data
-            ]
-            
-            return ForecastResponse(data=forecast_items)
+            return ForecastResponse.model_construct(data=FORECAST_ITEMS.validate_python(data))
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         raise ExternalAPIError(
             message=str(e),
@@ -72,16 +228,39 @@ async def get_forecast(request: ForecastRequest):
         )
 
 
-@router.post("/hourly_sales", response_model=HourlySalesResponse)
-@cache_manager.cached(ttl=settings.cache_ttl)
-async def get_hourly_sales(request: HourlySalesRequest):
+@router.post("/forecast", response_model=ForecastResponse)
+async def get_forecast(
+    request: ForecastRequest,
+    format: Optional[Literal["json", "columnar"]] = Query(None, description=COLUMNAR_QUERY),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY),
+    dates: Optional[str] = Query(None, description=DATES_QUERY),
+    if_none_match: Optional[str] = Header(None)
+):
     """
-    Получить почасовые продажи для указанного подразделения
+    Получить прогноз продаж по дням для указанного подразделения
     """
+    fields = parse_fields(fields, ForecastItem)
+    dates = parse_dates(dates)
+    
+    def render(result):
+        if format == "columnar":
+            return _columnar_response(result, ForecastItem, load_forecast, request, fields, dates=dates)
+        return _rows_response(result, ForecastResponse, fields, dates=dates)
+    
+    variant = {"format": format, "fields": fields, "dates": dates}
+    return await _conditional_response(if_none_match, variant, render, load_forecast, request)
+
+
+@cache_manager.cached(ttl=settings.cache_ttl)
+async def load_hourly_sales(request: HourlySalesRequest) -> HourlySalesResponse:
     logger.info(f"Запрос почасовых продаж для department_id={request.department_id}, "
                 f"период: {request.date_start} - {request.date_end}")
     
     try:
+        # Очень длинные периоды загружаем по частям
+        if _use_chunks(request):
+            return HourlySalesResponse.model_construct(data=await _load_chunked("sales/hourly", request))
+        
         async with HTTPClient() as client:
             params = {
                 "from_date": request.date_start.isoformat(),
@@ -89,19 +268,22 @@ async def get_hourly_sales(request: HourlySalesRequest):
                 "department_id": str(request.department_id)
             }
             
-            data = await client.get_aqniet("sales/hourly", params=params)
+            # Для длинных периодов разбираем ответ потоково и сразу преобразуем
+            # элементы, не держа в памяти всё тело и промежуточный список словарей
+            period_days = (request.date_end - request.date_start).days + 1
+            if period_days >= settings.stream_hourly_min_days:
+                sales_items = []
+                async for batch in client.stream_aqniet("sales/hourly", params=params):
+                    sales_items.extend(HOURLY_SALES_ITEMS.validate_python(batch))
+            else:
+                data = await client.get_aqniet("sales/hourly", params=params)
+                
+                # Преобразуем ответ в наш формат
+                sales_items = HOURLY_SALES_ITEMS.validate_python(data)
             
-            # Преобразуем ответ в наш формат
-            sales_items = [
-                HourlySalesItem(
-                    date=item["date"],
-                    hour=item["hour"],
-                    sales_amount=item["sales_amount"]
-                )
-                for item in data
-            ]
-            
-            return HourlySalesResponse(data=sales_items)
+            return HourlySalesResponse.model_construct(data=sales_items)
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         raise ExternalAPIError(
             message=str(e),
@@ -109,16 +291,70 @@ async def get_hourly_sales(request: HourlySalesRequest):
         )
 
 
-@router.post("/plan_vs_fact", response_model=PlanVsFactResponse)
-@cache_manager.cached(ttl=settings.cache_ttl)
-async def get_plan_vs_fact(request: PlanVsFactRequest):
+async def stream_hourly_sales(request: HourlySalesRequest, **filters) -> AsyncIterator[list]:
     """
-    Получить сравнение прогноза и факта продаж
+    Почасовые продажи пачками по мере разбора ответа апстрима, без кэша
+    и без сборки всего списка в памяти
+    """
+    params = {
+        "from_date": request.date_start.isoformat(),
+        "to_date": request.date_end.isoformat(),
+        "department_id": str(request.department_id)
+    }
+    try:
+        async with HTTPClient() as client:
+            async for batch in client.stream_aqniet("sales/hourly", params=params):
+                yield filter_rows(HOURLY_SALES_ITEMS.validate_python(batch), **filters)
+    except MCPError:
+        raise
+    except Exception as e:
+        raise ExternalAPIError(message=str(e), endpoint="sales/hourly")
+
+
+@router.post("/hourly_sales", response_model=HourlySalesResponse)
+async def get_hourly_sales(
+    request: HourlySalesRequest,
+    format: Optional[Literal["json", "columnar", "ndjson", "json-stream"]] = Query(
+        None, description="columnar - параллельные массивы, ndjson или json-stream - потоковая выдача строк"
+    ),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY),
+    dates: Optional[str] = Query(None, description=DATES_QUERY),
+    hours: Optional[str] = Query(None, description="Только эти часы: 9,12-14"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Получить почасовые продажи для указанного подразделения
     """
+    fields = parse_fields(fields, HourlySalesItem)
+    filters = {"dates": parse_dates(dates), "hours": parse_hours(hours)}
+    
+    streaming = stream_format(format, accept)
+    if streaming:
+        logger.info(f"Потоковая выдача почасовых продаж ({streaming}) для department_id={request.department_id}, "
+                    f"период: {request.date_start} - {request.date_end}")
+        return await streaming_rows_response(
+            stream_hourly_sales(request, **filters), HOURLY_SALES_ITEMS, streaming, include=fields
+        )
+    
+    def render(result):
+        if format == "columnar":
+            return _columnar_response(result, HourlySalesItem, load_hourly_sales, request, fields, **filters)
+        return _rows_response(result, HourlySalesResponse, fields, **filters)
+    
+    variant = {"format": format, "fields": fields, **filters}
+    return await _conditional_response(if_none_match, variant, render, load_hourly_sales, request)
+
+
+@cache_manager.cached(ttl=settings.cache_ttl)
+async def load_plan_vs_fact(request: PlanVsFactRequest) -> PlanVsFactResponse:
     logger.info(f"Запрос план/факт для department_id={request.department_id}, "
                 f"период: {request.date_start} - {request.date_end}")
     
     try:
+        if _use_chunks(request):
+            return PlanVsFactResponse.model_construct(data=await _load_chunked("forecast/comparison", request))
+        
         async with HTTPClient() as client:
             params = {
                 "from_date": request.date_start.isoformat(),
@@ -129,18 +365,9 @@ async def get_plan_vs_fact(request: PlanVsFactRequest):
             data = await client.get_aqniet("forecast/comparison", params=params)
             
             # Преобразуем ответ в наш формат
-            comparison_items = [
-                PlanVsFactItem(
-                    date=item["date"],
-                    predicted_sales=item["predicted_sales"],
-                    actual_sales=item["actual_sales"],
-                    error=item["error"],
-                    error_percentage=item["error_percentage"]
-                )
-                for item in data
-            ]
-            
-            return PlanVsFactResponse(data=comparison_items)
+            return PlanVsFactResponse.model_construct(data=PLAN_VS_FACT_ITEMS.validate_python(data))
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         raise ExternalAPIError(
             message=str(e),
@@ -148,11 +375,110 @@ async def get_plan_vs_fact(request: PlanVsFactRequest):
         )
 
 
-@router.post("/payroll", response_model=PayrollResponse)
-async def get_payroll(request: PayrollRequest):
+@router.post("/plan_vs_fact", response_model=PlanVsFactResponse)
+async def get_plan_vs_fact(
+    request: PlanVsFactRequest,
+    format: Optional[Literal["json", "columnar"]] = Query(None, description=COLUMNAR_QUERY),
+    fields: Optional[str] = Query(None, description=FIELDS_QUERY),
+    dates: Optional[str] = Query(None, description=DATES_QUERY),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Получить сравнение прогноза и факта продаж
+    """
+    fields = parse_fields(fields, PlanVsFactItem)
+    dates = parse_dates(dates)
+    
+    def render(result):
+        if format == "columnar":
+            return _columnar_response(result, PlanVsFactItem, load_plan_vs_fact, request, fields, dates=dates)
+        return _rows_response(result, PlanVsFactResponse, fields, dates=dates)
+    
+    variant = {"format": format, "fields": fields, "dates": dates}
+    return await _conditional_response(if_none_match, variant, render, load_plan_vs_fact, request)
+
+
+def error_detail(error: Exception) -> ErrorDetail:
+    """
+    Ошибка части составного ответа в формате тела ошибок API
+    """
+    if isinstance(error, MCPError):
+        return ErrorDetail.model_validate(error.detail["error"])
+    return ErrorDetail(type="internal_error", message=str(error))
+
+
+async def _load_batch(request: BatchPeriodRequest, loader, request_model, item_model, response_model):
+    """
+    Загружает данные по каждому подразделению пакета параллельно, не более
+    batch_max_concurrency одновременно. Каждое подразделение проходит через
+    кэшируемый загрузчик одиночного эндпоинта, поэтому кэш общий с ним.
+    Ошибка подразделения попадает в его элемент результата и не прерывает пакет.
+    """
+    if len(request.department_ids) > settings.batch_max_departments:
+        raise ValidationError(
+            message=f"Не более {settings.batch_max_departments} подразделений в одном запросе",
+            field="department_ids"
+        )
+    
+    logger.info(f"Пакетный запрос {loader.__name__} для {len(request.department_ids)} подразделений, "
+                f"период: {request.date_start} - {request.date_end}")
+    
+    semaphore = asyncio.Semaphore(settings.batch_max_concurrency)
+    
+    async def load_department(department_id):
+        async with semaphore:
+            try:
+                result = await loader(request_model(
+                    department_id=department_id,
+                    date_start=request.date_start,
+                    date_end=request.date_end
+                ))
+                return item_model.model_construct(department_id=department_id, data=result.data)
+            except Exception as e:
+                if not isinstance(e, MCPError):
+                    logger.error(f"Ошибка пакетной загрузки для {department_id}: {e}")
+                error = error_detail(e)
+            return item_model.model_construct(department_id=department_id, error=error)
+    
+    results = await asyncio.gather(*(load_department(department_id) for department_id in request.department_ids))
+    failed = sum(1 for item in results if item.error is not None)
+    return response_model.model_construct(results=results, succeeded=len(results) - failed, failed=failed)
+
+
+@router.post("/forecast/batch", response_model=ForecastBatchResponse)
+async def get_forecast_batch(request: BatchPeriodRequest):
+    """
+    Получить прогноз продаж для нескольких подразделений за один период
+    """
+    return ModelResponse(await _load_batch(
+        request, load_forecast, ForecastRequest, ForecastBatchItem, ForecastBatchResponse
+    ))
+
+
+@router.post("/hourly_sales/batch", response_model=HourlySalesBatchResponse)
+async def get_hourly_sales_batch(request: BatchPeriodRequest):
+    """
+    Получить почасовые продажи для нескольких подразделений за один период
+    """
+    return ModelResponse(await _load_batch(
+        request, load_hourly_sales, HourlySalesRequest, HourlySalesBatchItem, HourlySalesBatchResponse
+    ))
+
+
+@router.post("/plan_vs_fact/batch", response_model=PlanVsFactBatchResponse)
+async def get_plan_vs_fact_batch(request: BatchPeriodRequest):
+    """
+    Получить сравнение прогноза и факта для нескольких подразделений за один период
+    """
+    return ModelResponse(await _load_batch(
+        request, load_plan_vs_fact, PlanVsFactRequest, PlanVsFactBatchItem, PlanVsFactBatchResponse
+    ))
+
+
+async def load_payroll(request: PayrollRequest, passthrough: bool = False):
     """
-    Получить ФОТ сотрудников и график работы.
     Не кэшируется, так как данные могут часто меняться.
+    При passthrough возвращает готовый ответ с телом апстрима.
     """
     logger.info(f"Запрос ФОТ для department_id={request.department_id}, "
                 f"период: {request.date_start} - {request.date_end}")
@@ -165,10 +491,17 @@ async def get_payroll(request: PayrollRequest):
                 "to_date": request.date_end.isoformat()
             }
             
+            # Тело апстрима уже в нужном формате - отдаём байты без разбора
+            if passthrough:
+                body = await client.get_madlen_raw("admin/payroll/attendance", params=params)
+                return await passthrough_response(body, PayrollResponse, settings.passthrough_validation_sample)
+            
             data = await client.get_madlen("admin/payroll/attendance", params=params)
             
             # Возвращаем данные как есть, они уже в нужном формате
-            return PayrollResponse(**data)
+            return PayrollResponse.model_validate(data)
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         raise ExternalAPIError(
             message=str(e),
@@ -176,21 +509,215 @@ async def get_payroll(request: PayrollRequest):
         )
 
 
-@router.post("/department_info", response_model=DepartmentInfo)
-@cache_manager.cached(ttl=settings.cache_ttl * 2)  # Кэшируем на час
-async def get_department_info(request: DepartmentInfoRequest):
+async def _prefetched(loads: Iterable[Callable[[], Awaitable]], window: int) -> AsyncIterator:
     """
-    Получить информацию о подразделении
+    Результаты загрузок в исходном порядке. Следующие window загрузок
+    выполняются заранее, но не больше, поэтому в памяти не оказываются
+    данные всей выгрузки сразу.
+    """
+    pending = deque()
+    try:
+        for load in loads:
+            pending.append(asyncio.create_task(load()))
+            if len(pending) >= window:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+        # Ошибки отменённых загрузок больше никому не нужны
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def _export_batches(dataset: str, request: BatchPeriodRequest, loader, request_model) -> AsyncIterator:
     """
+    RecordBatch на каждое подразделение в порядке запроса, не более
+    batch_max_concurrency подразделений загружаются одновременно.
+    Загруженные данные не сохраняются в кэш: иначе модели строк всей
+    выгрузки оставались бы в памяти до истечения TTL.
+    """
+    async def load(department_id):
+        with cache_manager.bypass():
+            result = await loader(request_model(
+                department_id=department_id,
+                date_start=request.date_start,
+                date_end=request.date_end
+            ))
+        return export.record_batch(dataset, str(department_id), result)
+    
+    return _prefetched(
+        (partial(load, department_id) for department_id in request.department_ids),
+        settings.batch_max_concurrency
+    )
+
+
+def export_batches(dataset: ExportDataset, request: BatchPeriodRequest) -> AsyncIterator:
+    """RecordBatch на каждое подразделение выгрузки dataset"""
+    loader, request_model = {
+        "forecast": (load_forecast, ForecastRequest),
+        "hourly_sales": (load_hourly_sales, HourlySalesRequest),
+        "plan_vs_fact": (load_plan_vs_fact, PlanVsFactRequest),
+        "payroll_shifts": (load_payroll, PayrollRequest)
+    }[dataset]
+    return _export_batches(dataset, request, loader, request_model)
+
+
+def check_departments(request: BatchPeriodRequest, max_departments: int):
+    if len(request.department_ids) > max_departments:
+        raise ValidationError(
+            message=f"Не более {max_departments} подразделений в одной выгрузке",
+            field="department_ids"
+        )
+
+
+def check_export(request: BatchPeriodRequest, max_departments: int):
+    if not export.PYARROW_AVAILABLE:
+        raise FeatureUnavailableError("Выгрузка Arrow / Parquet", "pyarrow")
+    check_departments(request, max_departments)
+
+
+@router.post("/export/{dataset}")
+async def export_dataset(
+    dataset: ExportDataset,
+    request: BatchPeriodRequest,
+    format: Literal["arrow", "parquet"] = Query("arrow", description="arrow - поток Arrow IPC, parquet - файл Parquet")
+):
+    """
+    Выгрузить данные нескольких подразделений за период в Arrow IPC или Parquet.
+    
+    Данные кодируются и отправляются по одному подразделению, смены ФОТ
+    выгружаются плоской таблицей (payroll_shifts).
+    """
+    check_export(request, settings.export_max_departments)
+    
+    logger.info(f"Выгрузка {dataset} ({format}) для {len(request.department_ids)} подразделений, "
+                f"период: {request.date_start} - {request.date_end}")
+    
+    # Первое подразделение загружается до начала ответа, чтобы ошибки
+    # апстрима вернулись с обычным статусом
+    batches = export_batches(dataset, request)
+    try:
+        first = await batches.__anext__()
+    except BaseException:
+        await batches.aclose()
+        raise
+    
+    filename = f"{dataset}_{request.date_start}_{request.date_end}.{export.EXPORT_EXTENSIONS[format]}"
+    return StreamingResponse(
+        export.encode_batches(export.prepend(first, batches), export.SCHEMAS[dataset], format),
+        media_type=export.EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post("/payroll", response_model=PayrollResponse)
+async def get_payroll(request: PayrollRequest):
+    """
+    Получить ФОТ сотрудников и график работы.
+    Не кэшируется, так как данные могут часто меняться.
+    """
+    result = await load_payroll(request, passthrough=settings.passthrough_responses)
+    # В режиме pass-through загрузчик возвращает готовый ответ
+    if isinstance(result, PayrollResponse):
+        return ModelResponse(result)
+    return negotiated_passthrough(result)
+
+
+# Колонки плоской выгрузки смен ФОТ, как у payroll_shifts в Arrow / Parquet
+PAYROLL_EXPORT_COLUMNS = ("department_id", "employee_name", "date", "payroll_for_shift", "schedule_name", "work_hours")
+
+
+def payroll_pages(request: BatchPeriodRequest) -> AsyncIterator[List[tuple]]:
+    """
+    Смены ФОТ плоскими строками постранично: страница - одно подразделение
+    за одну часть периода (календарный месяц при upstream_chunk_days=0).
+    Заранее загружаются не больше upstream_chunk_concurrency страниц, поэтому
+    память не растёт с длиной периода и числом подразделений.
+    """
+    async def load(department_id, date_start: date, date_end: date) -> List[tuple]:
+        result = await load_payroll(PayrollRequest(
+            department_id=department_id,
+            date_start=date_start,
+            date_end=date_end
+        ))
+        department = str(department_id)
+        return [
+            (department, employee.employee_name, shift.date, shift.payroll_for_shift, shift.schedule_name, shift.work_hours)
+            for employee in result.data
+            for shift in employee.shifts
+        ]
+    
+    chunks = split_period(request.date_start, request.date_end, settings.upstream_chunk_days)
+    return _prefetched(
+        (
+            partial(load, department_id, date_start, date_end)
+            for department_id in request.department_ids
+            for date_start, date_end in chunks
+        ),
+        settings.upstream_chunk_concurrency
+    )
+
+
+def payroll_pages_count(request: BatchPeriodRequest) -> int:
+    chunks = split_period(request.date_start, request.date_end, settings.upstream_chunk_days)
+    return len(request.department_ids) * len(chunks)
+
+
+@router.post("/payroll/export")
+async def export_payroll(
+    request: BatchPeriodRequest,
+    format: Literal["csv", "xlsx"] = Query("csv", description="csv - CSV в UTF-8, xlsx - книга Excel"),
+    delimiter: Literal[",", ";"] = Query(",", description="Разделитель CSV; ; - для Excel с русской локалью")
+):
+    """
+    Выгрузить смены ФОТ нескольких подразделений за период плоской таблицей
+    CSV или XLSX: строка на смену, с подразделением и сотрудником.
+    
+    Период загружается по месяцам, и каждая страница отправляется клиенту
+    сразу после загрузки, поэтому память не зависит от размера выгрузки.
+    """
+    check_departments(request, settings.export_max_departments)
+    
+    logger.info(f"Выгрузка ФОТ ({format}) для {len(request.department_ids)} подразделений, "
+                f"период: {request.date_start} - {request.date_end}")
+    
+    # Первая страница загружается до начала ответа, чтобы ошибки
+    # апстрима вернулись с обычным статусом
+    pages = payroll_pages(request)
+    try:
+        first = await pages.__anext__()
+    except BaseException:
+        await pages.aclose()
+        raise
+    
+    filename = f"payroll_{request.date_start}_{request.date_end}.{format}"
+    return StreamingResponse(
+        spreadsheet.encode_rows(export.prepend(first, pages), PAYROLL_EXPORT_COLUMNS, format, delimiter),
+        media_type=spreadsheet.SPREADSHEET_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@cache_manager.cached(ttl=settings.cache_ttl * 2)  # Кэшируем на час
+async def load_department_info(request: DepartmentInfoRequest, passthrough: bool = False):
     logger.info(f"Запрос информации о подразделении department_id={request.department_id}")
     
     try:
         async with HTTPClient() as client:
             endpoint = f"admin/departments/{request.department_id}"
+            
+            # Тело апстрима уже в нужном формате - отдаём байты без разбора
+            if passthrough:
+                body = await client.get_madlen_raw(endpoint)
+                return await passthrough_response(body, DepartmentInfo, settings.passthrough_validation_sample)
+            
             data = await client.get_madlen(endpoint)
             
             # Возвращаем данные как есть, они уже в нужном формате
-            return DepartmentInfo(**data)
+            return DepartmentInfo.model_validate(data)
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         raise ExternalAPIError(
             message=str(e),
@@ -198,32 +725,108 @@ async def get_department_info(request: DepartmentInfoRequest):
         )
 
 
-@router.get("/reviews/{department_id}/{count}", response_model=ReviewsResponse)
-@cache_manager.cached(ttl=settings.cache_ttl)
-async def get_reviews(department_id: str, count: int):
+@router.post("/department_info", response_model=DepartmentInfo)
+async def get_department_info(request: DepartmentInfoRequest, if_none_match: Optional[str] = Header(None)):
     """
-    Получить отзывы по подразделению
+    Получить информацию о подразделении
     """
-    # Валидация count
-    if not 1 <= count <= 1000:
-        raise ExternalAPIError(
-            message="count должен быть в диапазоне от 1 до 1000",
-            endpoint=f"v1/by-iiko/{department_id}/{count}",
-            status_code=400
-        )
+    def render(result):
+        # В режиме pass-through загрузчик возвращает готовый ответ
+        if isinstance(result, DepartmentInfo):
+            return ModelResponse(result)
+        return negotiated_passthrough(result)
     
+    return await _conditional_response(
+        if_none_match, {}, render, load_department_info, request, passthrough=settings.passthrough_responses
+    )
+
+
+async def load_snapshot(request: SnapshotRequest) -> DepartmentSnapshot:
+    """
+    Части загружаются параллельно, каждая со своим таймаутом; ошибка или
+    таймаут части попадает в errors и не прерывает остальные.
+    """
+    parts = list(dict.fromkeys(request.parts or get_args(SnapshotPart)))
+    timeout = request.part_timeout or settings.snapshot_part_timeout
+    period = {
+        "department_id": request.department_id,
+        "date_start": request.date_start,
+        "date_end": request.date_end
+    }
+    loaders = {
+        "department_info": lambda: load_department_info(DepartmentInfoRequest(department_id=request.department_id)),
+        "forecast": lambda: load_forecast(ForecastRequest(**period)),
+        "hourly_sales": lambda: load_hourly_sales(HourlySalesRequest(**period)),
+        "plan_vs_fact": lambda: load_plan_vs_fact(PlanVsFactRequest(**period)),
+        "payroll": lambda: load_payroll(PayrollRequest(**period))
+    }
+    
+    logger.info(f"Запрос сводки для department_id={request.department_id}, "
+                f"период: {request.date_start} - {request.date_end}, части: {parts}")
+    
+    async def load_part(name: str):
+        try:
+            async with asyncio.timeout(timeout):
+                result = await loaders[name]()
+            return name, result, None
+        except TimeoutError:
+            error = ErrorDetail(
+                type="timeout",
+                message=f"Часть {name} не загрузилась за {timeout} с",
+                details={"timeout": timeout}
+            )
+        except Exception as e:
+            if not isinstance(e, MCPError):
+                logger.error(f"Ошибка загрузки части {name} сводки: {e}")
+            error = error_detail(e)
+        return name, None, error
+    
+    snapshot = DepartmentSnapshot.model_construct(**period, errors={})
+    for name, result, error in await asyncio.gather(*(load_part(name) for name in parts)):
+        if error is not None:
+            snapshot.errors[name] = error
+        elif name == "department_info":
+            setattr(snapshot, name, result)
+        else:
+            setattr(snapshot, name, result.data)
+    
+    return snapshot
+
+
+@router.post("/snapshot", response_model=DepartmentSnapshot)
+async def get_department_snapshot(request: SnapshotRequest):
+    """
+    Получить сводку по подразделению за период одним запросом: информацию
+    о подразделении, прогноз, почасовые продажи, план/факт и ФОТ.
+    
+    Части загружаются параллельно, каждая со своим таймаутом; ошибка или
+    таймаут части попадает в errors и не прерывает остальные.
+    """
+    return ModelResponse(await load_snapshot(request))
+
+
+@cache_manager.cached(ttl=settings.cache_ttl)
+async def load_reviews(department_id: str, count: int) -> ReviewsResponse:
     logger.info(f"Запрос отзывов для department_id={department_id}, "
                 f"количество: {count}")
     
     try:
         async with HTTPClient() as client:
             endpoint = f"v1/by-iiko/{department_id}/{count}"
-            data = await client.get_reviews(endpoint)
-            
-            # Преобразуем ответ в наш формат
-            reviews = [Review(**item) for item in data]
+            # Большие выборки разбираем потоково, преобразуя отзывы по мере поступления
+            if count >= settings.stream_reviews_min_count:
+                reviews = []
+                async for batch in client.stream_reviews(endpoint):
+                    reviews.extend(REVIEWS.validate_python(batch))
+            else:
+                data = await client.get_reviews(endpoint)
+                
+                # Преобразуем ответ в наш формат
+                reviews = REVIEWS.validate_python(data)
             
-            return ReviewsResponse(data=reviews)
+            return ReviewsResponse.model_construct(data=reviews)
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         raise ExternalAPIError(
             message=str(e),
@@ -231,6 +834,62 @@ async def get_reviews(department_id: str, count: int):
         )
 
 
+async def stream_reviews(department_id: str, count: int, **filters) -> AsyncIterator[list]:
+    """
+    Отзывы пачками по мере разбора ответа апстрима, без кэша
+    """
+    endpoint = f"v1/by-iiko/{department_id}/{count}"
+    try:
+        async with HTTPClient() as client:
+            async for batch in client.stream_reviews(endpoint):
+                yield filter_rows(REVIEWS.validate_python(batch), **filters)
+    except MCPError:
+        raise
+    except Exception as e:
+        raise ExternalAPIError(message=str(e), endpoint=endpoint)
+
+
+@router.get("/reviews/{department_id}/{count}", response_model=ReviewsResponse)
+async def get_reviews(
+    department_id: str,
+    count: int,
+    format: Optional[Literal["json", "ndjson", "json-stream"]] = Query(
+        None, description="ndjson или json-stream для потоковой выдачи отзывов"
+    ),
+    fields: Optional[str] = Query(None, description="Поля отзывов через запятую, например rating,text"),
+    min_rating: Optional[float] = Query(None, ge=1, le=5, description="Только отзывы с оценкой не ниже"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Получить отзывы по подразделению
+    """
+    # Валидация count
+    if not 1 <= count <= 1000:
+        raise ExternalAPIError(
+            message="count должен быть в диапазоне от 1 до 1000",
+            endpoint=f"v1/by-iiko/{department_id}/{count}",
+            status_code=400
+        )
+    
+    fields = parse_fields(fields, Review)
+    
+    streaming = stream_format(format, accept)
+    if streaming:
+        logger.info(f"Потоковая выдача отзывов ({streaming}) для department_id={department_id}, "
+                    f"количество: {count}")
+        return await streaming_rows_response(
+            stream_reviews(department_id, count, min_rating=min_rating), REVIEWS, streaming, include=fields
+        )
+    
+    return await _conditional_response(
+        if_none_match,
+        {"fields": fields, "min_rating": min_rating},
+        lambda result: _rows_response(result, ReviewsResponse, fields, min_rating=min_rating),
+        load_reviews, department_id, count
+    )
+
+
 # # СТАРАЯ ФУНКЦИЯ SSE - ЗАМЕНЕНА НА НОВУЮ В sse_service.py
 # # async def generate_sse_stream() -> AsyncGenerator[str, None]:
 # #     """
@@ -0,0 +1,230 @@
+"""
+Фоновые задания для тяжёлых отчётов: постановка в очередь, статус,
+прогресс событиями SSE и скачивание готового результата
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Literal, Optional
+from fastapi import APIRouter, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from loguru import logger
+
+from app.api.v1.endpoints import (
+    export_batches,
+    check_export,
+    check_departments,
+    payroll_pages,
+    payroll_pages_count,
+    PAYROLL_EXPORT_COLUMNS
+)
+from app.models.requests import BatchPeriodRequest, ExportDataset
+from app.models.responses import JobStatus
+from app.core.config import get_settings
+from app.core.exceptions import MCPError
+from app.core.responses import ModelResponse
+from app.services import export, spreadsheet
+from app.services.jobs import job_manager, FINISHED_STATUSES
+
+router = APIRouter(prefix="/api/v1/mcp/jobs", tags=["Jobs"])
+settings = get_settings()
+
+
+async def _counted(items: AsyncIterator, progress: Callable[[int], Awaitable[None]]) -> AsyncIterator:
+    """Отмечает прогресс задания после каждой загруженной части"""
+    try:
+        done = 0
+        async for item in items:
+            done += 1
+            await progress(done)
+            yield item
+    finally:
+        await items.aclose()
+
+
+async def _export_report(params: Dict[str, Any], progress: Callable[[int], Awaitable[None]]) -> AsyncIterator[bytes]:
+    """Выгрузка Arrow IPC / Parquet; прогресс - число выгруженных подразделений"""
+    request = BatchPeriodRequest.model_validate(params["request"])
+    batches = _counted(export_batches(params["dataset"], request), progress)
+    async for chunk in export.encode_batches(batches, export.SCHEMAS[params["dataset"]], params["format"]):
+        yield chunk
+
+
+async def _payroll_report(params: Dict[str, Any], progress: Callable[[int], Awaitable[None]]) -> AsyncIterator[bytes]:
+    """Смены ФОТ в CSV / XLSX; прогресс - число загруженных страниц (подразделение за месяц)"""
+    request = BatchPeriodRequest.model_validate(params["request"])
+    pages = _counted(payroll_pages(request), progress)
+    async for chunk in spreadsheet.encode_rows(pages, PAYROLL_EXPORT_COLUMNS, params["format"], params["delimiter"]):
+        yield chunk
+
+
+job_manager.register("export", _export_report)
+job_manager.register("payroll_export", _payroll_report)
+
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value) if value is not None else None
+
+
+def _status(job: Dict[str, Any]) -> JobStatus:
+    finished_at = job["finished_at"]
+    return JobStatus(
+        job_id=job["job_id"],
+        kind=job["kind"],
+        status=job["status"],
+        progress=job["progress"],
+        total=job["total"],
+        created_at=_timestamp(job["created_at"]),
+        started_at=_timestamp(job["started_at"]),
+        finished_at=_timestamp(finished_at),
+        expires_at=_timestamp(finished_at and finished_at + settings.job_result_ttl),
+        size=job["size"],
+        result_url=f"{router.prefix}/{job['job_id']}/result" if job["status"] == "succeeded" else None,
+        error=job["error"]
+    )
+
+
+def _job(job_id: str) -> Dict[str, Any]:
+    job = job_manager.store.get(job_id)
+    if job is None:
+        raise MCPError(
+            error_type="job_not_found",
+            message="Задание не найдено или срок хранения его результата истёк",
+            details={"job_id": job_id},
+            status_code=404
+        )
+    return job
+
+
+def _accepted(job_id: str) -> ModelResponse:
+    return ModelResponse(
+        _status(_job(job_id)),
+        status_code=202,
+        headers={"Location": f"{router.prefix}/{job_id}"}
+    )
+
+
+@router.post("/export/{dataset}", response_model=JobStatus, status_code=202)
+async def submit_export(
+    dataset: ExportDataset,
+    request: BatchPeriodRequest,
+    format: Literal["arrow", "parquet"] = Query("arrow", description="arrow - поток Arrow IPC, parquet - файл Parquet")
+):
+    """
+    Поставить выгрузку в очередь фоновых заданий.
+    
+    Те же данные, что и у /export/{dataset}, но без ограничения временем
+    запроса: ответ сразу содержит идентификатор задания, результат скачивается
+    по result_url после завершения.
+    """
+    check_export(request, settings.job_max_departments)
+    
+    filename = f"{dataset}_{request.date_start}_{request.date_end}.{export.EXPORT_EXTENSIONS[format]}"
+    job_id = job_manager.submit(
+        "export",
+        {"dataset": dataset, "format": format, "request": request.model_dump(mode="json")},
+        total=len(request.department_ids),
+        media_type=export.EXPORT_MEDIA_TYPES[format],
+        filename=filename
+    )
+    return _accepted(job_id)
+
+
+@router.post("/payroll/export", response_model=JobStatus, status_code=202)
+async def submit_payroll_export(
+    request: BatchPeriodRequest,
+    format: Literal["csv", "xlsx"] = Query("csv", description="csv - CSV в UTF-8, xlsx - книга Excel"),
+    delimiter: Literal[",", ";"] = Query(",", description="Разделитель CSV; ; - для Excel с русской локалью")
+):
+    """
+    Поставить выгрузку смен ФОТ в CSV / XLSX (как /payroll/export) в очередь фоновых заданий
+    """
+    check_departments(request, settings.job_max_departments)
+    
+    job_id = job_manager.submit(
+        "payroll_export",
+        {"format": format, "delimiter": delimiter, "request": request.model_dump(mode="json")},
+        total=payroll_pages_count(request),
+        media_type=spreadsheet.SPREADSHEET_MEDIA_TYPES[format],
+        filename=f"payroll_{request.date_start}_{request.date_end}.{format}"
+    )
+    return _accepted(job_id)
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """
+    Статус задания: прогресс, время выполнения, ошибка и ссылка на результат
+    """
+    return ModelResponse(_status(_job(job_id)))
+
+
+async def _events(job_id: str) -> AsyncIterator[bytes]:
+    """
+    Состояние задания событием progress при каждом изменении и событием done
+    после завершения. Состояние читается из общего хранилища, поэтому поток
+    работает на любом воркере, а не только на выполняющем задание.
+    """
+    last = None
+    idle = 0.0
+    while True:
+        job = job_manager.store.get(job_id)
+        if job is None:
+            return
+        status = _status(job)
+        body = status.__pydantic_serializer__.to_json(status)
+        finished = job["status"] in FINISHED_STATUSES
+        if body != last:
+            yield b"event: " + (b"done" if finished else b"progress") + b"\ndata: " + body + b"\n\n"
+            last = body
+            idle = 0.0
+        elif idle >= settings.job_events_keepalive:
+            # Комментарий SSE не даёт прокси закрыть соединение по таймауту чтения
+            yield b": keepalive\n\n"
+            idle = 0.0
+        if finished:
+            return
+        await asyncio.sleep(settings.job_events_interval)
+        idle += settings.job_events_interval
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Прогресс задания событиями SSE до его завершения
+    """
+    _job(job_id)
+    return StreamingResponse(
+        _events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Скачать результат выполненного задания
+    """
+    job = _job(job_id)
+    if job["status"] != "succeeded":
+        raise MCPError(
+            error_type="job_not_ready",
+            message="Результат задания ещё не готов или задание завершилось без результата",
+            details={"job_id": job_id, "status": job["status"]},
+            status_code=409
+        )
+    return FileResponse(job_manager.result_path(job_id), media_type=job["media_type"], filename=job["filename"])
+
+
+@router.delete("/{job_id}", response_model=JobStatus)
+async def delete_job(job_id: str):
+    """
+    Отменить незавершённое задание или удалить завершённое вместе с результатом
+    """
+    job = _job(job_id)
+    if job["status"] in FINISHED_STATUSES:
+        job_manager.remove(job_id)
+        logger.info(f"Задание {job_id} удалено")
+        return Response(status_code=204)
+    job_manager.cancel(job_id)
+    return ModelResponse(_status(_job(job_id)))
@@ -0,0 +1,356 @@
+"""
+MCP поверх JSON-RPC 2.0 (Streamable HTTP): initialize, tools/list, tools/call
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Type
+from cachetools import TTLCache
+from fastapi import APIRouter, Header, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
+from loguru import logger
+from pydantic import BaseModel, ValidationError as PydanticValidationError
+
+from app.api.v1.endpoints import (
+    FIELDS_QUERY,
+    load_forecast,
+    load_hourly_sales,
+    load_plan_vs_fact,
+    load_payroll,
+    load_department_info,
+    load_reviews,
+    load_snapshot
+)
+from app.api.v1.digests import load_digest
+from app.models.requests import (
+    ForecastRequest,
+    HourlySalesRequest,
+    PlanVsFactRequest,
+    PayrollRequest,
+    DepartmentInfoRequest,
+    ReviewsRequest,
+    SnapshotRequest
+)
+from app.models.responses import ForecastItem, HourlySalesItem, PlanVsFactItem, Review
+from app.core.config import get_settings
+from app.core.exceptions import MCPError, ValidationError
+from app.core.conditional import content_digest
+from app.services import summaries
+from app.utils.projection import parse_fields, rows_include
+from app.utils import json_codec, metrics
+
+router = APIRouter(prefix="/api/v1/mcp", tags=["MCP JSON-RPC"])
+settings = get_settings()
+
+PROTOCOL_VERSION = "2025-03-26"
+# 2025-06-18 убрал пакеты JSON-RPC, на которых построен этот эндпоинт,
+# поэтому клиентам новых ревизий предлагается 2025-03-26
+SUPPORTED_PROTOCOL_VERSIONS = ("2024-11-05", "2025-03-26")
+SERVER_INFO = {"name": "mcp-restaurant-optimizer", "version": "1.0.0"}
+
+# Грубая оценка для бюджета в токенах: байт JSON на токен
+BYTES_PER_TOKEN = 4
+
+# Коды ошибок JSON-RPC 2.0
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class Tool:
+    """
+    Инструмент MCP поверх загрузчика REST эндпоинта: аргументы проверяются
+    моделью запроса эндпоинта, результат - та же модель ответа.
+    Для строковых ответов (item_model) доступен аргумент fields, для
+    инструментов со сводкой (summarize) - бюджет max_bytes / max_tokens.
+    """
+    __slots__ = ("name", "description", "request_model", "load", "item_model", "summarize")
+    
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        request_model: Type[BaseModel],
+        load: Callable[[Any], Awaitable[BaseModel]],
+        item_model: Optional[Type[BaseModel]] = None,
+        summarize: Optional[Callable[[Any, int], Dict[str, Any]]] = None
+    ):
+        self.name = name
+        self.description = description
+        self.request_model = request_model
+        self.load = load
+        self.item_model = item_model
+        self.summarize = summarize
+    
+    def definition(self) -> Dict[str, Any]:
+        schema = self.request_model.model_json_schema()
+        if self.item_model is not None:
+            schema["properties"]["fields"] = {"type": "string", "description": FIELDS_QUERY}
+        if self.summarize is not None:
+            schema["properties"].update(BUDGET_PROPERTIES)
+        return {"name": self.name, "description": self.description, "inputSchema": schema}
+
+
+BUDGET_PROPERTIES = {
+    "max_bytes": {
+        "type": "integer",
+        "minimum": 1,
+        "description": "Бюджет результата в байтах: если строки не помещаются, возвращается сводка"
+    },
+    "max_tokens": {
+        "type": "integer",
+        "minimum": 1,
+        "description": f"Бюджет результата в токенах (оценка: {BYTES_PER_TOKEN} байта на токен)"
+    }
+}
+
+
+def _rows_summary(summarize: Callable[[Any, int], Dict[str, Any]]) -> Callable[[Any, int], Dict[str, Any]]:
+    return lambda result, top: summarize(result.data, top)
+
+
+TOOLS: Dict[str, Tool] = {tool.name: tool for tool in (
+    Tool("get_forecast", "Прогноз продаж по дням для подразделения за период",
+         ForecastRequest, load_forecast, ForecastItem, _rows_summary(summaries.forecast)),
+    Tool("get_hourly_sales", "Почасовые продажи подразделения за период",
+         HourlySalesRequest, load_hourly_sales, HourlySalesItem, _rows_summary(summaries.hourly_sales)),
+    Tool("get_plan_vs_fact", "Сравнение прогноза и факта продаж по дням",
+         PlanVsFactRequest, load_plan_vs_fact, PlanVsFactItem, _rows_summary(summaries.plan_vs_fact)),
+    Tool("get_payroll", "ФОТ сотрудников и смены за период",
+         PayrollRequest, load_payroll, summarize=_rows_summary(summaries.payroll)),
+    Tool("get_department_info", "Информация о подразделении",
+         DepartmentInfoRequest, load_department_info),
+    Tool("get_reviews", "Последние отзывы о подразделении",
+         ReviewsRequest, lambda request: load_reviews(str(request.department_id), request.count), Review,
+         _rows_summary(summaries.reviews)),
+    Tool("get_department_digest", "Готовый дайджест подразделения: прошлая неделя против прогноза, "
+         "пиковые часы, доля ФОТ и динамика отзывов. Отвечает мгновенно, без запросов к внешним API",
+         DepartmentInfoRequest, load_digest),
+    Tool("get_department_snapshot", "Сводка по подразделению за период: информация, прогноз, продажи, план/факт и ФОТ",
+         SnapshotRequest, load_snapshot, summarize=summaries.snapshot)
+)}
+
+# Схемы аргументов строятся один раз
+_TOOL_DEFINITIONS = [tool.definition() for tool in TOOLS.values()]
+
+
+# Сводки по хэшу содержимого результата: одинаковые данные не сводятся повторно,
+# в том числе для некэшируемых загрузчиков (ФОТ), данные которых могут измениться
+_summaries = TTLCache(maxsize=settings.cache_maxsize, ttl=settings.cache_ttl)
+
+
+def summarize(tool: Tool, result: BaseModel, body: bytes) -> Dict[str, Any]:
+    """
+    Сводка результата инструмента; body - полный JSON результата без проекции полей
+    """
+    key = (tool.name, content_digest(body))
+    summary = _summaries.get(key)
+    if summary is None:
+        summary = _summaries[key] = tool.summarize(result, settings.mcp_summary_top_rows)
+        metrics.increment("summaries.computed")
+    else:
+        metrics.increment("summaries.cache_hits")
+    return summary
+
+
+def _budget(arguments: Dict[str, Any]) -> Optional[int]:
+    """
+    Бюджет результата в байтах из max_bytes / max_tokens; из двух берётся меньший
+    """
+    budgets = []
+    for name, scale in (("max_bytes", 1), ("max_tokens", BYTES_PER_TOKEN)):
+        value = arguments.pop(name, None)
+        if value is None:
+            continue
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise RPCError(INVALID_PARAMS, f"{name} должен быть положительным целым числом")
+        budgets.append(value * scale)
+    return min(budgets) if budgets else None
+
+
+async def _initialize(params: Dict[str, Any]) -> Dict[str, Any]:
+    requested = params.get("protocolVersion")
+    return {
+        "protocolVersion": requested if requested in SUPPORTED_PROTOCOL_VERSIONS else PROTOCOL_VERSION,
+        "capabilities": {"tools": {"listChanged": False}},
+        "serverInfo": SERVER_INFO
+    }
+
+
+async def _ping(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {}
+
+
+async def _list_tools(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {"tools": _TOOL_DEFINITIONS}
+
+
+async def _call_tool(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ошибки аргументов - ошибка JSON-RPC, ошибки выполнения (апстрим,
+    дедлайн) - результат с isError, чтобы агент увидел их как ответ инструмента
+    """
+    name = params.get("name")
+    tool = TOOLS.get(name)
+    if tool is None:
+        raise RPCError(INVALID_PARAMS, f"Неизвестный инструмент: {name}")
+    
+    arguments = params.get("arguments") or {}
+    if not isinstance(arguments, dict):
+        raise RPCError(INVALID_PARAMS, "arguments должен быть объектом")
+    arguments = dict(arguments)
+    budget = _budget(arguments) if tool.summarize is not None else None
+    try:
+        fields = parse_fields(arguments.pop("fields", None), tool.item_model) if tool.item_model else None
+        request = tool.request_model.model_validate(arguments)
+    except PydanticValidationError as e:
+        raise RPCError(INVALID_PARAMS, "Некорректные аргументы инструмента",
+                       jsonable_encoder(e.errors(include_url=False, include_context=False)))
+    except ValidationError as e:
+        raise RPCError(INVALID_PARAMS, e.detail["error"]["message"], e.detail["error"])
+    
+    try:
+        result = await tool.load(request)
+    except MCPError as e:
+        return {"content": [{"type": "text", "text": json_codec.dumps(e.detail).decode()}], "isError": True}
+    
+    body = result.__pydantic_serializer__.to_json(result, include=rows_include(fields))
+    if budget is not None and len(body) > budget:
+        # Вместо строк, которые не поместятся в контекст агента, - сводка
+        logger.info(f"Результат {tool.name} ({len(body)} байт) превышает бюджет {budget} байт, отдаём сводку")
+        full_body = body if fields is None else result.__pydantic_serializer__.to_json(result)
+        summary = {
+            "summarized": True,
+            "result_bytes": len(body),
+            "budget_bytes": budget,
+            **summarize(tool, result, full_body)
+        }
+        body = summaries.fit_budget(summary, budget)
+        if body is None:
+            error = MCPError(
+                error_type="result_too_large",
+                message=f"Итоги результата {tool.name} не помещаются в бюджет {budget} байт",
+                details={"result_bytes": summary["result_bytes"], "budget_bytes": budget},
+                status_code=413
+            )
+            return {"content": [{"type": "text", "text": json_codec.dumps(error.detail).decode()}], "isError": True}
+    return {"content": [{"type": "text", "text": body.decode()}], "isError": False}
+
+
+_METHODS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    "initialize": _initialize,
+    "ping": _ping,
+    "tools/list": _list_tools,
+    "tools/call": _call_tool
+}
+
+
+def _error(id: Any, code: int, message: str, data: Any = None) -> Dict[str, Any]:
+    error = {"code": code, "message": message}
+    if data is not None:
+        error["data"] = data
+    return {"jsonrpc": "2.0", "id": id, "error": error}
+
+
+async def handle_message(message: Any) -> Optional[Dict[str, Any]]:
+    """
+    Один запрос JSON-RPC -> ответ; для уведомлений и ответов клиента - None
+    """
+    if not isinstance(message, dict) or message.get("jsonrpc") != "2.0":
+        return _error(None, INVALID_REQUEST, "Некорректный запрос JSON-RPC")
+    if "method" not in message and ("result" in message or "error" in message):
+        return None
+    
+    method = message.get("method")
+    notification = "id" not in message
+    id = message.get("id")
+    if not isinstance(method, str):
+        return _error(id, INVALID_REQUEST, "Некорректный запрос JSON-RPC")
+    
+    handler = _METHODS.get(method)
+    if notification:
+        # notifications/initialized, notifications/cancelled и прочие не требуют ответа
+        return None
+    if handler is None:
+        return _error(id, METHOD_NOT_FOUND, f"Метод не найден: {method}")
+    
+    params = message.get("params") or {}
+    if not isinstance(params, dict):
+        return _error(id, INVALID_PARAMS, "params должен быть объектом")
+    
+    try:
+        return {"jsonrpc": "2.0", "id": id, "result": await handler(params)}
+    except RPCError as e:
+        return _error(id, e.code, e.message, e.data)
+    except Exception as e:
+        logger.exception(f"Ошибка выполнения {method}: {e}")
+        return _error(id, INTERNAL_ERROR, "Внутренняя ошибка сервера")
+
+
+def _json(data: Any) -> Response:
+    # JSON-RPC всегда в JSON, независимо от согласованного формата REST ответов
+    return Response(content=json_codec.dumps(data), media_type="application/json")
+
+
+async def _sse(tasks: List[asyncio.Task]) -> AsyncIterator[bytes]:
+    """
+    Ответы пакета событиями SSE по мере готовности: быстрые инструменты
+    не ждут медленных
+    """
+    try:
+        for completed in asyncio.as_completed(tasks):
+            response = await completed
+            if response is not None:
+                yield b"event: message\ndata: " + json_codec.dumps(response) + b"\n\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/rpc")
+async def mcp_rpc(request: Request, accept: Optional[str] = Header(None)):
+    """
+    MCP JSON-RPC: один запрос или пакет.
+    
+    Вызовы пакета выполняются конкурентно (не более mcp_batch_max_concurrency
+    одновременно) через те же кэшированные загрузчики, что и REST эндпоинты,
+    поэтому одинаковые вызовы делят кэш и одну загрузку. Если клиент принимает
+    text/event-stream, ответы пакета приходят событиями SSE по мере готовности.
+    """
+    try:
+        payload = json_codec.loads(await request.body())
+    except ValueError:
+        return _json(_error(None, PARSE_ERROR, "Тело запроса не является JSON"))
+    
+    if not isinstance(payload, list):
+        response = await handle_message(payload)
+        return _json(response) if response is not None else Response(status_code=202)
+    
+    if not payload:
+        return _json(_error(None, INVALID_REQUEST, "Пустой пакет запросов"))
+    if len(payload) > settings.mcp_batch_max_calls:
+        return _json(_error(None, INVALID_REQUEST, f"Не более {settings.mcp_batch_max_calls} запросов в пакете"))
+    
+    semaphore = asyncio.Semaphore(settings.mcp_batch_max_concurrency)
+    
+    async def limited(message: Any) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            return await handle_message(message)
+    
+    logger.info(f"Пакет MCP JSON-RPC из {len(payload)} запросов")
+    if accept and "text/event-stream" in accept and len(payload) > 1:
+        tasks = [asyncio.create_task(limited(message)) for message in payload]
+        return StreamingResponse(_sse(tasks), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    
+    responses = await asyncio.gather(*(limited(message) for message in payload))
+    responses = [response for response in responses if response is not None]
+    return _json(responses) if responses else Response(status_code=202)
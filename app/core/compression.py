@@ -0,0 +1,94 @@
+"""
+Сжатие ответов: gzip или brotli по заголовку Accept-Encoding
+"""
+import zlib
+from contextvars import ContextVar, Token
+from typing import Optional
+
+# brotli даёт ответы меньше gzip, но остаётся опциональной зависимостью
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Кодировки в порядке предпочтения сервера
+_ENCODINGS = ("br", "gzip")
+
+# Кодировка ответа текущего запроса; выставляется CompressionMiddleware
+_encoding: ContextVar[Optional[str]] = ContextVar("response_encoding", default=None)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Кодировка из принимаемых клиентом (q > 0) в порядке предпочтения сервера;
+    None - ответ не сжимается
+    """
+    if not accept_encoding:
+        return None
+    
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    
+    for encoding in _ENCODINGS:
+        if encoding == "br" and not BROTLI_AVAILABLE:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def set_encoding(encoding: Optional[str]) -> Token:
+    return _encoding.set(encoding)
+
+
+def reset_encoding(token: Token):
+    _encoding.reset(token)
+
+
+def current_encoding() -> Optional[str]:
+    return _encoding.get()
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """
+    Тело ответа целиком: gzip (level 1-9) или brotli (quality 0-11)
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class StreamCompressor:
+    """
+    Сжатие потокового ответа по частям. Каждая часть сбрасывается сразу,
+    чтобы клиент получал строки NDJSON по мере выдачи, а не после буферизации.
+    """
+    
+    def __init__(self, encoding: str, level: int):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        self._brotli = encoding == "br"
+    
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli:
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli:
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
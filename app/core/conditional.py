@@ -0,0 +1,59 @@
+"""
+Условные запросы к MCP эндпоинтам: ETag и If-None-Match
+"""
+import hashlib
+import json
+from typing import Any, Mapping, Optional
+from fastapi.responses import Response
+
+from app.core import compression, negotiation
+
+
+def content_digest(data: bytes) -> str:
+    """
+    Дешёвый хэш содержимого (blake2b, 128 бит)
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _variant_key(variant: Mapping[str, Any]) -> str:
+    # Множества сортируются: порядок их обхода зависит от PYTHONHASHSEED и различается между воркерами
+    return json.dumps(
+        {name: sorted(value) if isinstance(value, (set, frozenset)) else value for name, value in variant.items()},
+        sort_keys=True,
+        default=str
+    )
+
+
+def entity_tag(digest: str, variant: Optional[Mapping[str, Any]] = None) -> str:
+    """
+    ETag ответа: хэш данных и варианта их представления - формата и сжатия
+    ответа, выбранных полей и фильтров. Разные представления одних данных
+    получают разные ETag, поэтому сжатый ответ сохраняет сильный ETag.
+    """
+    media_type = negotiation.current_media_type()
+    key = f"{digest}|{media_type}|{compression.current_encoding()}|{_variant_key(variant or {})}"
+    return f'"{content_digest(key.encode())}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Слабое сравнение для If-None-Match (RFC 9110): префикс W/ не учитывается, * совпадает с любым
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Пустой ответ 304: у клиента уже актуальная версия.
+    
+    Vary: Accept и Accept-Encoding, как у ответа 200, добавляют
+    ContentNegotiationMiddleware и CompressionMiddleware.
+    """
+    return Response(status_code=304, headers={"ETag": etag})
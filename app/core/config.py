@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -7,6 +8,7 @@ class Settings(BaseSettings):
     aqniet_api_url: str = "https://aqniet.site/api"
     aqniet_api_token: str
     madlen_api_url: str = "https://madlen.space/api"
+    reviews_api_url: str = "https://reviews.aqniet.site/api"
     
     # Server Configuration
     host: str = "0.0.0.0"
@@ -15,10 +17,126 @@ class Settings(BaseSettings):
     
     # Cache Configuration
     cache_ttl: int = 1800  # 30 minutes
+    cache_maxsize: int = 1000  # long periods are cached per month, so entries add up
+    
+    # Conditional GET (ETag / Last-Modified) for upstream responses
+    upstream_revalidation_ttl: int = 86400  # 24 hours
+    upstream_revalidation_maxsize: int = 256
     
     # API Timeout
     api_timeout: float = 30.0
     
+    # Adaptive per-endpoint upstream timeouts: quantile(latency) * factor,
+    # clamped to [min, max]; api_timeout is used until enough samples exist.
+    # Static overrides: UPSTREAM_TIMEOUT_OVERRIDES='{"forecast/comparison": 90}'
+    upstream_adaptive_timeouts: bool = True
+    upstream_timeout_quantile: float = 0.999
+    upstream_timeout_factor: float = 3.0
+    upstream_timeout_min: float = 2.0
+    upstream_timeout_max: float = 120.0
+    upstream_latency_window: int = 1000
+    upstream_latency_min_samples: int = 50
+    upstream_timeout_overrides: Dict[str, float] = {}
+    
+    # End-to-end request deadline (seconds): X-Request-Timeout header or
+    # request_timeout query parameter, else per-route default; 0 means none
+    request_timeout_default: float = 0.0
+    request_timeout_routes: Dict[str, float] = {}
+    request_timeout_max: float = 300.0
+    
+    # Shared upstream connection pool
+    upstream_max_connections: int = 100
+    upstream_keepalive_connections: int = 20
+    upstream_keepalive_expiry: float = 60.0
+    upstream_prewarm_connections: int = 2  # per upstream host, 0 disables warm-up
+    upstream_prewarm_timeout: float = 10.0
+    dns_cache_ttl: int = 300
+    
+    # Upstream JSON decoding: bodies of this size and larger are parsed
+    # in a thread pool (0 disables offloading)
+    json_offload_threshold: int = 262144  # 256 KB
+    
+    # Streaming upstream parsing for large arrays
+    stream_hourly_min_days: int = 60
+    stream_reviews_min_count: int = 200
+    
+    # Pass-through of upstream bodies for endpoints that return them unchanged
+    # (payroll, department_info): validated without building dicts, sent as is
+    passthrough_responses: bool = False
+    passthrough_validation_sample: int = 20  # 0 validates the whole body
+    
+    # Long periods of sales/hourly, forecast/batch and forecast/comparison are
+    # fetched in parts (calendar months when chunk_days is 0), concurrently
+    # and cached per part; a failed part is retried on its own
+    upstream_chunk_min_days: int = 93  # 0 disables chunking
+    upstream_chunk_days: int = 0
+    upstream_chunk_concurrency: int = 4
+    upstream_chunk_retries: int = 2
+    upstream_chunk_retry_delay: float = 0.5  # doubled on every attempt
+    
+    # Multi-department batch endpoints: departments per request and how
+    # many of them are loaded concurrently
+    batch_max_departments: int = 100
+    batch_max_concurrency: int = 8
+    
+    # Arrow IPC / Parquet export (requires pyarrow): departments per request
+    export_max_departments: int = 500
+    
+    # Department snapshot: time limit for each part (seconds)
+    snapshot_part_timeout: float = 30.0
+    
+    # Per-department digests (last week vs forecast, peak hours, payroll share,
+    # review trend) precomputed nightly at digest_hour local time, stored in
+    # SQLite and served by /digest/{department_id}; empty list disables the job
+    digest_department_ids: List[str] = []
+    digest_db_path: str = "data/digests.sqlite3"
+    digest_hour: int = 3
+    digest_concurrency: int = 4
+    digest_reviews_count: int = 200
+    # A worker claims a department before computing its digest; a claim left by
+    # a stopped worker expires after digest_claim_timeout seconds
+    digest_claim_timeout: int = 900
+    
+    # Background jobs for heavy reports (long-period / many-department exports):
+    # a bounded worker pool per process, job state in SQLite shared by all
+    # workers, results on disk removed job_result_ttl seconds after completion
+    job_workers: int = 2
+    job_queue_size: int = 100
+    job_max_departments: int = 5000
+    job_timeout: float = 3600.0  # deadline of a single job
+    job_db_path: str = "data/jobs.sqlite3"
+    job_results_dir: str = "data/jobs"
+    job_result_ttl: int = 86400
+    job_cleanup_interval: float = 60.0
+    # Unfinished jobs whose process stopped heartbeating are marked failed
+    job_heartbeat_timeout: float = 300.0
+    # Progress stream: store polling interval and keep-alive comments for proxies
+    job_events_interval: float = 0.5
+    job_events_keepalive: float = 15.0
+    
+    # MCP JSON-RPC endpoint: requests per batch and how many of them run concurrently
+    mcp_batch_max_calls: int = 50
+    mcp_batch_max_concurrency: int = 8
+    # Rows with the highest / lowest values kept in summaries of results
+    # that exceed the caller's max_bytes / max_tokens budget
+    mcp_summary_top_rows: int = 5
+    
+    # Response compression: gzip, or brotli when installed, for bodies of the
+    # allowed content types from min_size bytes; streamed bodies are compressed
+    # chunk by chunk. Cached responses (with an ETag) are compressed once
+    compression_enabled: bool = True
+    compression_min_size: int = 1024
+    compression_media_types: List[str] = [
+        "application/json",
+        "application/msgpack",
+        "application/x-ndjson",
+        "text/csv",
+        "text/html",
+        "text/plain"
+    ]
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 5
+    
     model_config = SettingsConfigDict(env_file=".env")
 
 
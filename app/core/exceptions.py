@@ -56,4 +56,24 @@ class ValidationError(MCPError):
             message=message,
             details=details,
             status_code=400  # Bad Request
-        )
\ No newline at end of file
+        )
+
+
+class DeadlineExceededError(MCPError):
+    def __init__(self, stage: str):
+        super().__init__(
+            error_type="deadline_exceeded",
+            message="Истекло время, отведённое клиентом на запрос",
+            details={"stage": stage},
+            status_code=504  # Gateway Timeout
+        )
+
+
+class FeatureUnavailableError(MCPError):
+    def __init__(self, feature: str, dependency: str):
+        super().__init__(
+            error_type="feature_unavailable",
+            message=f"{feature} недоступна: не установлен {dependency}",
+            details={"dependency": dependency},
+            status_code=501  # Not Implemented
+        )
@@ -0,0 +1,264 @@
+"""
+ASGI middleware приложения
+"""
+import asyncio
+from typing import Optional
+from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.core.exceptions import DeadlineExceededError
+from app.core.responses import FastJSONResponse
+from app.core.negotiation import negotiate, set_media_type, reset_media_type
+from app.core import compression
+from app.utils.cache import cache_manager
+from app.utils.deadline import set_deadline, reset_deadline
+from app.utils import metrics
+
+
+class DeadlineMiddleware:
+    """
+    Задаёт сквозной дедлайн запроса и прерывает обработку, когда он истекает.
+    
+    Бюджет берётся из заголовка X-Request-Timeout или параметра request_timeout
+    (в секундах), иначе из значения по умолчанию для маршрута. Кэш и HTTPClient
+    видят оставшийся бюджет через app.utils.deadline.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.settings = get_settings()
+    
+    def _timeout_for(self, scope: Scope) -> Optional[float]:
+        value = Headers(scope=scope).get("x-request-timeout")
+        if value is None:
+            value = QueryParams(scope.get("query_string", b"")).get("request_timeout")
+        
+        if value is not None:
+            try:
+                timeout = float(value)
+            except ValueError:
+                logger.debug(f"Некорректный бюджет запроса: {value!r}")
+            else:
+                if timeout > 0:
+                    return min(timeout, self.settings.request_timeout_max)
+        
+        timeout = self.settings.request_timeout_routes.get(scope["path"], self.settings.request_timeout_default)
+        return timeout or None
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        timeout = self._timeout_for(scope)
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+        
+        response_started = False
+        
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        token = set_deadline(timeout)
+        try:
+            async with asyncio.timeout(timeout):
+                await self.app(scope, receive, send_wrapper)
+        except TimeoutError:
+            logger.warning(f"Дедлайн {timeout:.2f}s истёк для {scope['path']}, обработка прервана")
+            if not response_started:
+                error = DeadlineExceededError("request")
+                response = FastJSONResponse(status_code=error.status_code, content=error.detail)
+                await response(scope, receive, send)
+        finally:
+            reset_deadline(token)
+
+
+class DisconnectMiddleware:
+    """
+    Отменяет обработку запроса, когда клиент отключился, не дождавшись ответа.
+    
+    Единственный читатель receive сервера - фоновая задача: сообщения запроса
+    передаются приложению через очередь, а http.disconnect до завершения ответа
+    отменяет задачу приложения. Загрузки в кэше, которые больше никто не ждёт,
+    отменяются вслед за ней (см. CacheManager).
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        messages: asyncio.Queue = asyncio.Queue()
+        response_complete = False
+        client_disconnected = False
+        
+        async def send_wrapper(message: Message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+        
+        app_task = asyncio.create_task(self.app(scope, messages.get, send_wrapper))
+        
+        async def watch_disconnect():
+            nonlocal client_disconnected
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not response_complete and not app_task.done():
+                        client_disconnected = True
+                        app_task.cancel()
+                    return
+        
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not client_disconnected:
+                raise
+            metrics.increment("disconnect.requests_cancelled")
+            logger.info(f"Клиент отключился, обработка {scope['path']} отменена")
+        finally:
+            watcher.cancel()
+
+
+class ContentNegotiationMiddleware:
+    """
+    Выбирает формат ответа (JSON или MessagePack) по заголовку Accept.
+    
+    Формат хранится в contextvar (app.core.negotiation), его читают классы
+    ответов при кодировании, в том числе ответов с ошибками. К ответам
+    добавляется Vary: Accept.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.add_vary_header("Accept")
+            await send(message)
+        
+        token = set_media_type(negotiate(Headers(scope=scope).get("accept")))
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_media_type(token)
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы gzip или brotli (если установлен) по заголовку Accept-Encoding.
+    
+    Сжимаются только типы содержимого из compression_media_types: тела целиком
+    от compression_min_size байт, потоковые ответы - по частям со сбросом
+    каждой части. Тело ответа с сильным ETag сжимается один раз и хранится
+    в cache_manager, повторные ответы отдают готовые байты. К сжимаемым
+    ответам и к ответам 304 добавляется Vary: Accept-Encoding.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.settings = get_settings()
+        self.media_types = frozenset(self.settings.compression_media_types)
+    
+    def _level(self, encoding: str) -> int:
+        if encoding == "br":
+            return self.settings.compression_brotli_quality
+        return self.settings.compression_gzip_level
+    
+    def _compressible(self, message: Message, headers: MutableHeaders) -> bool:
+        status = message["status"]
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+        return media_type in self.media_types
+    
+    def _compress_body(self, body: bytes, encoding: str, headers: MutableHeaders) -> bytes:
+        level = self._level(encoding)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            return cache_manager.compressed_body(
+                etag, encoding, body, lambda data: compression.compress(data, encoding, level)
+            )
+        return compression.compress(body, encoding, level)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.settings.compression_enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        encoding = compression.choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        start_message: Optional[Message] = None
+        compressor: Optional[compression.StreamCompressor] = None
+        
+        async def send_wrapper(message: Message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                # Заголовки отправляются вместе с первой частью тела,
+                # когда уже известно, сжимать ли ответ
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            
+            if start_message is None:
+                if compressor is not None:
+                    data = compressor.compress(body) if more_body else compressor.finish(body)
+                    message = {"type": "http.response.body", "body": data, "more_body": more_body}
+                await send(message)
+                return
+            
+            start, start_message = start_message, None
+            headers = MutableHeaders(scope=start)
+            if start["status"] == 304:
+                # 304 несёт тот же Vary, что и 200 с этим ETag: ETag зависит от сжатия
+                headers.add_vary_header("Accept-Encoding")
+            if not self._compressible(start, headers):
+                await send(start)
+                await send(message)
+                return
+            
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is None or (not more_body and len(body) < self.settings.compression_min_size):
+                await send(start)
+                await send(message)
+                return
+            
+            headers["Content-Encoding"] = encoding
+            if more_body:
+                compressor = compression.StreamCompressor(encoding, self._level(encoding))
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                data = compressor.compress(body)
+            else:
+                data = self._compress_body(body, encoding, headers)
+                headers["Content-Length"] = str(len(data))
+            await send(start)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+        
+        token = compression.set_encoding(encoding)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            compression.reset_encoding(token)
\ No newline at end of file
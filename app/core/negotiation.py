@@ -0,0 +1,67 @@
+"""
+Согласование формата ответа по заголовку Accept: JSON или MessagePack
+"""
+from contextvars import ContextVar, Token
+from typing import Any, Optional
+
+from app.utils import json_codec
+
+# msgpack нужен только клиентам, запросившим его, и остаётся опциональной зависимостью
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+# Формат ответа текущего запроса; выставляется ContentNegotiationMiddleware
+_media_type: ContextVar[str] = ContextVar("response_media_type", default=JSON_MEDIA_TYPE)
+
+
+def _quality(params) -> float:
+    for param in params:
+        name, _, value = param.strip().partition("=")
+        if name == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    MessagePack, если клиент явно его принимает и он установлен, иначе JSON
+    """
+    if accept and MSGPACK_AVAILABLE:
+        for part in accept.split(","):
+            media_type, *params = part.split(";")
+            if media_type.strip().lower() in _MSGPACK_MEDIA_TYPES and _quality(params) > 0:
+                return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def set_media_type(media_type: str) -> Token:
+    return _media_type.set(media_type)
+
+
+def reset_media_type(token: Token):
+    _media_type.reset(token)
+
+
+def wants_msgpack() -> bool:
+    return _media_type.get() == MSGPACK_MEDIA_TYPE
+
+
+def packb(data: Any) -> bytes:
+    """
+    Кодирует данные в MessagePack; даты, UUID и прочие типы приводятся так же, как в JSON
+    """
+    return msgpack.packb(data, default=json_codec.encode_default, use_bin_type=True)
+
+
+def current_media_type() -> str:
+    return _media_type.get()
@@ -0,0 +1,97 @@
+"""
+Классы HTTP-ответов API
+"""
+import asyncio
+from typing import Any, Mapping, Optional, Type
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from app.core import negotiation
+from app.core.config import get_settings
+from app.utils import json_codec
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON-ответ по умолчанию: кодируется сразу в байты через json_codec
+    (orjson, если установлен), кириллица не экранируется.
+    Клиенты, запросившие MessagePack, получают те же данные в нём.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        if negotiation.wants_msgpack():
+            # render вызывается до формирования заголовков
+            self.media_type = negotiation.MSGPACK_MEDIA_TYPE
+            return negotiation.packb(content)
+        return json_codec.dumps(content)
+
+
+class ModelResponse(Response):
+    """
+    Ответ из уже провалидированной модели pydantic.
+    
+    Модель сериализуется в JSON напрямую в pydantic-core; FastAPI не проверяет
+    возвращённый Response повторно по response_model. include ограничивает
+    выводимые поля так же, как в model_dump.
+    """
+    media_type = "application/json"
+    
+    def __init__(
+        self,
+        model: BaseModel,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        include: Optional[Mapping[str, Any]] = None
+    ):
+        if negotiation.wants_msgpack():
+            self.media_type = negotiation.MSGPACK_MEDIA_TYPE
+            content = negotiation.packb(model.model_dump(mode="json", include=include))
+        else:
+            content = model.__pydantic_serializer__.to_json(model, include=include)
+        super().__init__(
+            content=content,
+            status_code=status_code,
+            headers=headers
+        )
+
+
+class PassthroughResponse(Response):
+    """
+    Тело ответа внешнего API, отдаваемое клиенту без повторной сериализации
+    """
+    media_type = "application/json"
+
+
+async def passthrough_response(body: bytes, model: Type[BaseModel], sample_size: int = 0) -> PassthroughResponse:
+    """
+    Проверяет форму тела апстрима моделью ответа и отдаёт исходные байты как есть.
+    
+    При sample_size=0 тело валидируется целиком напрямую из JSON в pydantic-core,
+    иначе проверяется структура верхнего уровня и первые sample_size элементов "data".
+    Тела от json_offload_threshold разбираются в пуле потоков.
+    FastAPI не валидирует и не кодирует такой ответ повторно.
+    """
+    if sample_size:
+        data = await json_codec.loads_async(body)
+        if isinstance(data, dict) and isinstance(data.get("data"), list):
+            data = {**data, "data": data["data"][:sample_size]}
+        model.model_validate(data)
+    else:
+        threshold = get_settings().json_offload_threshold
+        if threshold and len(body) >= threshold:
+            await asyncio.to_thread(model.model_validate_json, body)
+        else:
+            model.model_validate_json(body)
+    
+    return PassthroughResponse(content=body)
+
+
+def negotiated_passthrough(response: PassthroughResponse) -> PassthroughResponse:
+    """
+    Новый ответ для текущего запроса из закэшированного: байты апстрима
+    отдаются как есть только в JSON, MessagePack кодируется из них на лету.
+    Закэшированный ответ не изменяется и не зависит от формата запроса, который его загрузил.
+    """
+    if negotiation.wants_msgpack():
+        return PassthroughResponse(content=negotiation.packb(json_codec.loads(response.body)), media_type=negotiation.MSGPACK_MEDIA_TYPE)
+    return PassthroughResponse(content=response.body)
@@ -0,0 +1,98 @@
+"""
+Потоковая выдача строк ответа: NDJSON и JSON-массив по частям
+"""
+from typing import AsyncIterator, Optional, Set
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from pydantic import TypeAdapter
+
+from app.core.exceptions import MCPError
+from app.utils import json_codec
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Значения параметра format для потоковой выдачи
+STREAM_FORMATS = ("ndjson", "json-stream")
+
+
+def stream_format(format: Optional[str] = None, accept: Optional[str] = None) -> Optional[str]:
+    """
+    Режим потоковой выдачи: явный параметр format (любой, в том числе
+    не потоковый, имеет приоритет), иначе заголовок Accept.
+    None - обычный ответ целиком.
+    """
+    if format is not None:
+        return format if format in STREAM_FORMATS else None
+    if accept and any(media_type in accept for media_type in (NDJSON_MEDIA_TYPE, "application/ndjson")):
+        return "ndjson"
+    return None
+
+
+async def _ndjson(first: list, batches: AsyncIterator[list], include: Optional[Set[str]]) -> AsyncIterator[bytes]:
+    batch = first
+    try:
+        while True:
+            if batch:
+                yield b"".join(item.__pydantic_serializer__.to_json(item, include=include) + b"\n" for item in batch)
+            batch = await batches.__anext__()
+    except StopAsyncIteration:
+        pass
+    except MCPError as e:
+        # Статус уже отправлен - сообщаем об ошибке последней строкой
+        logger.error(f"Ошибка потоковой выдачи: {e.detail}")
+        yield json_codec.dumps(e.detail) + b"\n"
+    finally:
+        await batches.aclose()
+
+
+async def _json_array(
+    first: list,
+    batches: AsyncIterator[list],
+    adapter: TypeAdapter,
+    include: Optional[Set[str]]
+) -> AsyncIterator[bytes]:
+    # Тот же документ {"data": [...]}, что и без потоковой выдачи
+    yield b'{"data":['
+    separator = b""
+    batch = first
+    try:
+        while True:
+            if batch:
+                yield separator + adapter.dump_json(batch, include=include and {"__all__": include})[1:-1]
+                separator = b","
+            batch = await batches.__anext__()
+    except StopAsyncIteration:
+        pass
+    except MCPError as e:
+        # Документ остаётся незакрытым, клиент увидит обрыв JSON
+        logger.error(f"Ошибка потоковой выдачи: {e.detail}")
+        return
+    finally:
+        await batches.aclose()
+    yield b"]}"
+
+
+async def streaming_rows_response(
+    batches: AsyncIterator[list],
+    adapter: TypeAdapter,
+    format: str,
+    include: Optional[Set[str]] = None
+) -> StreamingResponse:
+    """
+    Отдаёт пачки провалидированных строк по мере их поступления;
+    include ограничивает поля каждой строки.
+    
+    Первая пачка загружается до начала ответа, поэтому ошибки апстрима,
+    возникшие до первой строки, возвращаются с обычным статусом ошибки.
+    """
+    try:
+        first = await batches.__anext__()
+    except StopAsyncIteration:
+        first = []
+    except BaseException:
+        await batches.aclose()
+        raise
+    
+    if format == "ndjson":
+        return StreamingResponse(_ndjson(first, batches, include), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(_json_array(first, batches, adapter, include), media_type="application/json")
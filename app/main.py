@@ -1,14 +1,25 @@
 from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from loguru import logger
+import asyncio
 import sys
 
 from app.core.config import get_settings
 from app.core.exceptions import MCPError
+from app.core.responses import FastJSONResponse
+from app.core.middleware import DeadlineMiddleware, DisconnectMiddleware, ContentNegotiationMiddleware, CompressionMiddleware
 from app.api.v1.endpoints import router as v1_router
 from app.api.v1.sse_endpoints import router as sse_router
+from app.api.v1.jsonrpc import router as jsonrpc_router
+from app.api.v1.digests import router as digests_router, build_digest_body
+from app.api.v1.jobs import router as jobs_router
+from app.services.digests import digest_store, run_nightly
+from app.services.jobs import job_manager
+from app.services.http_client import upstream_pool, upstream_timeouts
+from app.utils import metrics
 
 # Настройка логирования
 logger.remove()
@@ -18,11 +29,43 @@ logger.add(
     level="DEBUG" if get_settings().debug else "INFO"
 )
 
+async def warm_up_upstreams(app: FastAPI):
+    """
+    Прогрев DNS и соединений к внешним API; до его завершения /ready отвечает 503
+    """
+    try:
+        await asyncio.wait_for(upstream_pool.warm_up(), timeout=get_settings().upstream_prewarm_timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Прогрев соединений не завершился за отведённое время")
+    except Exception as e:
+        logger.error(f"Ошибка прогрева соединений: {e}")
+    finally:
+        app.state.ready = True
+
+
 # Контекстный менеджер для жизненного цикла приложения
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting MCP Restaurant Optimizer API")
+    app.state.ready = False
+    await upstream_pool.open()
+    warm_up_task = asyncio.create_task(warm_up_upstreams(app))
+    # Ночной пересчёт дайджестов подразделений
+    digest_task = None
+    if get_settings().digest_department_ids:
+        digest_task = asyncio.create_task(run_nightly(build_digest_body))
+    # Воркеры фоновых заданий и удаление результатов с истёкшим сроком хранения
+    job_manager.start()
+    jobs_cleanup_task = asyncio.create_task(job_manager.run_cleanup())
     yield
+    jobs_cleanup_task.cancel()
+    await job_manager.stop()
+    job_manager.store.close()
+    warm_up_task.cancel()
+    if digest_task is not None:
+        digest_task.cancel()
+    digest_store.close()
+    await upstream_pool.close()
     logger.info("Shutting down MCP Restaurant Optimizer API")
 
 # Создание приложения
@@ -31,10 +74,21 @@ app = FastAPI(
     description="FastAPI сервер для оптимизации графиков ресторана через MCP интерфейс",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc"
 )
 
+# Сквозной дедлайн запроса и отмена работы при отключении клиента
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(DisconnectMiddleware)
+
+# JSON или MessagePack по заголовку Accept
+app.add_middleware(ContentNegotiationMiddleware)
+
+# Сжатие ответов gzip / brotli по заголовку Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -42,25 +96,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Подключение роутеров
 app.include_router(v1_router)
 app.include_router(sse_router)
+app.include_router(jsonrpc_router)
+app.include_router(digests_router)
+app.include_router(jobs_router)
 
 # Глобальный обработчик ошибок
 @app.exception_handler(MCPError)
 async def mcp_error_handler(request: Request, exc: MCPError):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content=exc.detail
     )
 
+# Ошибки валидации запроса в согласованном формате ответа
+@app.exception_handler(RequestValidationError)
+async def validation_error_handler(request: Request, exc: RequestValidationError):
+    return FastJSONResponse(
+        status_code=422,
+        content={"detail": jsonable_encoder(exc.errors())}
+    )
+
 # Общий обработчик непредвиденных ошибок
 @app.exception_handler(Exception)
 async def general_error_handler(request: Request, exc: Exception):
     logger.error(f"Unexpected error: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=500,
         content={
             "error": {
@@ -89,4 +155,24 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "mcp-restaurant-optimizer"
+    }
+
+# Readiness: трафик можно направлять после прогрева соединений к внешним API
+@app.get("/ready")
+async def readiness_check():
+    ready = getattr(app.state, "ready", False)
+    return FastJSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "warming_up",
+            "service": "mcp-restaurant-optimizer"
+        }
+    )
+
+# Счётчики работы сервиса и статистика задержек внешних API
+@app.get("/metrics")
+async def service_metrics():
+    return {
+        "counters": metrics.snapshot(),
+        "upstream_latency": upstream_timeouts.stats()
     }
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
 from datetime import date
-from typing import Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 
 
@@ -56,6 +56,45 @@ class PayrollRequest(BaseModel):
         return v
 
 
+class BatchPeriodRequest(BaseModel):
+    department_ids: List[UUID] = Field(..., min_length=1, description="UUID подразделений")
+    date_start: date = Field(..., description="Дата начала периода")
+    date_end: date = Field(..., description="Дата окончания периода")
+    
+    @field_validator('department_ids')
+    @classmethod
+    def unique_department_ids(cls, v: List[UUID]) -> List[UUID]:
+        # Повторы не загружаются дважды, порядок сохраняется
+        return list(dict.fromkeys(v))
+    
+    @field_validator('date_end')
+    @classmethod
+    def validate_date_range(cls, v: date, info) -> date:
+        if 'date_start' in info.data and v < info.data['date_start']:
+            raise ValueError('date_end должна быть больше или равна date_start')
+        return v
+
+
+SnapshotPart = Literal["department_info", "forecast", "hourly_sales", "plan_vs_fact", "payroll"]
+
+ExportDataset = Literal["forecast", "hourly_sales", "plan_vs_fact", "payroll_shifts"]
+
+
+class SnapshotRequest(BaseModel):
+    department_id: UUID = Field(..., description="UUID подразделения")
+    date_start: date = Field(..., description="Дата начала периода")
+    date_end: date = Field(..., description="Дата окончания периода")
+    parts: Optional[List[SnapshotPart]] = Field(None, min_length=1, description="Части снимка, по умолчанию все")
+    part_timeout: Optional[float] = Field(None, gt=0, description="Таймаут каждой части в секундах")
+    
+    @field_validator('date_end')
+    @classmethod
+    def validate_date_range(cls, v: date, info) -> date:
+        if 'date_start' in info.data and v < info.data['date_start']:
+            raise ValueError('date_end должна быть больше или равна date_start')
+        return v
+
+
 class DepartmentInfoRequest(BaseModel):
     department_id: UUID = Field(..., description="UUID подразделения")
 
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from datetime import date, datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
+from uuid import UUID
 
 
 class ForecastItem(BaseModel):
@@ -70,6 +71,54 @@ class ErrorResponse(BaseModel):
     error: ErrorDetail
 
 
+class ForecastBatchItem(BaseModel):
+    department_id: UUID
+    data: Optional[List[ForecastItem]] = None
+    error: Optional[ErrorDetail] = None
+
+
+class ForecastBatchResponse(BaseModel):
+    results: List[ForecastBatchItem]
+    succeeded: int
+    failed: int
+
+
+class HourlySalesBatchItem(BaseModel):
+    department_id: UUID
+    data: Optional[List[HourlySalesItem]] = None
+    error: Optional[ErrorDetail] = None
+
+
+class HourlySalesBatchResponse(BaseModel):
+    results: List[HourlySalesBatchItem]
+    succeeded: int
+    failed: int
+
+
+class PlanVsFactBatchItem(BaseModel):
+    department_id: UUID
+    data: Optional[List[PlanVsFactItem]] = None
+    error: Optional[ErrorDetail] = None
+
+
+class PlanVsFactBatchResponse(BaseModel):
+    results: List[PlanVsFactBatchItem]
+    succeeded: int
+    failed: int
+
+
+class DepartmentSnapshot(BaseModel):
+    department_id: UUID
+    date_start: date
+    date_end: date
+    department_info: Optional[DepartmentInfo] = None
+    forecast: Optional[List[ForecastItem]] = None
+    hourly_sales: Optional[List[HourlySalesItem]] = None
+    plan_vs_fact: Optional[List[PlanVsFactItem]] = None
+    payroll: Optional[List[EmployeePayroll]] = None
+    errors: Dict[str, ErrorDetail] = Field(default_factory=dict)
+
+
 class Review(BaseModel):
     review_id: str
     branch_id: str
@@ -87,4 +136,72 @@ class Review(BaseModel):
 
 
 class ReviewsResponse(BaseModel):
-    data: List[Review]
\ No newline at end of file
+    data: List[Review]
+
+
+class DigestWeek(BaseModel):
+    date_start: date
+    date_end: date
+    actual_sales: float
+    predicted_sales: float
+    error_percentage: float
+    mape: float
+    previous_actual_sales: Optional[float] = None
+    week_over_week: Optional[float] = None
+
+
+class DigestPeakHours(BaseModel):
+    days: int
+    top_hours: List[int]
+    hourly_mean: Dict[int, float]
+
+
+class DigestPayroll(BaseModel):
+    payroll_total: float
+    work_hours: float
+    actual_sales: Optional[float] = None
+    payroll_share: Optional[float] = None
+
+
+class DigestReviews(BaseModel):
+    count: int
+    mean_rating: Optional[float] = None
+    recent_count: int
+    recent_mean_rating: Optional[float] = None
+    previous_count: int
+    previous_mean_rating: Optional[float] = None
+    rating_trend: Optional[float] = None
+
+
+class DepartmentDigest(BaseModel):
+    department_id: UUID
+    date: date
+    computed_at: datetime
+    last_week: Optional[DigestWeek] = None
+    peak_hours: Optional[DigestPeakHours] = None
+    payroll: Optional[DigestPayroll] = None
+    reviews: Optional[DigestReviews] = None
+    errors: Dict[str, ErrorDetail] = Field(default_factory=dict)
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    progress: int
+    total: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    size: Optional[int] = None
+    result_url: Optional[str] = None
+    error: Optional[ErrorDetail] = None
+
+
+# Валидаторы списков из ответов внешних API: схема компилируется один раз при
+# импорте, а весь список проверяется одним вызовом pydantic-core
+FORECAST_ITEMS = TypeAdapter(List[ForecastItem])
+HOURLY_SALES_ITEMS = TypeAdapter(List[HourlySalesItem])
+PLAN_VS_FACT_ITEMS = TypeAdapter(List[PlanVsFactItem])
+REVIEWS = TypeAdapter(List[Review])
@@ -0,0 +1,184 @@
+"""
+Хранилище и ночной пересчёт дайджестов подразделений
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Iterable, Optional
+from loguru import logger
+
+from app.core.config import get_settings
+from app.utils import metrics
+
+
+class DigestStore:
+    """
+    Готовые дайджесты в SQLite: по одной строке JSON на подразделение.
+    
+    Чтение - поиск по первичному ключу без разбора и сериализации, поэтому
+    выполняется прямо в цикле событий. Запись может ждать блокировку файла,
+    поэтому вызывается из пула потоков; общее соединение пишет под _write_lock,
+    чтобы запись одного потока не попала в транзакцию заявки другого.
+    Файл общий для всех воркеров: дайджест, посчитанный одним воркером,
+    сразу видят остальные.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS digests ("
+                "department_id TEXT PRIMARY KEY, "
+                "digest_date TEXT NOT NULL, "
+                "computed_at TEXT NOT NULL, "
+                "body BLOB NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS digest_claims ("
+                "department_id TEXT PRIMARY KEY, "
+                "digest_date TEXT NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+    
+    def get(self, department_id: str) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT body FROM digests WHERE department_id = ?", (department_id,)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def digest_date(self, department_id: str) -> Optional[date]:
+        row = self._connect().execute(
+            "SELECT digest_date FROM digests WHERE department_id = ?", (department_id,)
+        ).fetchone()
+        return date.fromisoformat(row[0]) if row else None
+    
+    def put(self, department_id: str, digest_date: date, body: bytes):
+        with self._write_lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO digests (department_id, digest_date, computed_at, body) VALUES (?, ?, ?, ?)",
+                (department_id, digest_date.isoformat(), datetime.now().isoformat(), body)
+            )
+    
+    def claim(self, department_id: str, digest_date: date, timeout: float) -> bool:
+        """
+        Атомарно закрепляет пересчёт дайджеста за digest_date за вызывающим.
+        False, если дайджест уже посчитан или его считает другой воркер
+        и срок его заявки ещё не истёк.
+        """
+        with self._write_lock:
+            connection = self._connect()
+            now = time.time()
+            # BEGIN IMMEDIATE берёт блокировку записи сразу: проверка и заявка
+            # не перемежаются с заявками других процессов
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if self.digest_date(department_id) == digest_date:
+                    claimed = False
+                else:
+                    cursor = connection.execute(
+                        "INSERT INTO digest_claims (department_id, digest_date, expires_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT (department_id) DO UPDATE SET "
+                        "digest_date = excluded.digest_date, expires_at = excluded.expires_at "
+                        "WHERE digest_claims.digest_date != excluded.digest_date OR digest_claims.expires_at < ?",
+                        (department_id, digest_date.isoformat(), now + timeout, now)
+                    )
+                    claimed = cursor.rowcount == 1
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return claimed
+    
+    def release(self, department_id: str):
+        with self._write_lock:
+            self._connect().execute("DELETE FROM digest_claims WHERE department_id = ?", (department_id,))
+    
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+digest_store = DigestStore(get_settings().digest_db_path)
+
+
+def seconds_until(hour: int, now: Optional[datetime] = None) -> float:
+    """Секунды до ближайшего наступления hour:00 по местному времени"""
+    now = now or datetime.now()
+    run_at = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return (run_at - now).total_seconds()
+
+
+async def _release(department_id: str):
+    try:
+        await asyncio.to_thread(digest_store.release, department_id)
+    except Exception as e:
+        # Заявка истечёт сама через digest_claim_timeout
+        logger.error(f"Не удалось снять заявку на дайджест department_id={department_id}: {e}")
+
+
+async def refresh_digests(
+    department_ids: Iterable[str],
+    build: Callable[[str, date], Awaitable[bytes]],
+    digest_date: date,
+    concurrency: int
+):
+    """
+    Пересчитывает дайджесты за digest_date. Перед пересчётом подразделение
+    закрепляется за воркером в хранилище, поэтому одновременно запущенные
+    воркеры не считают один дайджест дважды; уже посчитанные за эту дату
+    пропускаются. Ошибка одного подразделения не прерывает остальные.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = get_settings().digest_claim_timeout
+    
+    async def refresh(department_id: str):
+        async with semaphore:
+            claimed = False
+            try:
+                claimed = await asyncio.to_thread(digest_store.claim, department_id, digest_date, timeout)
+                if not claimed:
+                    return
+                body = await build(department_id, digest_date)
+                await asyncio.to_thread(digest_store.put, department_id, digest_date, body)
+                metrics.increment("digests.computed")
+            except Exception as e:
+                metrics.increment("digests.failed")
+                logger.error(f"Не удалось посчитать дайджест department_id={department_id}: {e}")
+            finally:
+                # После ошибки подразделение может пересчитать следующий запуск
+                if claimed:
+                    await _release(department_id)
+    
+    await asyncio.gather(*(refresh(department_id) for department_id in department_ids))
+
+
+async def run_nightly(build: Callable[[str, date], Awaitable[bytes]]):
+    """
+    Фоновая задача: сразу досчитывает недостающие дайджесты за вчера,
+    затем пересчитывает все каждую ночь в digest_hour
+    """
+    settings = get_settings()
+    while True:
+        digest_date = date.today() - timedelta(days=1)
+        logger.info(f"Пересчёт дайджестов за {digest_date} для {len(settings.digest_department_ids)} подразделений")
+        try:
+            await refresh_digests(settings.digest_department_ids, build, digest_date, settings.digest_concurrency)
+        except Exception as e:
+            logger.error(f"Ошибка пересчёта дайджестов за {digest_date}: {e}")
+        await asyncio.sleep(seconds_until(settings.digest_hour))
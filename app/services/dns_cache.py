@@ -0,0 +1,137 @@
+"""
+Кэш DNS для внешних API
+"""
+import asyncio
+import socket
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpcore
+from loguru import logger
+
+
+class DNSCache:
+    """
+    Кэш разрешения имён хостов с TTL.
+    
+    Просроченная запись отдаётся сразу, а обновляется в фоне, поэтому новые
+    соединения к внешним API не ждут DNS. Фоновая задача заранее обновляет
+    все известные хосты, пока записи ещё свежие.
+    """
+    
+    def __init__(self, ttl: int = 300):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+        self._pending: Dict[Tuple[str, int], asyncio.Task] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+    
+    async def _lookup(self, host: str, port: int) -> List[str]:
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        # Уникальные адреса в порядке, предложенном резолвером
+        return list(dict.fromkeys(info[4][0] for info in infos))
+    
+    async def _refresh(self, host: str, port: int) -> List[str]:
+        addresses = await self._lookup(host, port)
+        self._entries[(host, port)] = (addresses, time.monotonic() + self.ttl)
+        logger.debug(f"DNS {host}:{port} -> {addresses}")
+        return addresses
+    
+    def _refresh_in_background(self, host: str, port: int):
+        key = (host, port)
+        if key in self._pending:
+            return
+        
+        task = asyncio.create_task(self._refresh(host, port))
+        self._pending[key] = task
+        
+        def on_done(done: asyncio.Task):
+            self._pending.pop(key, None)
+            if not done.cancelled() and done.exception():
+                logger.warning(f"Не удалось обновить DNS для {host}: {done.exception()}")
+        
+        task.add_done_callback(on_done)
+    
+    async def resolve(self, host: str, port: int) -> List[str]:
+        entry = self._entries.get((host, port))
+        if entry is None:
+            pending = self._pending.get((host, port))
+            if pending is not None:
+                return await asyncio.shield(pending)
+            return await self._refresh(host, port)
+        
+        addresses, expires_at = entry
+        if time.monotonic() >= expires_at:
+            # Отдаём устаревшие адреса, не блокируя соединение
+            self._refresh_in_background(host, port)
+        return addresses
+    
+    async def warm_up(self, hosts: Iterable[Tuple[str, int]]):
+        hosts = list(hosts)
+        results = await asyncio.gather(
+            *(self._refresh(host, port) for host, port in hosts),
+            return_exceptions=True
+        )
+        for (host, _), result in zip(hosts, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Не удалось разрешить {host}: {result}")
+    
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(max(self.ttl / 2, 1))
+            for host, port in list(self._entries):
+                self._refresh_in_background(host, port)
+    
+    def start_refresh(self):
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop_refresh(self):
+        tasks = list(self._pending.values())
+        if self._refresh_task is not None:
+            tasks.append(self._refresh_task)
+            self._refresh_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def clear(self):
+        self._entries.clear()
+
+
+class CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    Сетевой backend httpcore, подключающийся по адресам из DNSCache.
+    
+    TLS по-прежнему получает исходное имя хоста (SNI и проверка сертификата),
+    поскольку httpcore передаёт его в start_tls отдельно от адреса соединения.
+    """
+    
+    def __init__(self, dns_cache: DNSCache, backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        self._dns_cache = dns_cache
+        self._backend = backend or httpcore.AnyIOBackend()
+    
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = await self._dns_cache.resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        
+        last_error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port,
+                    timeout=timeout,
+                    local_address=local_address,
+                    socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        raise last_error or httpcore.ConnectError(f"Нет адресов для {host}")
+    
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+    
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
@@ -0,0 +1,131 @@
+"""
+Выгрузка данных в Arrow IPC и Parquet для аналитики
+"""
+from operator import attrgetter
+from typing import Any, AsyncIterator, Dict, List
+
+from app.utils.sink import DrainableSink
+
+# pyarrow нужен только для выгрузок и остаётся опциональной зависимостью
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+EXPORT_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet"
+}
+EXPORT_EXTENSIONS = {
+    "arrow": "arrows",
+    "parquet": "parquet"
+}
+
+
+def _schemas() -> Dict[str, "pa.Schema"]:
+    department = ("department_id", pa.dictionary(pa.int32(), pa.string()))
+    return {
+        "forecast": pa.schema([
+            department,
+            ("date", pa.date32()),
+            ("predicted_sales", pa.float64())
+        ]),
+        "hourly_sales": pa.schema([
+            department,
+            ("date", pa.date32()),
+            ("hour", pa.int8()),
+            ("sales_amount", pa.float64())
+        ]),
+        "plan_vs_fact": pa.schema([
+            department,
+            ("date", pa.date32()),
+            ("predicted_sales", pa.float64()),
+            ("actual_sales", pa.float64()),
+            ("error", pa.float64()),
+            ("error_percentage", pa.float64())
+        ]),
+        "payroll_shifts": pa.schema([
+            department,
+            ("employee_name", pa.string()),
+            ("date", pa.date32()),
+            ("payroll_for_shift", pa.float64()),
+            ("schedule_name", pa.string()),
+            ("work_hours", pa.float64())
+        ])
+    }
+
+
+SCHEMAS = _schemas() if PYARROW_AVAILABLE else {}
+
+
+def _shift_rows(payroll) -> List[Any]:
+    """Смены всех сотрудников одним списком, рядом с именем сотрудника"""
+    return [
+        (employee.employee_name, shift)
+        for employee in payroll.data
+        for shift in employee.shifts
+    ]
+
+
+def record_batch(dataset: str, department_id: str, result) -> "pa.RecordBatch":
+    """
+    Ответ загрузчика по одному подразделению -> RecordBatch.
+    Колонки собираются напрямую из атрибутов строк, без промежуточных словарей.
+    """
+    schema = SCHEMAS[dataset]
+    if dataset == "payroll_shifts":
+        pairs = _shift_rows(result)
+        rows = [shift for _, shift in pairs]
+        columns = {"employee_name": [name for name, _ in pairs]}
+    else:
+        rows = result.data
+        columns = {}
+    
+    arrays = []
+    for field in schema:
+        if field.name == "department_id":
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array([0] * len(rows), pa.int32()),
+                pa.array([department_id], pa.string())
+            ))
+        elif field.name in columns:
+            arrays.append(pa.array(columns[field.name], field.type))
+        else:
+            arrays.append(pa.array(list(map(attrgetter(field.name), rows)), field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+async def prepend(first: "pa.RecordBatch", batches: AsyncIterator["pa.RecordBatch"]) -> AsyncIterator["pa.RecordBatch"]:
+    """Возвращает уже полученную первую пачку обратно в начало потока"""
+    try:
+        yield first
+        async for batch in batches:
+            yield batch
+    finally:
+        await batches.aclose()
+
+
+async def encode_batches(batches: AsyncIterator["pa.RecordBatch"], schema: "pa.Schema", format: str) -> AsyncIterator[bytes]:
+    """
+    Кодирует пачки по мере поступления: поток Arrow IPC или Parquet,
+    где каждая пачка становится отдельной группой строк
+    """
+    sink = DrainableSink()
+    output = pa.PythonFile(sink, mode="w")
+    if format == "parquet":
+        writer = pq.ParquetWriter(output, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(output, schema)
+    
+    try:
+        async for batch in batches:
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+        writer.close()
+        yield sink.drain()
+    finally:
+        await batches.aclose()
@@ -1,141 +1,422 @@
+import asyncio
+import time
 import httpx
-from typing import Optional, Dict, Any
+import httpcore
+from typing import Optional, Dict, Any, AsyncIterator
+from urllib.parse import urlsplit
 from loguru import logger
 from app.core.config import get_settings
-from app.core.exceptions import ExternalAPIError
+from app.core.exceptions import MCPError, ExternalAPIError, DeadlineExceededError
+from app.utils.cache import ValidatorCache
+from app.utils import json_codec
+from app.utils import deadline
+from app.services.dns_cache import DNSCache, CachingDNSBackend
+from app.utils.latency import AdaptiveTimeouts, endpoint_key
+
+
+# Валидаторы ответов апстрима общие для всех экземпляров клиента,
+# так как HTTPClient создаётся на каждый запрос
+validator_cache = ValidatorCache(
+    ttl=get_settings().upstream_revalidation_ttl,
+    maxsize=get_settings().upstream_revalidation_maxsize
+)
+
+# История задержек по эндпоинтам внешних API и выведенные из неё таймауты
+upstream_timeouts = AdaptiveTimeouts(
+    default_timeout=get_settings().api_timeout,
+    quantile=get_settings().upstream_timeout_quantile,
+    factor=get_settings().upstream_timeout_factor,
+    min_timeout=get_settings().upstream_timeout_min,
+    max_timeout=get_settings().upstream_timeout_max,
+    window=get_settings().upstream_latency_window,
+    min_samples=get_settings().upstream_latency_min_samples,
+    overrides=get_settings().upstream_timeout_overrides,
+    enabled=get_settings().upstream_adaptive_timeouts
+)
+
+# Специальные сообщения об ошибках API отзывов
+REVIEWS_STATUS_MESSAGES = {
+    404: "ID подразделения не найден или филиал не найден в БД отзывов",
+    500: "У филиала нет 2GIS ID",
+    400: "Параметр count вне диапазона 1-1000"
+}
+
+
+class UpstreamTransport(httpx.AsyncHTTPTransport):
+    """
+    Транспорт httpx, разрешающий имена внешних API через DNSCache.
+    
+    Пул httpcore собирается здесь из тех же параметров, что принимает
+    AsyncHTTPTransport, но с сетевым backend CachingDNSBackend. Из httpx
+    используется только то, что штатный транспорт берёт для запросов
+    пул из self._pool - это проверяет test_upstream_transport_uses_dns_cache.
+    """
+    
+    def __init__(
+        self,
+        dns_cache: DNSCache,
+        limits: httpx.Limits,
+        verify: Any = True,
+        cert: Any = None,
+        trust_env: bool = True,
+        http1: bool = True,
+        http2: bool = False,
+        proxy: Optional[httpx.Proxy] = None,
+        uds: Optional[str] = None,
+        local_address: Optional[str] = None,
+        retries: int = 0,
+        socket_options: Optional[Any] = None,
+        network_backend: Optional[httpcore.AsyncNetworkBackend] = None
+    ):
+        super().__init__(
+            verify=verify, cert=cert, trust_env=trust_env, http1=http1, http2=http2, limits=limits,
+            proxy=proxy, uds=uds, local_address=local_address, retries=retries, socket_options=socket_options
+        )
+        # Через прокси имена разрешает сам прокси - остаётся штатный пул httpx
+        if proxy is not None:
+            return
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(verify=verify, cert=cert, trust_env=trust_env),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=http1,
+            http2=http2,
+            uds=uds,
+            local_address=local_address,
+            retries=retries,
+            socket_options=socket_options,
+            network_backend=CachingDNSBackend(dns_cache, network_backend)
+        )
+
+
+class UpstreamPool:
+    """
+    Общий пул keep-alive соединений к внешним API на время жизни приложения.
+    
+    Пока пул открыт, все экземпляры HTTPClient используют его клиента вместо
+    создания собственного, поэтому DNS и TLS-рукопожатия не повторяются
+    на каждый запрос.
+    """
+    
+    def __init__(self):
+        self.settings = get_settings()
+        self.dns_cache = DNSCache(ttl=self.settings.dns_cache_ttl)
+        self.client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def base_urls(self) -> list[str]:
+        return [
+            self.settings.aqniet_api_url,
+            self.settings.madlen_api_url,
+            self.settings.reviews_api_url
+        ]
+    
+    async def open(self):
+        limits = httpx.Limits(
+            max_connections=self.settings.upstream_max_connections,
+            max_keepalive_connections=self.settings.upstream_keepalive_connections,
+            keepalive_expiry=self.settings.upstream_keepalive_expiry
+        )
+        self.client = httpx.AsyncClient(
+            transport=UpstreamTransport(self.dns_cache, limits=limits),
+            timeout=httpx.Timeout(self.settings.api_timeout),
+            headers={
+                "User-Agent": "MCP-Restaurant-Optimizer/1.0"
+            }
+        )
+        self.dns_cache.start_refresh()
+    
+    async def close(self):
+        await self.dns_cache.stop_refresh()
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+    
+    async def _open_connection(self, base_url: str):
+        # Любой ответ (даже 404) оставляет в пуле установленное TLS-соединение
+        response = await self.client.head(base_url)
+        await response.aclose()
+    
+    async def warm_up(self):
+        """
+        Разрешает имена внешних API и заранее открывает
+        upstream_prewarm_connections соединений к каждому из них
+        """
+        connections = self.settings.upstream_prewarm_connections
+        if not self.client or connections <= 0:
+            return
+        
+        hosts = []
+        for base_url in self.base_urls:
+            parts = urlsplit(base_url)
+            hosts.append((parts.hostname, parts.port or (443 if parts.scheme == "https" else 80)))
+        await self.dns_cache.warm_up(hosts)
+        
+        results = await asyncio.gather(
+            *(self._open_connection(base_url) for base_url in self.base_urls for _ in range(connections)),
+            return_exceptions=True
+        )
+        failed = [result for result in results if isinstance(result, Exception)]
+        for error in failed:
+            logger.warning(f"Не удалось открыть соединение при прогреве: {error!r}")
+        logger.info(f"Прогрев соединений завершён: {len(results) - len(failed)} из {len(results)}")
+
+
+upstream_pool = UpstreamPool()
 
 
 class HTTPClient:
     def __init__(self):
         self.settings = get_settings()
         self._client: Optional[httpx.AsyncClient] = None
+        self._owns_client = False
     
     async def __aenter__(self):
+        if upstream_pool.client is not None:
+            self._client = upstream_pool.client
+            return self
+        
         self._client = httpx.AsyncClient(
             timeout=httpx.Timeout(self.settings.api_timeout),
             headers={
                 "User-Agent": "MCP-Restaurant-Optimizer/1.0"
             }
         )
+        self._owns_client = True
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self._client:
+        if self._client and self._owns_client:
             await self._client.aclose()
     
-    async def get_aqniet(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def _aqniet_request(self, endpoint: str) -> tuple:
         url = f"{self.settings.aqniet_api_url}/{endpoint.lstrip('/')}"
         headers = {
             "Authorization": f"Bearer {self.settings.aqniet_api_token}"
         }
+        return url, headers
+    
+    def _madlen_request(self, endpoint: str) -> tuple:
+        return f"{self.settings.madlen_api_url}/{endpoint.lstrip('/')}", None
+    
+    def _reviews_request(self, endpoint: str) -> tuple:
+        return f"{self.settings.reviews_api_url}/{endpoint.lstrip('/')}", None
+    
+    def _external_error(
+        self,
+        exc: Exception,
+        url: str,
+        host: str,
+        status_messages: Optional[Dict[int, str]] = None
+    ) -> ExternalAPIError:
+        """
+        Преобразует ошибку httpx в ExternalAPIError с сообщением для конкретного API
+        """
+        if isinstance(exc, MCPError):
+            return exc
         
-        try:
-            logger.debug(f"GET {url} with params: {params}")
-            response = await self._client.get(url, params=params, headers=headers)
-            response.raise_for_status()
-            return response.json()
-        except httpx.TimeoutException:
+        if isinstance(exc, httpx.TimeoutException):
             logger.error(f"Timeout при обращении к {url}")
-            raise ExternalAPIError(
-                message=f"Таймаут при обращении к aqniet.site",
+            return ExternalAPIError(
+                message=f"Таймаут при обращении к {host}",
                 endpoint=url,
                 timeout=True
             )
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP ошибка {e.response.status_code} при обращении к {url}")
-            raise ExternalAPIError(
-                message=f"Ошибка при обращении к aqniet.site",
+        
+        if isinstance(exc, httpx.HTTPStatusError):
+            status_code = exc.response.status_code
+            logger.error(f"HTTP ошибка {status_code} при обращении к {url}")
+            
+            if status_messages and status_code in status_messages:
+                return ExternalAPIError(
+                    message=status_messages[status_code],
+                    endpoint=url,
+                    status_code=status_code
+                )
+            return ExternalAPIError(
+                message=f"Ошибка при обращении к {host}",
                 endpoint=url,
-                status_code=e.response.status_code,
-                details={"response_text": e.response.text[:200]}
+                status_code=status_code,
+                details={"response_text": exc.response.text[:200]}
             )
+        
+        logger.error(f"Неожиданная ошибка при обращении к {url}: {str(exc)}")
+        return ExternalAPIError(
+            message=f"Неожиданная ошибка при обращении к {host}",
+            endpoint=url,
+            details={"error": str(exc)}
+        )
+    
+    def _request_timeout(self, key: str) -> tuple:
+        """
+        Таймаут запроса: из истории задержек эндпоинта, но не больше оставшегося
+        бюджета запроса клиента. Возвращает (таймаут, ограничен ли он дедлайном).
+        """
+        timeout = upstream_timeouts.timeout_for(key)
+        budget = deadline.remaining()
+        if budget is None or budget >= timeout:
+            return timeout, False
+        if budget <= 0:
+            raise DeadlineExceededError(f"upstream:{key}")
+        return budget, True
+    
+    def _on_timeout(self, key: str, timeout: float, limited_by_deadline: bool):
+        if limited_by_deadline:
+            raise DeadlineExceededError(f"upstream:{key}")
+        # Таймаут учитываем как задержку не меньше него, чтобы окно не "залипало" снизу
+        upstream_timeouts.record(key, timeout)
+    
+    async def _timed_get(self, key: str, url: str, **kwargs) -> httpx.Response:
+        """
+        GET с таймаутом из истории задержек эндпоинта; задержка записывается в историю
+        """
+        timeout, limited_by_deadline = self._request_timeout(key)
+        started = time.perf_counter()
+        try:
+            response = await self._client.get(url, timeout=httpx.Timeout(timeout), **kwargs)
+        except httpx.TimeoutException:
+            self._on_timeout(key, timeout, limited_by_deadline)
+            raise
+        upstream_timeouts.record(key, time.perf_counter() - started)
+        return response
+    
+    async def _get_conditional(
+        self,
+        endpoint: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        raw: bool = False
+    ) -> Any:
+        """
+        GET с условной ревалидацией: если для URL сохранены ETag / Last-Modified,
+        отправляем If-None-Match / If-Modified-Since и на 304 возвращаем
+        сохранённое тело без повторной загрузки и разбора.
+        
+        При raw=True возвращаются исходные байты тела без разбора JSON.
+        """
+        key = endpoint_key(endpoint)
+        variant = "raw" if raw else "json"
+        conditional_headers = validator_cache.conditional_headers(url, params, variant)
+        response = await self._timed_get(
+            key, url, params=params, headers={**(headers or {}), **conditional_headers}
+        )
+        
+        if response.status_code == 304:
+            data = validator_cache.revalidated(url, params, variant)
+            if data is not None:
+                logger.debug(f"304 Not Modified для {url}, используем сохранённый ответ")
+                return data
+            # Запись успела вытесниться - запрашиваем тело заново
+            response = await self._timed_get(key, url, params=params, headers=headers)
+        
+        response.raise_for_status()
+        data = response.content if raw else await json_codec.loads_async(response.content)
+        validator_cache.store(url, params, response.headers, data, variant)
+        return data
+    
+    async def _get_json(
+        self,
+        endpoint: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Any:
+        return await self._get_conditional(endpoint, url, params=params, headers=headers)
+    
+    async def _stream_json_array(
+        self,
+        endpoint: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[list]:
+        """
+        Читает тело ответа по частям и отдаёт элементы JSON-массива пачками
+        по мере разбора, не держа в памяти ни всё тело, ни весь список.
+        Условная ревалидация здесь не применяется: тело намеренно не сохраняется.
+        
+        В замер задержки не входит время, пока пачку обрабатывает потребитель:
+        медленный клиент не должен растягивать выученный таймаут эндпоинта.
+        """
+        key = endpoint_key(endpoint)
+        timeout, limited_by_deadline = self._request_timeout(key)
+        started = time.perf_counter()
+        consumer_time = 0.0
+        
+        try:
+            async with self._client.stream(
+                "GET", url, params=params, headers=headers, timeout=httpx.Timeout(timeout)
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                
+                async for batch in json_codec.iter_json_array(response.aiter_bytes()):
+                    yielded = time.perf_counter()
+                    yield batch
+                    consumer_time += time.perf_counter() - yielded
+        except httpx.TimeoutException:
+            self._on_timeout(key, timeout, limited_by_deadline)
+            raise
+        upstream_timeouts.record(key, time.perf_counter() - started - consumer_time)
+    
+    async def get_aqniet(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        url, headers = self._aqniet_request(endpoint)
+        
+        try:
+            logger.debug(f"GET {url} with params: {params}")
+            return await self._get_json(endpoint, url, params=params, headers=headers)
         except Exception as e:
-            logger.error(f"Неожиданная ошибка при обращении к {url}: {str(e)}")
-            raise ExternalAPIError(
-                message=f"Неожиданная ошибка при обращении к aqniet.site",
-                endpoint=url,
-                details={"error": str(e)}
-            )
+            raise self._external_error(e, url, "aqniet.site")
+    
+    async def stream_aqniet(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[list[Dict[str, Any]]]:
+        url, headers = self._aqniet_request(endpoint)
+        
+        try:
+            logger.debug(f"GET (stream) {url} with params: {params}")
+            async for batch in self._stream_json_array(endpoint, url, params=params, headers=headers):
+                yield batch
+        except Exception as e:
+            raise self._external_error(e, url, "aqniet.site")
     
     async def get_madlen(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        url = f"{self.settings.madlen_api_url}/{endpoint.lstrip('/')}"
+        url, headers = self._madlen_request(endpoint)
         
         try:
             logger.debug(f"GET {url} with params: {params}")
-            response = await self._client.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.TimeoutException:
-            logger.error(f"Timeout при обращении к {url}")
-            raise ExternalAPIError(
-                message=f"Таймаут при обращении к madlen.space",
-                endpoint=url,
-                timeout=True
-            )
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP ошибка {e.response.status_code} при обращении к {url}")
-            raise ExternalAPIError(
-                message=f"Ошибка при обращении к madlen.space",
-                endpoint=url,
-                status_code=e.response.status_code,
-                details={"response_text": e.response.text[:200]}
-            )
+            return await self._get_json(endpoint, url, params=params, headers=headers)
         except Exception as e:
-            logger.error(f"Неожиданная ошибка при обращении к {url}: {str(e)}")
-            raise ExternalAPIError(
-                message=f"Неожиданная ошибка при обращении к madlen.space",
-                endpoint=url,
-                details={"error": str(e)}
-            )
+            raise self._external_error(e, url, "madlen.space")
+    
+    async def get_madlen_raw(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> bytes:
+        """
+        Возвращает тело ответа madlen.space как есть, без разбора JSON
+        """
+        url, headers = self._madlen_request(endpoint)
+        
+        try:
+            logger.debug(f"GET (raw) {url} with params: {params}")
+            return await self._get_conditional(endpoint, url, params=params, headers=headers, raw=True)
+        except Exception as e:
+            raise self._external_error(e, url, "madlen.space")
     
     async def get_reviews(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> list[Dict[str, Any]]:
-        url = f"https://reviews.aqniet.site/api/{endpoint.lstrip('/')}"
+        url, headers = self._reviews_request(endpoint)
         
         try:
             logger.debug(f"GET {url} with params: {params}")
-            response = await self._client.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.TimeoutException:
-            logger.error(f"Timeout при обращении к {url}")
-            raise ExternalAPIError(
-                message=f"Таймаут при обращении к reviews.aqniet.site",
-                endpoint=url,
-                timeout=True
-            )
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP ошибка {e.response.status_code} при обращении к {url}")
-            
-            # Специальная обработка для API отзывов
-            if e.response.status_code == 404:
-                raise ExternalAPIError(
-                    message="ID подразделения не найден или филиал не найден в БД отзывов",
-                    endpoint=url,
-                    status_code=404
-                )
-            elif e.response.status_code == 500:
-                raise ExternalAPIError(
-                    message="У филиала нет 2GIS ID",
-                    endpoint=url,
-                    status_code=500
-                )
-            elif e.response.status_code == 400:
-                raise ExternalAPIError(
-                    message="Параметр count вне диапазона 1-1000",
-                    endpoint=url,
-                    status_code=400
-                )
-            else:
-                raise ExternalAPIError(
-                    message=f"Ошибка при обращении к reviews.aqniet.site",
-                    endpoint=url,
-                    status_code=e.response.status_code,
-                    details={"response_text": e.response.text[:200]}
-                )
+            return await self._get_json(endpoint, url, params=params, headers=headers)
         except Exception as e:
-            logger.error(f"Неожиданная ошибка при обращении к {url}: {str(e)}")
-            raise ExternalAPIError(
-                message=f"Неожиданная ошибка при обращении к reviews.aqniet.site",
-                endpoint=url,
-                details={"error": str(e)}
-            )
\ No newline at end of file
+            raise self._external_error(e, url, "reviews.aqniet.site", REVIEWS_STATUS_MESSAGES)
+    
+    async def stream_reviews(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[list[Dict[str, Any]]]:
+        url, headers = self._reviews_request(endpoint)
+        
+        try:
+            logger.debug(f"GET (stream) {url} with params: {params}")
+            async for batch in self._stream_json_array(endpoint, url, params=params, headers=headers):
+                yield batch
+        except Exception as e:
+            raise self._external_error(e, url, "reviews.aqniet.site", REVIEWS_STATUS_MESSAGES)
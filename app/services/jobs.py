@@ -0,0 +1,327 @@
+"""
+Фоновые задания для тяжёлых отчётов: очередь с ограниченным пулом воркеров,
+состояние в SQLite, результаты на диске и их удаление по истечении срока
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.exceptions import MCPError
+from app.utils import metrics
+from app.utils.deadline import set_deadline, reset_deadline
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+# Отчёт задания: параметры и функция отметки прогресса -> байты результата
+Runner = Callable[[Dict[str, Any], Callable[[int], Awaitable[None]]], AsyncIterator[bytes]]
+
+
+class JobCancelled(Exception):
+    """Задание отменено, пока выполнялось"""
+
+
+class JobStore:
+    """
+    Состояние заданий в SQLite. Файл общий для всех воркеров: статус задания,
+    принятого одним процессом, можно запросить у любого другого.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, "
+                "kind TEXT NOT NULL, "
+                "params TEXT NOT NULL, "
+                "status TEXT NOT NULL, "
+                "progress INTEGER NOT NULL DEFAULT 0, "
+                "total INTEGER NOT NULL, "
+                "media_type TEXT NOT NULL, "
+                "filename TEXT NOT NULL, "
+                "size INTEGER, "
+                "error TEXT, "
+                "owner TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "started_at REAL, "
+                "finished_at REAL, "
+                "updated_at REAL NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+    
+    def create(self, job_id: str, kind: str, params: Dict[str, Any], total: int,
+               media_type: str, filename: str, owner: str):
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (job_id, kind, params, status, total, media_type, filename, owner, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(params), total, media_type, filename, owner, now, now)
+        )
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["error"] = job["error"] and json.loads(job["error"])
+        return job
+    
+    def status(self, job_id: str) -> Optional[str]:
+        row = self._connect().execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+    
+    def start(self, job_id: str) -> bool:
+        """Переводит задание в running, если его не отменили в очереди"""
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'running', started_at = ?, updated_at = ? WHERE job_id = ? AND status = 'queued'",
+            (now, now, job_id)
+        )
+        return cursor.rowcount == 1
+    
+    def progress(self, job_id: str, progress: int):
+        self._connect().execute(
+            "UPDATE jobs SET progress = ?, updated_at = ? WHERE job_id = ?", (progress, time.time(), job_id)
+        )
+    
+    def finish(self, job_id: str, status: str, size: Optional[int] = None,
+               error: Optional[Dict[str, Any]] = None) -> bool:
+        """Завершает незавершённое задание; уже завершённое (например, отменённое) не меняется"""
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, size = ?, error = ?, finished_at = ?, updated_at = ? "
+            "WHERE job_id = ? AND status IN ('queued', 'running')",
+            (status, size, error and json.dumps(error, ensure_ascii=False), now, now, job_id)
+        )
+        return cursor.rowcount == 1
+    
+    def heartbeat(self, owner: str):
+        self._connect().execute(
+            "UPDATE jobs SET updated_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+            (time.time(), owner)
+        )
+    
+    def interrupt(self, error: Dict[str, Any], before: Optional[float] = None, owner: Optional[str] = None) -> int:
+        """Завершает ошибкой незавершённые задания процесса owner или без heartbeat с момента before"""
+        now = time.time()
+        condition, args = ("owner = ?", owner) if owner is not None else ("updated_at < ?", before)
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ? "
+            f"WHERE status IN ('queued', 'running') AND {condition}",
+            (json.dumps(error, ensure_ascii=False), now, now, args)
+        )
+        return cursor.rowcount
+    
+    def expired(self, before: float) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (before,)
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    def delete(self, job_id: str):
+        self._connect().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+    
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+# Ошибка заданий, которые не завершились из-за остановки процесса
+INTERRUPTED = {
+    "type": "job_interrupted",
+    "message": "Задание прервано: процесс, выполнявший его, остановился",
+    "details": {}
+}
+
+
+def _error(error: Exception) -> Dict[str, Any]:
+    # Ошибка задания в формате тела ошибок API
+    if isinstance(error, MCPError):
+        return error.detail["error"]
+    return {"type": "internal_error", "message": str(error), "details": {}}
+
+
+class JobManager:
+    """
+    Очередь заданий процесса и job_workers воркеров, которые её разбирают.
+    Результат пишется во временный файл и переименовывается после успешного
+    завершения, поэтому скачать можно только полностью готовый отчёт.
+    """
+    
+    def __init__(self, store: JobStore, results_dir: str):
+        self.store = store
+        self.results_dir = results_dir
+        # Идентификатор процесса в таблице заданий: по нему обновляется heartbeat
+        self.owner = uuid4().hex
+        self._runners: Dict[str, Runner] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+    
+    def register(self, kind: str, runner: Runner):
+        self._runners[kind] = runner
+    
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.results_dir, job_id)
+    
+    def start(self):
+        if self._queue is not None:
+            return
+        settings = get_settings()
+        os.makedirs(self.results_dir, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=settings.job_queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(settings.job_workers)]
+    
+    async def stop(self):
+        """Останавливает воркеры; незавершённые задания процесса завершаются ошибкой"""
+        tasks = self._workers + list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self.store.interrupt(INTERRUPTED, owner=self.owner)
+    
+    def submit(self, kind: str, params: Dict[str, Any], total: int, media_type: str, filename: str) -> str:
+        """Ставит задание в очередь и возвращает его идентификатор"""
+        self.start()
+        if self._queue.full():
+            raise MCPError(
+                error_type="job_queue_full",
+                message="Очередь заданий заполнена, повторите позже",
+                details={"queue_size": self._queue.maxsize},
+                status_code=503
+            )
+        job_id = uuid4().hex
+        self.store.create(job_id, kind, params, total, media_type, filename, self.owner)
+        self._queue.put_nowait(job_id)
+        metrics.increment("jobs.submitted")
+        logger.info(f"Задание {job_id} ({kind}) поставлено в очередь")
+        return job_id
+    
+    def cancel(self, job_id: str) -> bool:
+        """
+        Отменяет незавершённое задание. Задание в очереди пропускается воркером,
+        выполняемое в другом процессе останавливается при следующей отметке прогресса.
+        """
+        if not self.store.finish(job_id, "cancelled"):
+            return False
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        metrics.increment("jobs.cancelled")
+        return True
+    
+    def remove(self, job_id: str):
+        """Удаляет завершённое задание вместе с результатом"""
+        for path in (self.result_path(job_id), self.result_path(job_id) + ".part"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.store.delete(job_id)
+    
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                if self.store.start(job_id):
+                    task = asyncio.create_task(self._run(job_id))
+                    self._running[job_id] = task
+                    await asyncio.wait([task])
+            finally:
+                self._running.pop(job_id, None)
+    
+    def _progress(self, job_id: str) -> Callable[[int], Awaitable[None]]:
+        def mark(done: int):
+            if self.store.status(job_id) == "cancelled":
+                raise JobCancelled(job_id)
+            self.store.progress(job_id, done)
+        
+        # Запросы к SQLite блокируют, поэтому выполняются вне цикла событий
+        async def progress(done: int):
+            await asyncio.to_thread(mark, done)
+        return progress
+    
+    async def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        path = self.result_path(job_id)
+        # Задание живёт дольше принявшего его запроса: свой дедлайн вместо дедлайна запроса
+        token = set_deadline(get_settings().job_timeout)
+        started = time.monotonic()
+        try:
+            size = 0
+            with open(path + ".part", "wb") as result:
+                async for chunk in self._runners[job["kind"]](job["params"], self._progress(job_id)):
+                    await asyncio.to_thread(result.write, chunk)
+                    size += len(chunk)
+            os.replace(path + ".part", path)
+            if self.store.finish(job_id, "succeeded", size=size):
+                metrics.increment("jobs.succeeded")
+                logger.info(f"Задание {job_id} выполнено за {time.monotonic() - started:.1f} с, {size} байт")
+            else:
+                os.remove(path)
+        except (JobCancelled, asyncio.CancelledError):
+            self._discard(path)
+            logger.info(f"Задание {job_id} отменено")
+        except Exception as e:
+            self._discard(path)
+            self.store.finish(job_id, "failed", error=_error(e))
+            metrics.increment("jobs.failed")
+            logger.error(f"Задание {job_id} завершилось ошибкой: {e}")
+        finally:
+            reset_deadline(token)
+    
+    @staticmethod
+    def _discard(path: str):
+        try:
+            os.remove(path + ".part")
+        except FileNotFoundError:
+            pass
+    
+    def cleanup(self):
+        """
+        Отмечает heartbeat своих заданий, завершает ошибкой задания остановившихся
+        процессов и удаляет задания, срок хранения результатов которых истёк
+        """
+        settings = get_settings()
+        now = time.time()
+        self.store.heartbeat(self.owner)
+        stale = self.store.interrupt(INTERRUPTED, before=now - settings.job_heartbeat_timeout)
+        if stale:
+            metrics.increment("jobs.interrupted", stale)
+        expired = self.store.expired(now - settings.job_result_ttl)
+        for job_id in expired:
+            self.remove(job_id)
+        if expired:
+            metrics.increment("jobs.expired", len(expired))
+            logger.info(f"Удалено заданий с истёкшим сроком хранения: {len(expired)}")
+    
+    async def run_cleanup(self):
+        """Фоновая задача: cleanup каждые job_cleanup_interval секунд"""
+        while True:
+            try:
+                self.cleanup()
+            except Exception as e:
+                logger.error(f"Ошибка очистки заданий: {e}")
+            await asyncio.sleep(get_settings().job_cleanup_interval)
+
+
+job_manager = JobManager(JobStore(get_settings().job_db_path), get_settings().job_results_dir)
@@ -0,0 +1,200 @@
+"""
+Потоковая выгрузка строк в CSV и XLSX для открытия в Excel
+"""
+import csv
+import io
+import zipfile
+from datetime import date
+from typing import Any, AsyncIterator, List, Sequence
+from xml.sax.saxutils import escape
+
+from app.utils.sink import DrainableSink
+
+SPREADSHEET_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+# Строк на листе XLSX вместе с заголовком - ограничение Excel; дальше новый лист
+XLSX_MAX_ROWS = 1048576
+
+# Даты в XLSX - число дней от 1899-12-30 со стилем даты
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PACKAGE_RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_SHEET_START = f'{_XML_HEADER}<worksheet xmlns="{_MAIN_NS}"><sheetData>'.encode()
+_SHEET_END = b"</sheetData></worksheet>"
+
+# Стиль 0 - обычный, 1 - дата в формате локали (встроенный numFmtId 14)
+_STYLES = (
+    f'{_XML_HEADER}<styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '</styleSheet>'
+)
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value!r}</v></c>"
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - _EXCEL_EPOCH).days}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+# Первые символы, с которых Excel начинает формулу при открытии CSV
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value: Any) -> Any:
+    """Строка, похожая на формулу, выводится текстом: апстрим не должен выполнять код в Excel"""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class CsvWriter:
+    """CSV в UTF-8 с BOM: без него Excel читает файл в ANSI и портит кириллицу"""
+    
+    def __init__(self, columns: Sequence[str], delimiter: str = ","):
+        self._columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, delimiter=delimiter, lineterminator="\r\n")
+    
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data.encode("utf-8")
+    
+    def begin(self) -> bytes:
+        self._writer.writerow(self._columns)
+        return "\ufeff".encode("utf-8") + self._drain()
+    
+    def write(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        self._writer.writerows([map(_csv_cell, row) for row in rows])
+        return self._drain()
+    
+    def end(self) -> bytes:
+        return b""
+
+
+class XlsxWriter:
+    """
+    XLSX без сторонних библиотек: лист пишется в ZIP по мере поступления строк
+    (записи ZIP с дескрипторами данных не требуют перемотки файла), а описание
+    книги - в конце, когда известно число листов. Строки хранятся как inline
+    строки, числа и даты - значениями.
+    """
+    
+    def __init__(self, columns: Sequence[str]):
+        self._columns = columns
+        self._sink = DrainableSink()
+        self._zip = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheet = None
+        self._sheets = 0
+        self._row = 0
+    
+    def _new_sheet(self):
+        if self._sheet is not None:
+            self._sheet.write(_SHEET_END)
+            self._sheet.close()
+        self._sheets += 1
+        self._sheet = self._zip.open(f"xl/worksheets/sheet{self._sheets}.xml", "w")
+        self._sheet.write(_SHEET_START)
+        self._row = 0
+        self._write_rows([self._columns])
+    
+    def _write_rows(self, rows: Sequence[Sequence[Any]]):
+        parts: List[str] = []
+        for row in rows:
+            if self._row == XLSX_MAX_ROWS:
+                self._sheet.write("".join(parts).encode("utf-8"))
+                parts.clear()
+                self._new_sheet()
+            self._row += 1
+            parts.append(f'<row r="{self._row}">{"".join(map(_cell, row))}</row>')
+        self._sheet.write("".join(parts).encode("utf-8"))
+    
+    def begin(self) -> bytes:
+        self._new_sheet()
+        return self._sink.drain()
+    
+    def write(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        self._write_rows(rows)
+        return self._sink.drain()
+    
+    def end(self) -> bytes:
+        self._sheet.write(_SHEET_END)
+        self._sheet.close()
+        sheets = range(1, self._sheets + 1)
+        self._zip.writestr("xl/styles.xml", _STYLES)
+        self._zip.writestr("xl/workbook.xml", (
+            f'{_XML_HEADER}<workbook xmlns="{_MAIN_NS}" xmlns:r="{_RELATIONSHIPS_NS}"><sheets>'
+            + "".join(f'<sheet name="Лист{n}" sheetId="{n}" r:id="rId{n}"/>' for n in sheets)
+            + "</sheets></workbook>"
+        ))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", (
+            f'{_XML_HEADER}<Relationships xmlns="{_PACKAGE_RELATIONSHIPS_NS}">'
+            + "".join(
+                f'<Relationship Id="rId{n}" Type="{_RELATIONSHIPS_NS}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                for n in sheets
+            )
+            + f'<Relationship Id="rId{self._sheets + 1}" Type="{_RELATIONSHIPS_NS}/styles" Target="styles.xml"/>'
+            + "</Relationships>"
+        ))
+        self._zip.writestr("_rels/.rels", (
+            f'{_XML_HEADER}<Relationships xmlns="{_PACKAGE_RELATIONSHIPS_NS}">'
+            f'<Relationship Id="rId1" Type="{_RELATIONSHIPS_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        ))
+        self._zip.writestr("[Content_Types].xml", (
+            f'{_XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for n in sheets
+            )
+            + "</Types>"
+        ))
+        self._zip.close()
+        return self._sink.drain()
+
+
+async def encode_rows(
+    pages: AsyncIterator[Sequence[Sequence[Any]]],
+    columns: Sequence[str],
+    format: str,
+    delimiter: str = ","
+) -> AsyncIterator[bytes]:
+    """
+    Кодирует страницы строк по мере поступления; в памяти только текущая страница
+    """
+    writer = CsvWriter(columns, delimiter) if format == "csv" else XlsxWriter(columns)
+    try:
+        yield writer.begin()
+        async for rows in pages:
+            data = writer.write(rows)
+            if data:
+                yield data
+        yield writer.end()
+    finally:
+        await pages.aclose()
@@ -0,0 +1,210 @@
+"""
+Сводки вместо строк для ответов инструментов MCP, не помещающихся в бюджет
+"""
+import heapq
+from collections import Counter, defaultdict
+from datetime import date
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.utils import json_codec
+
+# Длина текста отзыва в сводке
+_TEXT_LIMIT = 200
+
+# Разделы сводок в порядке отбрасывания при нехватке бюджета: сначала
+# подневная детализация и отдельные строки, затем разбивки по дням недели,
+# часам и т.п. Остальные разделы - итоги - не отбрасываются.
+_DROP_ORDER = (
+    "daily", "top", "bottom", "worst", "best", "lowest", "highest", "top_employees",
+    "hourly_mean", "weekday_mean", "by_schedule", "histogram"
+)
+
+
+def _round(value: float) -> float:
+    return round(value, 2)
+
+
+def _stats(values: Sequence[float]) -> Dict[str, float]:
+    if not values:
+        return {"total": 0.0, "mean": 0.0, "min": 0.0, "max": 0.0}
+    total = sum(values)
+    return {
+        "total": _round(total),
+        "mean": _round(total / len(values)),
+        "min": _round(min(values)),
+        "max": _round(max(values))
+    }
+
+
+def _extremes(rows: Sequence[Any], key: Callable[[Any], float], top: int) -> Tuple[List[Any], List[Any]]:
+    """Строки с наибольшими и наименьшими значениями, без полной сортировки"""
+    return heapq.nlargest(top, rows, key=key), heapq.nsmallest(top, rows, key=key)
+
+
+def _dump(rows: Iterable[Any]) -> List[Dict[str, Any]]:
+    return [row.model_dump(mode="json") for row in rows]
+
+
+def _totals_by(keys: Iterable[Any], values: Iterable[float]) -> Dict[Any, float]:
+    totals: Dict[Any, float] = defaultdict(float)
+    for key, value in zip(keys, values):
+        totals[key] += value
+    return totals
+
+
+def _period(dates: Sequence[date]) -> Dict[str, Any]:
+    if not dates:
+        return {"date_start": None, "date_end": None, "days": 0}
+    return {"date_start": min(dates).isoformat(), "date_end": max(dates).isoformat(), "days": len(set(dates))}
+
+
+def forecast(rows: Sequence[Any], top: int = 5) -> Dict[str, Any]:
+    dates = list(map(attrgetter("date"), rows))
+    sales = list(map(attrgetter("predicted_sales"), rows))
+    weekday_totals = _totals_by((day.isoweekday() for day in dates), sales)
+    weekday_counts = Counter(day.isoweekday() for day in dates)
+    highest, lowest = _extremes(rows, attrgetter("predicted_sales"), top)
+    return {
+        "rows": len(rows),
+        **_period(dates),
+        "predicted_sales": _stats(sales),
+        # Средний прогноз по дням недели, 1 - понедельник
+        "weekday_mean": {
+            weekday: _round(weekday_totals[weekday] / weekday_counts[weekday]) for weekday in sorted(weekday_counts)
+        },
+        "top": _dump(highest),
+        "bottom": _dump(lowest)
+    }
+
+
+def hourly_sales(rows: Sequence[Any], top: int = 5) -> Dict[str, Any]:
+    dates = list(map(attrgetter("date"), rows))
+    hours = list(map(attrgetter("hour"), rows))
+    sales = list(map(attrgetter("sales_amount"), rows))
+    daily = _totals_by(dates, sales)
+    hourly = _totals_by(hours, sales)
+    days = len(daily) or 1
+    highest, lowest = _extremes(rows, attrgetter("sales_amount"), top)
+    return {
+        "rows": len(rows),
+        **_period(dates),
+        "sales_amount": _stats(sales),
+        "daily_total": _stats(list(daily.values())),
+        # Средние продажи за час по всем дням периода
+        "hourly_mean": {hour: _round(hourly[hour] / days) for hour in sorted(hourly)},
+        "top": _dump(highest),
+        "bottom": _dump(lowest),
+        "daily": {day.isoformat(): _round(daily[day]) for day in sorted(daily)}
+    }
+
+
+def plan_vs_fact(rows: Sequence[Any], top: int = 5) -> Dict[str, Any]:
+    dates = list(map(attrgetter("date"), rows))
+    predicted = sum(map(attrgetter("predicted_sales"), rows))
+    actual = sum(map(attrgetter("actual_sales"), rows))
+    errors = list(map(attrgetter("error_percentage"), rows))
+    worst, best = _extremes(rows, lambda row: abs(row.error_percentage), top)
+    return {
+        "rows": len(rows),
+        **_period(dates),
+        "predicted_sales": _round(predicted),
+        "actual_sales": _round(actual),
+        "error": _round(actual - predicted),
+        "error_percentage": _round((actual - predicted) / predicted * 100) if predicted else 0.0,
+        # Средняя абсолютная ошибка прогноза по дням, %
+        "mape": _round(sum(map(abs, errors)) / len(errors)) if errors else 0.0,
+        "worst": _dump(worst),
+        "best": _dump(best)
+    }
+
+
+def payroll(employees: Sequence[Any], top: int = 5) -> Dict[str, Any]:
+    shifts = [shift for employee in employees for shift in employee.shifts]
+    hours = list(map(attrgetter("work_hours"), shifts))
+    amounts = list(map(attrgetter("payroll_for_shift"), shifts))
+    by_schedule = _totals_by(map(attrgetter("schedule_name"), shifts), amounts)
+    highest = heapq.nlargest(top, employees, key=attrgetter("payroll_total"))
+    return {
+        "employees": len(employees),
+        "shifts": len(shifts),
+        **_period(list(map(attrgetter("date"), shifts))),
+        "payroll_total": _round(sum(map(attrgetter("payroll_total"), employees))),
+        "work_hours": _round(sum(hours)),
+        "payroll_per_shift": _stats(amounts),
+        "by_schedule": {name: _round(total) for name, total in sorted(by_schedule.items())},
+        "top_employees": [
+            {
+                "employee_name": employee.employee_name,
+                "payroll_total": _round(employee.payroll_total),
+                "shifts": len(employee.shifts),
+                "work_hours": _round(sum(map(attrgetter("work_hours"), employee.shifts)))
+            }
+            for employee in highest
+        ]
+    }
+
+
+def _review(review: Any) -> Dict[str, Any]:
+    data = review.model_dump(mode="json", include={"review_id", "rating", "text", "date_created"})
+    if len(data["text"]) > _TEXT_LIMIT:
+        data["text"] = data["text"][:_TEXT_LIMIT] + "…"
+    return data
+
+
+def reviews(rows: Sequence[Any], top: int = 5) -> Dict[str, Any]:
+    ratings = list(map(attrgetter("rating"), rows))
+    created = list(map(attrgetter("date_created"), rows))
+    histogram = Counter(round(rating) for rating in ratings)
+    highest, lowest = _extremes(rows, attrgetter("rating"), top)
+    return {
+        "rows": len(rows),
+        "date_start": min(created).isoformat() if created else None,
+        "date_end": max(created).isoformat() if created else None,
+        "rating": _stats(ratings),
+        "histogram": {rating: histogram.get(rating, 0) for rating in range(1, 6)},
+        "lowest": [_review(review) for review in lowest],
+        "highest": [_review(review) for review in highest]
+    }
+
+
+# Части снимка, для которых строятся сводки
+_SNAPSHOT_PARTS = {"forecast": forecast, "hourly_sales": hourly_sales, "plan_vs_fact": plan_vs_fact, "payroll": payroll}
+
+
+def snapshot(result: Any, top: int = 5) -> Dict[str, Any]:
+    """Сводка по каждой загруженной части снимка"""
+    summary = {
+        "department_id": str(result.department_id),
+        "date_start": result.date_start.isoformat(),
+        "date_end": result.date_end.isoformat(),
+        "department_info": result.department_info and result.department_info.model_dump(mode="json"),
+        "errors": {name: error.model_dump(mode="json") for name, error in result.errors.items()}
+    }
+    for name, summarize in _SNAPSHOT_PARTS.items():
+        rows = getattr(result, name)
+        if rows is not None:
+            summary[name] = summarize(rows, top)
+    return summary
+
+
+def fit_budget(summary: Dict[str, Any], budget: int) -> Optional[bytes]:
+    """
+    Сводка в JSON не длиннее budget байт: разделы отбрасываются в порядке
+    _DROP_ORDER (у снимка - и внутри сводок его частей), итоги остаются
+    всегда. Отброшенные разделы перечислены в omitted. None, если в бюджет
+    не помещаются даже итоги.
+    """
+    # Сводка может быть закэширована - изменяем только копии
+    summary = {name: dict(value) if name in _SNAPSHOT_PARTS and value else value for name, value in summary.items()}
+    containers = [("", summary)] + [(f"{name}.", summary[name]) for name in _SNAPSHOT_PARTS if summary.get(name)]
+    dropped: List[str] = []
+    body = json_codec.dumps(summary)
+    for section in _DROP_ORDER:
+        if len(body) <= budget:
+            return body
+        popped = [prefix + section for prefix, container in containers if container.pop(section, None) is not None]
+        if popped:
+            dropped.extend(popped)
+            body = json_codec.dumps({**summary, "omitted": dropped})
+    return body if len(body) <= budget else None
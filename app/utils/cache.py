@@ -1,15 +1,63 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import wraps
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional
+import asyncio
 import hashlib
+import time
 import json
 from datetime import datetime, timedelta
 from cachetools import TTLCache
 from loguru import logger
+from pydantic import BaseModel
+
+from app.core.config import get_settings
+from app.core.conditional import content_digest
+from app.core.exceptions import DeadlineExceededError
+from app.utils.deadline import check_deadline, remaining
+from app.utils import metrics, json_codec
+
+
+# Загрузки без сохранения в кэш (например, выгрузки); наследуется задачами,
+# созданными внутри CacheManager.bypass()
+_bypass: ContextVar[bool] = ContextVar("cache_bypass", default=False)
+
+
+class _Flight:
+    """
+    Выполняющаяся загрузка значения и число ожидающих её запросов
+    """
+    __slots__ = ("task", "waiters", "started")
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        self.started = time.monotonic()
+
+
+def _content_bytes(value: Any) -> bytes:
+    """
+    Байты для хэша: модели сериализуются в pydantic-core, у готовых ответов берётся тело
+    """
+    if isinstance(value, BaseModel):
+        return value.__pydantic_serializer__.to_json(value)
+    body = getattr(value, "body", None)
+    if isinstance(body, bytes):
+        return body
+    return json_codec.dumps(value)
 
 
 class CacheManager:
     def __init__(self, ttl: int = 1800, maxsize: int = 100):
         self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Хэши содержимого записей для ETag; считаются при первом запросе
+        self.digests = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Производные представления записей (например, колонки рядов) по имени;
+        # строятся при первом запросе и удаляются вместе с записью
+        self.views = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Сжатые тела ответов по (ETag, кодировка): ETag содержит хэш записи
+        self.compressed = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[str, _Flight] = {}
     
     def _generate_key(self, func_name: str, *args, **kwargs) -> str:
         key_data = {
@@ -20,40 +68,242 @@ class CacheManager:
         key_str = json.dumps(key_data, sort_keys=True, default=str)
         return hashlib.md5(key_str.encode()).hexdigest()
     
+    async def _load(self, cache_key: str, func: Callable, args: tuple, kwargs: dict) -> Any:
+        try:
+            result = await func(*args, **kwargs)
+            
+            # Сохраняем в кэш
+            self.cache[cache_key] = result
+            self.digests.pop(cache_key, None)
+            self.views.pop(cache_key, None)
+            logger.debug(f"Cached result for {func.__name__} with key {cache_key}")
+            return result
+        finally:
+            flight = self._inflight.get(cache_key)
+            if flight is not None and flight.task is asyncio.current_task():
+                del self._inflight[cache_key]
+    
+    async def _wait(self, cache_key: str, flight: _Flight, func_name: str) -> Any:
+        """
+        Ожидает общую загрузку. Если ожидающий отменён (клиент отключился или
+        истёк его дедлайн) и других ожидающих нет, загрузка отменяется:
+        её результат никому не нужен. Отменяемая загрузка сразу убирается
+        из выполняющихся, чтобы новые запросы начинали свою, а не
+        присоединялись к ней и не получали чужую отмену.
+        """
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                if self._inflight.get(cache_key) is flight:
+                    del self._inflight[cache_key]
+                flight.task.cancel()
+                # Дожидаемся отмены, чтобы соединение с апстримом освободилось сразу
+                await asyncio.wait({flight.task})
+                metrics.increment("singleflight.loads_cancelled")
+                metrics.increment("singleflight.seconds_cancelled", time.monotonic() - flight.started)
+                logger.debug(f"Cancelled load for {func_name}: no waiters left")
+            raise
+        finally:
+            flight.waiters -= 1
+    
     def cached(self, ttl: Optional[int] = None):
         def decorator(func: Callable) -> Callable:
             @wraps(func)
             async def wrapper(*args, **kwargs) -> Any:
                 cache_key = self._generate_key(func.__name__, *args, **kwargs)
                 
-                # Проверяем кэш
-                if cache_key in self.cache:
-                    logger.debug(f"Cache hit for {func.__name__} with key {cache_key}")
-                    return self.cache[cache_key]
-                
-                # Вызываем функцию
-                logger.debug(f"Cache miss for {func.__name__} with key {cache_key}")
-                result = await func(*args, **kwargs)
-                
-                # Сохраняем в кэш
-                self.cache[cache_key] = result
-                logger.debug(f"Cached result for {func.__name__} with key {cache_key}")
-                
-                return result
+                while True:
+                    # Проверяем кэш
+                    if cache_key in self.cache:
+                        logger.debug(f"Cache hit for {func.__name__} with key {cache_key}")
+                        return self.cache[cache_key]
+                    
+                    # Не начинаем работу, бюджет которой уже исчерпан
+                    check_deadline(f"cache:{func.__name__}")
+                    
+                    if _bypass.get():
+                        logger.debug(f"Cache bypassed for {func.__name__} with key {cache_key}")
+                        return await func(*args, **kwargs)
+                    
+                    # Single-flight: одновременные промахи ждут одну загрузку
+                    flight = self._inflight.get(cache_key)
+                    started_here = flight is None
+                    if started_here:
+                        logger.debug(f"Cache miss for {func.__name__} with key {cache_key}")
+                        flight = _Flight(asyncio.create_task(self._load(cache_key, func, args, kwargs)))
+                        self._inflight[cache_key] = flight
+                    else:
+                        logger.debug(f"Joined in-flight load for {func.__name__} with key {cache_key}")
+                        metrics.increment("singleflight.shared_waits")
+                    
+                    try:
+                        return await self._wait(cache_key, flight, func.__name__)
+                    except DeadlineExceededError:
+                        # Загрузка шла с дедлайном запроса, который её начал;
+                        # если наш бюджет ещё не исчерпан - загружаем заново
+                        budget = remaining()
+                        if started_here or (budget is not None and budget <= 0):
+                            raise
             
+            wrapper.digest = lambda *args, **kwargs: self.digest(func.__name__, *args, **kwargs)
+            wrapper.view = lambda name, build, *args, **kwargs: self.view(func.__name__, name, build, *args, **kwargs)
             return wrapper
         return decorator
     
+    @contextmanager
+    def bypass(self) -> Iterator[None]:
+        """
+        Промахи внутри блока загружаются напрямую и не сохраняются в кэш,
+        в том числе во вложенных кэшируемых загрузчиках и созданных в блоке задачах.
+        Уже закэшированные значения по-прежнему возвращаются.
+        """
+        token = _bypass.set(True)
+        try:
+            yield
+        finally:
+            _bypass.reset(token)
+    
+    def digest(self, func_name: str, *args, **kwargs) -> Optional[str]:
+        """
+        Хэш содержимого закэшированного значения, хранящийся вместе с записью.
+        Считается один раз на запись; None, если значения в кэше нет.
+        """
+        cache_key = self._generate_key(func_name, *args, **kwargs)
+        value = self.cache.get(cache_key)
+        if value is None:
+            return None
+        
+        digest = self.digests.get(cache_key)
+        if digest is None:
+            digest = self.digests[cache_key] = content_digest(_content_bytes(value))
+        return digest
+    
+    def view(self, func_name: str, name: str, build: Callable[[Any], Any], *args, **kwargs) -> Optional[Any]:
+        """
+        Представление name закэшированного значения, хранящееся вместе с записью.
+        build(value) вызывается один раз на запись; None, если значения в кэше нет.
+        """
+        cache_key = self._generate_key(func_name, *args, **kwargs)
+        value = self.cache.get(cache_key)
+        if value is None:
+            return None
+        
+        views = self.views.get(cache_key)
+        if views is None:
+            views = self.views[cache_key] = {}
+        if name not in views:
+            views[name] = build(value)
+        return views[name]
+    
+    def compressed_body(self, etag: str, encoding: str, body: bytes, compress: Callable[[bytes], bytes]) -> bytes:
+        """
+        Сжатое тело ответа с сильным ETag: сжимается при первом запросе
+        и хранится рядом с записями кэша, повторные ответы не тратят CPU на сжатие
+        """
+        key = (etag, encoding)
+        data = self.compressed.get(key)
+        if data is None:
+            data = self.compressed[key] = compress(body)
+            metrics.increment("compression.cache_misses")
+        else:
+            metrics.increment("compression.cache_hits")
+        return data
+    
     def invalidate(self, func_name: str, *args, **kwargs):
         cache_key = self._generate_key(func_name, *args, **kwargs)
+        self.digests.pop(cache_key, None)
+        self.views.pop(cache_key, None)
         if cache_key in self.cache:
             del self.cache[cache_key]
             logger.debug(f"Invalidated cache for {func_name} with key {cache_key}")
     
     def clear(self):
         self.cache.clear()
+        self.digests.clear()
+        self.views.clear()
+        self.compressed.clear()
         logger.debug("Cache cleared")
 
 
+class ValidatorCache:
+    """
+    Хранилище валидаторов (ETag / Last-Modified) вместе с уже разобранными
+    телами ответов внешних API.
+    
+    Используется HTTPClient для условных запросов: когда кэш эндпоинта истёк,
+    апстрим получает If-None-Match / If-Modified-Since и на 304 мы берём
+    сохранённое тело без повторной загрузки и разбора.
+    """
+    
+    def __init__(self, ttl: int = 86400, maxsize: int = 256):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+    
+    def _generate_key(self, url: str, params: Optional[Mapping[str, Any]] = None, variant: str = "json") -> str:
+        key_str = json.dumps({"url": url, "params": params or {}, "variant": variant}, sort_keys=True, default=str)
+        return hashlib.md5(key_str.encode()).hexdigest()
+    
+    def conditional_headers(
+        self,
+        url: str,
+        params: Optional[Mapping[str, Any]] = None,
+        variant: str = "json"
+    ) -> Dict[str, str]:
+        entry = self.cache.get(self._generate_key(url, params, variant))
+        if entry is None:
+            return {}
+        
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+    
+    def revalidated(
+        self,
+        url: str,
+        params: Optional[Mapping[str, Any]] = None,
+        variant: str = "json"
+    ) -> Optional[Any]:
+        """
+        Возвращает сохранённое тело после ответа 304 и продлевает TTL записи
+        """
+        cache_key = self._generate_key(url, params, variant)
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            return None
+        
+        # Повторная запись в TTLCache сбрасывает время жизни
+        self.cache[cache_key] = entry
+        logger.debug(f"Revalidated {url} with key {cache_key}")
+        return entry["data"]
+    
+    def store(
+        self,
+        url: str,
+        params: Optional[Mapping[str, Any]],
+        headers: Mapping[str, str],
+        data: Any,
+        variant: str = "json"
+    ):
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        cache_control = headers.get("cache-control", "").lower()
+        
+        if not (etag or last_modified) or "no-store" in cache_control:
+            return
+        
+        self.cache[self._generate_key(url, params, variant)] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "data": data
+        }
+    
+    def clear(self):
+        self.cache.clear()
+
+
 # Глобальный экземпляр для использования
-cache_manager = CacheManager()
\ No newline at end of file
+cache_manager = CacheManager(ttl=get_settings().cache_ttl, maxsize=get_settings().cache_maxsize)
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""
+Колоночное представление временных рядов
+"""
+from datetime import date
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+
+def column_arrays(rows: Sequence[Any], columns: Sequence[str], start_date: date) -> Dict[str, List[Any]]:
+    """
+    Строки ряда -> параллельные массивы. Вместо ISO-даты в каждой строке
+    выводится колонка day - смещение в днях от start_date.
+    """
+    result: Dict[str, List[Any]] = {}
+    for column in columns:
+        if column == "date":
+            start = start_date.toordinal()
+            result["day"] = [row.date.toordinal() - start for row in rows]
+        else:
+            result[column] = list(map(attrgetter(column), rows))
+    return result
+
+
+def columnar_body(
+    arrays: Dict[str, List[Any]],
+    rows: int,
+    start_date: date,
+    fields: Optional[Set[str]] = None
+) -> Dict[str, Any]:
+    """
+    Тело ответа format=columnar из готовых массивов; fields ограничивает
+    набор колонок так же, как для строк
+    """
+    if fields is not None:
+        arrays = {
+            name: values for name, values in arrays.items()
+            if ("date" if name == "day" else name) in fields
+        }
+    return {
+        "format": "columnar",
+        "start_date": start_date.isoformat(),
+        "rows": rows,
+        "columns": arrays
+    }
+
@@ -0,0 +1,41 @@
+"""
+Сквозной дедлайн запроса: от вызывающего MCP-клиента до запросов к внешним API
+"""
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+
+from app.core.exceptions import DeadlineExceededError
+
+# Абсолютный момент (time.monotonic) окончания бюджета текущего запроса
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def set_deadline(timeout: Optional[float]) -> Token:
+    """
+    Устанавливает дедлайн через timeout секунд (None - без дедлайна)
+    """
+    return _deadline.set(time.monotonic() + timeout if timeout else None)
+
+
+def reset_deadline(token: Token):
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Оставшийся бюджет в секундах или None, если дедлайн не задан
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline(stage: str):
+    """
+    Прерывает работу, бюджет которой уже исчерпан
+    """
+    budget = remaining()
+    if budget is not None and budget <= 0:
+        raise DeadlineExceededError(stage)
@@ -0,0 +1,164 @@
+"""
+Кодирование и декодирование JSON
+"""
+import asyncio
+import codecs
+import json
+import re
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, Union
+from uuid import UUID
+from pydantic import BaseModel
+from loguru import logger
+
+from app.core.config import get_settings
+
+# orjson заметно быстрее stdlib json, но остаётся опциональной зависимостью
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# raw_decode (C-сканер stdlib) разбирает один элемент и возвращает позицию его конца
+_element_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    Разбирает JSON быстрым декодером, если он установлен
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_default(value: Any) -> Any:
+    """
+    Типы, которые кодировщик не сериализует сам; приводятся так же, как в jsonable_encoder
+    """
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Кодирует данные в компактный UTF-8 JSON без экранирования кириллицы.
+    
+    date / datetime / UUID выводятся в ISO-формате одинаково в обоих кодировщиках.
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        data,
+        default=encode_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+async def loads_async(data: Union[bytes, str]) -> Any:
+    """
+    Разбирает JSON, вынося большие тела в пул потоков, чтобы не задерживать
+    event loop (и вместе с ним SSE потоки) на время разбора
+    """
+    threshold = get_settings().json_offload_threshold
+    if threshold and len(data) >= threshold:
+        logger.debug(f"Разбор JSON ({len(data)} байт) в пуле потоков")
+        return await asyncio.to_thread(loads, data)
+    return loads(data)
+
+
+class _ArrayParser:
+    """
+    Состояние инкрементального разбора JSON-массива верхнего уровня
+    """
+    
+    def __init__(self):
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.started = False
+        self.expect_separator = False
+        self.finished = False
+    
+    def feed(self, chunk: bytes) -> list:
+        """
+        Добавляет чанк и возвращает элементы, которые удалось разобрать полностью
+        """
+        buffer = self.buffer + self.decoder.decode(chunk)
+        size = len(buffer)
+        items = []
+        pos = 0
+        
+        while pos < size:
+            char = buffer[pos]
+            
+            if char in " \t\n\r":
+                pos = _WHITESPACE.match(buffer, pos).end()
+            elif not self.started:
+                if char != "[":
+                    raise ValueError("Ожидался JSON-массив верхнего уровня")
+                self.started = True
+                pos += 1
+            elif char == "]":
+                self.finished = True
+                pos = size
+            elif self.expect_separator:
+                if char != ",":
+                    raise ValueError(f"Ожидалась запятая между элементами массива, получено {char!r}")
+                self.expect_separator = False
+                pos += 1
+            else:
+                try:
+                    item, end = _element_decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Элемент оборвался на границе чанка - ждём продолжения
+                    break
+                # Число на границе чанка ("2." или "12") может продолжиться
+                # в следующем чанке - элемент завершён только перед , или ]
+                next_pos = end if end < size and buffer[end] in ",]" else _WHITESPACE.match(buffer, end).end()
+                if next_pos >= size or buffer[next_pos] not in ",]":
+                    break
+                items.append(item)
+                pos = end
+                self.expect_separator = True
+        
+        # Храним только ещё не разобранный хвост
+        self.buffer = buffer[pos:]
+        return items
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[list]:
+    """
+    Инкрементально разбирает JSON-массив верхнего уровня из потока байтов
+    и отдаёт его элементы пачками - по мере поступления чанков.
+    
+    В памяти держится только ещё не разобранный хвост потока и одна пачка,
+    поэтому пиковое потребление определяется размером чанка, а не всего ответа.
+    """
+    parser = _ArrayParser()
+    
+    async for chunk in chunks:
+        if parser.finished:
+            continue
+        items = parser.feed(chunk)
+        if items:
+            yield items
+    
+    if not parser.finished:
+        raise ValueError("JSON-массив оборвался до закрывающей скобки")
@@ -0,0 +1,110 @@
+"""
+Статистика задержек внешних API и адаптивные таймауты
+"""
+import math
+import re
+from collections import deque
+from typing import Deque, Dict, Mapping, Optional
+from loguru import logger
+
+# UUID и числовые сегменты пути заменяются на {id}, чтобы все подразделения
+# одного эндпоинта попадали в одну статистику
+_PATH_ID = re.compile(r"(?<=/)(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)(?=/|$)")
+
+
+def endpoint_key(endpoint: str) -> str:
+    """
+    Нормализует путь эндпоинта: admin/departments/<uuid> -> admin/departments/{id}
+    """
+    return _PATH_ID.sub("{id}", "/" + endpoint.strip("/"))[1:]
+
+
+class LatencyWindow:
+    """
+    Скользящее окно последних задержек одного эндпоинта
+    """
+    
+    def __init__(self, size: int = 1000):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.recorded = 0
+    
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.recorded += 1
+    
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)
+        return ordered[max(index, 0)]
+
+
+class AdaptiveTimeouts:
+    """
+    Таймауты для внешних API, выводимые из истории задержек каждого эндпоинта:
+    quantile(задержка) * factor, ограниченные [min_timeout, max_timeout].
+    
+    Пока статистики мало, используется default_timeout. Статические значения
+    из overrides имеют приоритет над вычисленными.
+    """
+    
+    def __init__(
+        self,
+        default_timeout: float,
+        quantile: float = 0.999,
+        factor: float = 3.0,
+        min_timeout: float = 2.0,
+        max_timeout: float = 120.0,
+        window: int = 1000,
+        min_samples: int = 50,
+        overrides: Optional[Mapping[str, float]] = None,
+        enabled: bool = True
+    ):
+        self.default_timeout = default_timeout
+        self.quantile = quantile
+        self.factor = factor
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.window = window
+        self.min_samples = min_samples
+        self.overrides = dict(overrides or {})
+        self.enabled = enabled
+        self._windows: Dict[str, LatencyWindow] = {}
+        # Вычисленные таймауты пересчитываются не на каждый запрос, а раз в min_samples замеров
+        self._timeouts: Dict[str, float] = {}
+    
+    def record(self, key: str, seconds: float):
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = LatencyWindow(self.window)
+        window.add(seconds)
+        
+        if window.recorded >= self.min_samples and window.recorded % self.min_samples == 0:
+            timeout = window.quantile(self.quantile) * self.factor
+            timeout = min(max(timeout, self.min_timeout), self.max_timeout)
+            if key not in self._timeouts or abs(self._timeouts[key] - timeout) >= 0.5:
+                logger.debug(f"Таймаут для {key}: {timeout:.2f}s")
+            self._timeouts[key] = timeout
+    
+    def timeout_for(self, key: str) -> float:
+        if key in self.overrides:
+            return self.overrides[key]
+        if not self.enabled:
+            return self.default_timeout
+        return self._timeouts.get(key, self.default_timeout)
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            key: {
+                "samples": len(window.samples),
+                "p50": window.quantile(0.5),
+                "p99": window.quantile(0.99),
+                "timeout": self.timeout_for(key)
+            }
+            for key, window in self._windows.items()
+        }
+    
+    def reset(self):
+        self._windows.clear()
+        self._timeouts.clear()
@@ -0,0 +1,19 @@
+"""
+Счётчики работы сервиса
+"""
+from collections import Counter
+from typing import Dict
+
+_counters: Counter = Counter()
+
+
+def increment(name: str, value: float = 1):
+    _counters[name] += value
+
+
+def snapshot() -> Dict[str, float]:
+    return dict(_counters)
+
+
+def reset():
+    _counters.clear()
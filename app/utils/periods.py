@@ -0,0 +1,27 @@
+"""
+Разбиение периодов дат на части для загрузки из внешних API
+"""
+from datetime import date, timedelta
+from typing import List, Tuple
+
+
+def split_period(date_start: date, date_end: date, chunk_days: int = 0) -> List[Tuple[date, date]]:
+    """
+    Делит период [date_start, date_end] на последовательные части.
+    
+    При chunk_days=0 части совпадают с календарными месяцами, так что
+    одни и те же месяцы разных периодов дают одинаковые части
+    (кроме неполных крайних). Иначе части имеют длину chunk_days дней.
+    """
+    chunks = []
+    start = date_start
+    while start <= date_end:
+        if chunk_days:
+            end = start + timedelta(days=chunk_days - 1)
+        else:
+            next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+            end = next_month - timedelta(days=1)
+        end = min(end, date_end)
+        chunks.append((start, end))
+        start = end + timedelta(days=1)
+    return chunks
@@ -0,0 +1,91 @@
+"""
+Выбор полей и фильтрация строк ответа до сериализации
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Set, Type
+from pydantic import BaseModel
+
+from app.core.exceptions import ValidationError
+
+
+def _split(value: str) -> List[str]:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def parse_fields(value: Optional[str], item_model: Type[BaseModel]) -> Optional[Set[str]]:
+    """
+    fields=predicted_sales,date -> {"predicted_sales", "date"}; None - все поля
+    """
+    if not value:
+        return None
+    fields = set(_split(value))
+    unknown = fields - set(item_model.model_fields)
+    if unknown:
+        raise ValidationError(
+            message=f"Неизвестные поля: {', '.join(sorted(unknown))}. "
+                    f"Доступны: {', '.join(item_model.model_fields)}",
+            field="fields"
+        )
+    return fields
+
+
+def parse_hours(value: Optional[str]) -> Optional[Set[int]]:
+    """
+    hours=9,12-14 -> {9, 12, 13, 14}
+    """
+    if not value:
+        return None
+    hours = set()
+    try:
+        for part in _split(value):
+            first, _, last = part.partition("-")
+            hours.update(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise ValidationError(message=f"Некорректный список часов: {value}", field="hours")
+    if not hours or min(hours) < 0 or max(hours) > 23:
+        raise ValidationError(message="Часы должны быть в диапазоне от 0 до 23", field="hours")
+    return hours
+
+
+def parse_dates(value: Optional[str]) -> Optional[Set[date]]:
+    """
+    dates=2025-07-01,2025-07-10..2025-07-12 -> отдельные даты и диапазоны включительно
+    """
+    if not value:
+        return None
+    dates = set()
+    try:
+        for part in _split(value):
+            first, _, last = part.partition("..")
+            start = date.fromisoformat(first)
+            end = date.fromisoformat(last) if last else start
+            if end < start:
+                raise ValueError(part)
+            dates.update(start + timedelta(days=day) for day in range((end - start).days + 1))
+    except ValueError:
+        raise ValidationError(message=f"Некорректный список дат: {value}", field="dates")
+    return dates
+
+
+def filter_rows(
+    rows: List[Any],
+    dates: Optional[Set[date]] = None,
+    hours: Optional[Set[int]] = None,
+    min_rating: Optional[float] = None
+) -> List[Any]:
+    if dates is not None:
+        rows = [row for row in rows if row.date in dates]
+    if hours is not None:
+        rows = [row for row in rows if row.hour in hours]
+    if min_rating is not None:
+        rows = [row for row in rows if row.rating >= min_rating]
+    return rows
+
+
+def rows_include(fields: Optional[Set[str]]) -> Optional[Dict[str, Any]]:
+    """
+    Параметр include сериализатора pydantic для ответа вида {"data": [...]}
+    """
+    if fields is None:
+        return None
+    return {"data": {"__all__": fields}}
@@ -0,0 +1,43 @@
+"""
+Приёмник байтов для потоковых кодировщиков выгрузок
+"""
+from typing import List
+
+
+class DrainableSink:
+    """
+    Файлоподобный приёмник для писателей pyarrow и zipfile: накопленные байты
+    забираются по мере записи, а tell() продолжает считать абсолютную позицию,
+    которую Parquet и ZIP записывают в метаданные файла.
+    """
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def writable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return False
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
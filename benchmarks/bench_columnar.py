@@ -0,0 +1,62 @@
+"""
+Построчный JSON против format=columnar для временных рядов:
+время построения и кодирования ответа и его размер.
+    
+    python benchmarks/bench_columnar.py
+"""
+import time
+from datetime import date
+
+from payloads import make_forecast, make_hourly_sales, make_plan_vs_fact
+
+from app.core.responses import FastJSONResponse, ModelResponse
+from app.models.responses import (
+    ForecastItem, ForecastResponse, FORECAST_ITEMS,
+    HourlySalesItem, HourlySalesResponse, HOURLY_SALES_ITEMS,
+    PlanVsFactItem, PlanVsFactResponse, PLAN_VS_FACT_ITEMS
+)
+from app.utils import json_codec
+from app.utils.columnar import column_arrays, columnar_body
+
+ROUNDS = 20
+START = date(2025, 1, 1)
+
+
+def timed(func) -> float:
+    func()
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def columnar_response(model, columns) -> FastJSONResponse:
+    # Так же, как ответ format=columnar в эндпоинтах
+    arrays = column_arrays(model.data, columns, START)
+    return FastJSONResponse(columnar_body(arrays, len(model.data), START))
+
+
+def main():
+    series = {
+        "forecast 365d": (ForecastResponse, ForecastItem, FORECAST_ITEMS, make_forecast(365, START)),
+        "hourly_sales 365d": (HourlySalesResponse, HourlySalesItem, HOURLY_SALES_ITEMS, make_hourly_sales(365, START)),
+        "plan_vs_fact 365d": (PlanVsFactResponse, PlanVsFactItem, PLAN_VS_FACT_ITEMS, make_plan_vs_fact(365, START))
+    }
+    
+    print(f"orjson available: {json_codec.ORJSON_AVAILABLE}")
+    print(f"{'endpoint':<20}{'rows KB':>9}{'columnar KB':>13}{'rows ms':>9}{'columnar ms':>13}")
+    for name, (response_model, item_model, adapter, data) in series.items():
+        model = response_model.model_construct(data=adapter.validate_python(data))
+        columns = list(item_model.model_fields)
+        
+        rows_body = ModelResponse(model).body
+        columnar = columnar_response(model, columns).body
+        rows_ms = timed(lambda: ModelResponse(model))
+        columnar_ms = timed(lambda: columnar_response(model, columns))
+        
+        print(f"{name:<20}{len(rows_body) / 1024:>9.1f}{len(columnar) / 1024:>13.1f}"
+              f"{rows_ms:>9.2f}{columnar_ms:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
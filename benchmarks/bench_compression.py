@@ -0,0 +1,63 @@
+"""
+Сжатие ответов: размер и время gzip / brotli на типичных телах ответов
+и стоимость повторного ответа из кэша сжатых тел.
+    
+    python benchmarks/bench_compression.py
+"""
+import time
+
+from payloads import make_hourly_sales, make_payroll, make_reviews
+
+from app.core import compression
+from app.core.responses import ModelResponse
+from app.models.responses import HourlySalesResponse, PayrollResponse, ReviewsResponse, HOURLY_SALES_ITEMS, REVIEWS
+from app.utils.cache import CacheManager
+
+ROUNDS = 20
+
+
+def timed(func) -> float:
+    func()
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def main():
+    bodies = {
+        "hourly_sales 365d": ModelResponse(HourlySalesResponse.model_construct(
+            data=HOURLY_SALES_ITEMS.validate_python(make_hourly_sales(365))
+        )).body,
+        "payroll 60x90": ModelResponse(PayrollResponse.model_validate(make_payroll(60, 90))).body,
+        "reviews x1000": ModelResponse(ReviewsResponse.model_construct(
+            data=REVIEWS.validate_python(make_reviews(1000))
+        )).body
+    }
+    levels = [("gzip", 1), ("gzip", 6), ("gzip", 9)]
+    if compression.BROTLI_AVAILABLE:
+        levels += [("br", 4), ("br", 5), ("br", 11)]
+    else:
+        print("brotli не установлен, сравниваются только уровни gzip")
+    
+    print(f"{'body':<20}{'encoding':<10}{'KB':>9}{'ratio':>8}{'ms':>9}")
+    for name, body in bodies.items():
+        print(f"{name:<20}{'identity':<10}{len(body) / 1024:>9.1f}{1:>8.2f}{0:>9.2f}")
+        for encoding, level in levels:
+            data = compression.compress(body, encoding, level)
+            ms = timed(lambda: compression.compress(body, encoding, level))
+            print(f"{name:<20}{f'{encoding}/{level}':<10}{len(data) / 1024:>9.1f}{len(body) / len(data):>8.2f}{ms:>9.2f}")
+    
+    # Повторный ответ с тем же ETag: готовые байты из кэша вместо сжатия
+    cache = CacheManager()
+    body = bodies["hourly_sales 365d"]
+    compress = lambda data: compression.compress(data, "gzip", 6)
+    etag = '"hourly-sales"'
+    cache.compressed_body(etag, "gzip", body, compress)
+    print()
+    print(f"hourly_sales 365d gzip/6 без кэша: {timed(lambda: compress(body)):.3f} ms")
+    print(f"hourly_sales 365d gzip/6 из кэша:  {timed(lambda: cache.compressed_body(etag, 'gzip', body, compress)):.4f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Задержка event loop при разборе больших ответов внешних API.
+
+Пока один корутин разбирает тело ответа, фоновый "тикер" каждые 1 мс
+замеряет, на сколько опоздал его вызов - так же опаздывают SSE потоки.
+
+    python benchmarks/bench_json_decode.py
+"""
+import asyncio
+import json
+import time
+
+from payloads import make_hourly_sales, make_reviews
+
+from app.utils import json_codec
+
+ROUNDS = 20
+
+
+async def measure_lag(decode, body: bytes) -> tuple:
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - started - 0.001)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await decode(body)
+        await asyncio.sleep(0)
+    elapsed = (time.perf_counter() - started) / ROUNDS
+
+    stop.set()
+    await ticker_task
+    return elapsed * 1000, max(lags) * 1000
+
+
+async def stdlib_on_loop(body: bytes):
+    return json.loads(body)
+
+
+async def fast_on_loop(body: bytes):
+    return json_codec.loads(body)
+
+
+async def fast_in_thread(body: bytes):
+    return await asyncio.to_thread(json_codec.loads, body)
+
+
+async def main():
+    payloads = {
+        "reviews x1000": json.dumps(make_reviews(1000), ensure_ascii=False).encode(),
+        "hourly 365 days": json.dumps(make_hourly_sales(365)).encode()
+    }
+    modes = {
+        "stdlib json, loop": stdlib_on_loop,
+        "fast decoder, loop": fast_on_loop,
+        "fast decoder, thread": fast_in_thread
+    }
+
+    print(f"orjson available: {json_codec.ORJSON_AVAILABLE}")
+    print(f"{'payload':<18}{'size KB':>9}  {'mode':<22}{'decode ms':>10}{'max lag ms':>12}")
+    for name, body in payloads.items():
+        for mode, decode in modes.items():
+            decode_ms, lag_ms = await measure_lag(decode, body)
+            print(f"{name:<18}{len(body) // 1024:>9}  {mode:<22}{decode_ms:>10.2f}{lag_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+Многошаговый ход агента: отдельные REST запросы против одного пакета
+MCP JSON-RPC. Апстрим отвечает с задержкой UPSTREAM_LATENCY, между агентом
+и сервером добавляется ROUND_TRIP на каждый HTTP запрос.
+    
+    python benchmarks/bench_jsonrpc_batch.py
+"""
+import asyncio
+import time
+
+import httpx
+
+from payloads import DEPARTMENT_ID, make_forecast, make_hourly_sales, make_plan_vs_fact
+
+from app.api.v1 import endpoints
+from app.main import app
+from app.utils.cache import cache_manager
+
+UPSTREAM_LATENCY = 0.05
+ROUND_TRIP = 0.04
+PERIOD = {"department_id": DEPARTMENT_ID, "date_start": "2025-01-01", "date_end": "2025-01-31"}
+UPSTREAM = {
+    "forecast/batch": make_forecast(31),
+    "sales/hourly": make_hourly_sales(31),
+    "forecast/comparison": make_plan_vs_fact(31),
+    "departments": {"object_name": "Ресторан", "object_company": "ООО Рестораны"}
+}
+TOOLS = [
+    ("/api/v1/mcp/forecast", "get_forecast", PERIOD),
+    ("/api/v1/mcp/hourly_sales", "get_hourly_sales", PERIOD),
+    ("/api/v1/mcp/plan_vs_fact", "get_plan_vs_fact", PERIOD),
+    ("/api/v1/mcp/department_info", "get_department_info", {"department_id": DEPARTMENT_ID})
+]
+
+
+async def upstream(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(UPSTREAM_LATENCY)
+    for path, body in UPSTREAM.items():
+        if path in request.url.path:
+            return httpx.Response(200, json=body)
+    return httpx.Response(404)
+
+
+class MockedHTTPClient(endpoints.HTTPClient):
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+        return self
+
+
+async def post(client: httpx.AsyncClient, url: str, body) -> httpx.Response:
+    await asyncio.sleep(ROUND_TRIP)
+    response = await client.post(url, json=body)
+    response.raise_for_status()
+    return response
+
+
+async def rest_calls(client: httpx.AsyncClient):
+    for url, _, arguments in TOOLS:
+        await post(client, url, arguments)
+
+
+async def rpc_batch(client: httpx.AsyncClient):
+    batch = [
+        {"jsonrpc": "2.0", "id": id, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+        for id, (_, name, arguments) in enumerate(TOOLS)
+    ]
+    response = await post(client, "/api/v1/mcp/rpc", batch)
+    assert not any(item["result"]["isError"] for item in response.json())
+
+
+async def main():
+    endpoints.HTTPClient = MockedHTTPClient
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        await rpc_batch(client)
+        print(f"{len(TOOLS)} инструментов, апстрим {UPSTREAM_LATENCY * 1000:.0f} ms, "
+              f"клиент-сервер {ROUND_TRIP * 1000:.0f} ms на запрос")
+        for name, scenario in (("REST по очереди", rest_calls), ("пакет JSON-RPC", rpc_batch)):
+            for cache in ("холодный кэш", "тёплый кэш"):
+                if cache == "холодный кэш":
+                    cache_manager.clear()
+                started = time.perf_counter()
+                await scenario(client)
+                print(f"{name:<18}{cache:<14}{(time.perf_counter() - started) * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
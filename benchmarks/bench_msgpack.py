@@ -0,0 +1,69 @@
+"""
+MessagePack против JSON для ответов MCP эндпоинтов: размер, время
+кодирования на сервере и время декодирования на стороне клиента.
+    
+    python benchmarks/bench_msgpack.py
+"""
+import json
+import time
+
+import msgpack
+
+from payloads import make_hourly_sales, make_payroll, make_plan_vs_fact, make_reviews
+
+from app.core import negotiation
+from app.core.responses import ModelResponse
+from app.models.responses import (
+    HourlySalesResponse, PlanVsFactResponse, PayrollResponse, ReviewsResponse,
+    HOURLY_SALES_ITEMS, PLAN_VS_FACT_ITEMS, REVIEWS
+)
+from app.utils import json_codec
+
+ROUNDS = 20
+
+
+def timed(func) -> float:
+    func()
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def encode(model, media_type: str) -> bytes:
+    token = negotiation.set_media_type(media_type)
+    try:
+        return ModelResponse(model).body
+    finally:
+        negotiation.reset_media_type(token)
+
+
+def main():
+    responses = {
+        "hourly_sales 365d": HourlySalesResponse.model_construct(
+            data=HOURLY_SALES_ITEMS.validate_python(make_hourly_sales(365))
+        ),
+        "plan_vs_fact 365d": PlanVsFactResponse.model_construct(
+            data=PLAN_VS_FACT_ITEMS.validate_python(make_plan_vs_fact(365))
+        ),
+        "payroll 60x90": PayrollResponse.model_validate(make_payroll(60, 90)),
+        "reviews x1000": ReviewsResponse.model_construct(data=REVIEWS.validate_python(make_reviews(1000)))
+    }
+    decoders = {
+        negotiation.JSON_MEDIA_TYPE: ("json", json_codec.loads),
+        negotiation.MSGPACK_MEDIA_TYPE: ("msgpack", msgpack.unpackb)
+    }
+    
+    print(f"orjson available: {json_codec.ORJSON_AVAILABLE}")
+    print(f"{'endpoint':<20}{'format':<9}{'size KB':>9}{'encode ms':>11}{'decode ms':>11}{'stdlib json decode ms':>23}")
+    for name, model in responses.items():
+        for media_type, (label, decode) in decoders.items():
+            body = encode(model, media_type)
+            encode_ms = timed(lambda: encode(model, media_type))
+            decode_ms = timed(lambda: decode(body))
+            stdlib_ms = f"{timed(lambda: json.loads(body)):.2f}" if label == "json" else "-"
+            print(f"{name:<20}{label:<9}{len(body) / 1024:>9.1f}{encode_ms:>11.2f}{decode_ms:>11.2f}{stdlib_ms:>23}")
+
+
+if __name__ == "__main__":
+    main()
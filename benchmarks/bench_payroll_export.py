@@ -0,0 +1,89 @@
+"""
+Пиковая память выгрузки смен ФОТ за квартал по числу подразделений:
+вложенный JSON всех подразделений целиком против потоковых CSV / XLSX
+(страница - подразделение за месяц).
+    
+    python benchmarks/bench_payroll_export.py
+"""
+import asyncio
+import time
+import tracemalloc
+from datetime import date
+from unittest.mock import patch, AsyncMock
+from uuid import UUID
+
+from payloads import make_payroll
+
+from app.api.v1 import endpoints
+from app.models.requests import BatchPeriodRequest, PayrollRequest
+from app.services import spreadsheet
+
+DEPARTMENTS = (1, 10, 40)
+EMPLOYEES = 60
+QUARTER = (date(2025, 1, 1), date(2025, 3, 31))
+
+
+async def get_madlen(endpoint, params=None):
+    start, end = date.fromisoformat(params["from_date"]), date.fromisoformat(params["to_date"])
+    return make_payroll(EMPLOYEES, (end - start).days + 1, start)
+
+
+def request(departments: int) -> BatchPeriodRequest:
+    return BatchPeriodRequest(
+        department_ids=[UUID(int=department) for department in range(1, departments + 1)],
+        date_start=QUARTER[0],
+        date_end=QUARTER[1]
+    )
+
+
+async def nested_json(departments: int) -> int:
+    # То, что сейчас собирает финансовый отдел: /payroll по каждому подразделению целиком
+    results = []
+    for department_id in request(departments).department_ids:
+        result = await endpoints.load_payroll(PayrollRequest(
+            department_id=department_id, date_start=QUARTER[0], date_end=QUARTER[1]
+        ))
+        results.append(result.model_dump_json().encode())
+    return sum(map(len, results))
+
+
+async def streamed(departments: int, format: str) -> int:
+    size = 0
+    pages = endpoints.payroll_pages(request(departments))
+    async for chunk in spreadsheet.encode_rows(pages, endpoints.PAYROLL_EXPORT_COLUMNS, format):
+        size += len(chunk)
+    return size
+
+
+async def measure(scenario) -> tuple:
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = await scenario()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak, elapsed
+
+
+async def main():
+    mock_client = AsyncMock()
+    mock_client.get_madlen.side_effect = get_madlen
+    
+    with patch.object(endpoints, "HTTPClient") as mock_http_client:
+        mock_http_client.return_value.__aenter__.return_value = mock_client
+        mock_http_client.return_value.__aexit__.return_value = None
+        
+        print(f"{'departments':<13}{'mode':<13}{'output MB':>11}{'py peak MB':>12}{'seconds':>9}")
+        for departments in DEPARTMENTS:
+            scenarios = {
+                "nested json": lambda: nested_json(departments),
+                "csv stream": lambda: streamed(departments, "csv"),
+                "xlsx stream": lambda: streamed(departments, "xlsx")
+            }
+            for mode, scenario in scenarios.items():
+                size, peak, elapsed = await measure(scenario)
+                print(f"{departments:<13}{mode:<13}{size / 2 ** 20:>11.1f}{peak / 2 ** 20:>12.1f}{elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+"""
+Размер ответа для типичных запросов агентов с выбором полей и фильтрами.
+    
+    python benchmarks/bench_projection.py
+"""
+from payloads import make_forecast, make_hourly_sales, make_reviews
+
+from app.core.responses import ModelResponse
+from app.models.responses import (
+    ForecastResponse, HourlySalesResponse, ReviewsResponse,
+    FORECAST_ITEMS, HOURLY_SALES_ITEMS, REVIEWS
+)
+from app.utils.projection import parse_dates, parse_hours, filter_rows, rows_include
+
+
+def size(model, fields=None, **filters) -> int:
+    if filters:
+        model = type(model).model_construct(data=filter_rows(model.data, **filters))
+    return len(ModelResponse(model, include=rows_include(fields)).body)
+
+
+def main():
+    forecast = ForecastResponse.model_construct(data=FORECAST_ITEMS.validate_python(make_forecast(90)))
+    hourly = HourlySalesResponse.model_construct(data=HOURLY_SALES_ITEMS.validate_python(make_hourly_sales(90)))
+    reviews = ReviewsResponse.model_construct(data=REVIEWS.validate_python(make_reviews(1000)))
+    
+    queries = [
+        ("forecast 90d", "fields=predicted_sales", size(forecast), size(forecast, {"predicted_sales"})),
+        ("hourly 90d", "hours=12-14&fields=hour,sales_amount", size(hourly),
+         size(hourly, {"hour", "sales_amount"}, hours=parse_hours("12-14"))),
+        ("hourly 90d", "dates=<last week>", size(hourly),
+         size(hourly, dates=parse_dates("2025-03-25..2025-03-31"))),
+        ("reviews x1000", "fields=rating,text", size(reviews), size(reviews, {"rating", "text"})),
+        ("reviews x1000", "min_rating=5&fields=rating,text", size(reviews),
+         size(reviews, {"rating", "text"}, min_rating=5))
+    ]
+    
+    print(f"{'endpoint':<15}{'query':<34}{'full KB':>9}{'selected KB':>13}{'smaller':>9}")
+    for name, query, full, selected in queries:
+        print(f"{name:<15}{query:<34}{full / 1024:>9.1f}{selected / 1024:>13.1f}{full / selected:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
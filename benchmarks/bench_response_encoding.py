@@ -0,0 +1,70 @@
+"""
+Стоимость кодирования ответов эндпоинтов.
+
+Для каждого эндпоинта модель ответа приводится к JSON-совместимым данным
+(как это делает FastAPI для response_model) и кодируется в байты стандартным
+JSONResponse и FastJSONResponse. Отдельно показан jsonable_encoder - путь
+ответов без response_model.
+    
+    python benchmarks/bench_response_encoding.py
+"""
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from payloads import make_forecast, make_hourly_sales, make_plan_vs_fact, make_payroll, make_reviews
+
+from app.core.responses import FastJSONResponse
+from app.models.responses import (
+    ForecastResponse, HourlySalesResponse, PlanVsFactResponse,
+    PayrollResponse, DepartmentInfo, ReviewsResponse
+)
+from app.utils import json_codec
+
+ROUNDS = 20
+
+
+def timed(func) -> float:
+    func()
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def main():
+    responses = {
+        "forecast 365d": ForecastResponse(data=make_forecast(365)),
+        "hourly_sales 365d": HourlySalesResponse(data=make_hourly_sales(365)),
+        "plan_vs_fact 365d": PlanVsFactResponse(data=make_plan_vs_fact(365)),
+        "payroll 60x90": PayrollResponse(**make_payroll(60, 90)),
+        "department_info": DepartmentInfo(
+            object_name="Ресторан Центральный",
+            object_company="ООО Рестораны",
+            hall_area=250.5,
+            kitchen_area=75.0,
+            seats_count=120
+        ),
+        "reviews x1000": ReviewsResponse(data=make_reviews(1000))
+    }
+    
+    print(f"orjson available: {json_codec.ORJSON_AVAILABLE}")
+    print(f"{'endpoint':<20}{'size KB':>9}{'jsonable ms':>13}{'dump ms':>10}{'JSONResponse ms':>17}{'FastJSON ms':>13}{'speedup':>9}")
+    for name, model in responses.items():
+        content = model.model_dump(mode="json")
+        size = len(FastJSONResponse(content).body)
+        
+        jsonable_ms = timed(lambda: jsonable_encoder(model))
+        dump_ms = timed(lambda: model.model_dump(mode="json"))
+        stdlib_ms = timed(lambda: JSONResponse(content))
+        fast_ms = timed(lambda: FastJSONResponse(content))
+        
+        print(
+            f"{name:<20}{size // 1024:>9}{jsonable_ms:>13.2f}{dump_ms:>10.2f}"
+            f"{stdlib_ms:>17.2f}{fast_ms:>13.2f}{stdlib_ms / fast_ms:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
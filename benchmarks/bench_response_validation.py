@@ -0,0 +1,72 @@
+"""
+Путь ответа для 10k строк: валидация данных апстрима и сериализация.
+  
+  before - модель на каждую строку (ForecastItem(...), Review(**item)), затем
+           повторная валидация и сериализация FastAPI по response_model
+           и кодирование FastJSONResponse;
+  after  - один вызов TypeAdapter(List[...]) на весь список и ModelResponse,
+           который FastAPI отдаёт без повторной проверки.
+    
+    python benchmarks/bench_response_validation.py
+"""
+import asyncio
+import time
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from payloads import make_forecast, make_hourly_sales, make_plan_vs_fact, make_reviews
+
+from app.core.responses import FastJSONResponse, ModelResponse
+from app.models.responses import (
+    ForecastItem, ForecastResponse, FORECAST_ITEMS,
+    HourlySalesItem, HourlySalesResponse, HOURLY_SALES_ITEMS,
+    PlanVsFactItem, PlanVsFactResponse, PLAN_VS_FACT_ITEMS,
+    Review, ReviewsResponse, REVIEWS
+)
+
+ROWS = 10_000
+ROUNDS = 10
+
+
+async def timed(func) -> float:
+    await func()
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await func()
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def scenario(data, item_model, response_model, adapter):
+    field = create_response_field(name=f"Response_{response_model.__name__}", type_=response_model, mode="serialization")
+    
+    async def before():
+        model = response_model(data=[item_model(**item) for item in data])
+        content = await serialize_response(field=field, response_content=model)
+        return FastJSONResponse(content)
+    
+    async def after():
+        return ModelResponse(response_model.model_construct(data=adapter.validate_python(data)))
+    
+    return before, after
+
+
+async def main():
+    scenarios = {
+        "forecast": scenario(make_forecast(ROWS), ForecastItem, ForecastResponse, FORECAST_ITEMS),
+        "hourly_sales": scenario(make_hourly_sales(ROWS // 24 + 1)[:ROWS], HourlySalesItem, HourlySalesResponse, HOURLY_SALES_ITEMS),
+        "plan_vs_fact": scenario(make_plan_vs_fact(ROWS), PlanVsFactItem, PlanVsFactResponse, PLAN_VS_FACT_ITEMS),
+        "reviews": scenario(make_reviews(ROWS), Review, ReviewsResponse, REVIEWS)
+    }
+    
+    print(f"{ROWS} rows per response")
+    print(f"{'endpoint':<14}{'before ms':>11}{'after ms':>10}{'speedup':>9}")
+    for name, (before, after) in scenarios.items():
+        assert (await before()).body == (await after()).body
+        before_ms = await timed(before)
+        after_ms = await timed(after)
+        print(f"{name:<14}{before_ms:>11.2f}{after_ms:>10.2f}{before_ms / after_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
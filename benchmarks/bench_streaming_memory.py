@@ -0,0 +1,121 @@
+"""
+Пиковая память при получении больших массивов от внешних API:
+буферизованный разбор (всё тело -> список словарей -> модели) против
+потокового (чанки -> пачки элементов -> модели).
+
+Каждый сценарий запускается в отдельном процессе, чтобы ru_maxrss
+не накапливался между замерами.
+    
+    python benchmarks/bench_streaming_memory.py
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+from datetime import date, timedelta
+
+import httpx
+
+from payloads import DEPARTMENT_ID, make_hourly_sales, make_reviews
+
+CHUNK_SIZE = 65536
+
+SCENARIOS = {
+    "reviews x1000": "reviews",
+    "hourly 365 days": "hourly"
+}
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    """Тело ответа, отдаваемое чанками, как из сети"""
+    
+    def __init__(self, body: bytes):
+        self.body = body
+    
+    async def __aiter__(self):
+        for start in range(0, len(self.body), CHUNK_SIZE):
+            yield self.body[start:start + CHUNK_SIZE]
+
+
+async def run_scenario(scenario: str, mode: str) -> dict:
+    from app.api.v1 import endpoints
+    from app.core.config import get_settings
+    from app.models.requests import HourlySalesRequest
+    from app.utils.cache import cache_manager
+    
+    settings = get_settings()
+    settings.upstream_chunk_min_days = 0
+    if mode == "stream":
+        settings.stream_hourly_min_days = 1
+        settings.stream_reviews_min_count = 1
+    else:
+        settings.stream_hourly_min_days = 10 ** 6
+        settings.stream_reviews_min_count = 10 ** 6
+    
+    if scenario == "reviews":
+        body = json.dumps(make_reviews(1000), ensure_ascii=False).encode()
+    else:
+        body = json.dumps(make_hourly_sales(365)).encode()
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=ChunkedStream(body), headers={"Content-Type": "application/json"})
+    
+    class MockedHTTPClient(endpoints.HTTPClient):
+        async def __aenter__(self):
+            self._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            return self
+    
+    endpoints.HTTPClient = MockedHTTPClient
+    cache_manager.clear()
+    
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    
+    if scenario == "reviews":
+        result = await endpoints.load_reviews(DEPARTMENT_ID, 1000)
+    else:
+        start = date(2025, 1, 1)
+        result = await endpoints.load_hourly_sales(HourlySalesRequest(
+            department_id=DEPARTMENT_ID,
+            date_start=start,
+            date_end=start + timedelta(days=364)
+        ))
+    
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    return {
+        "rows": len(result.data),
+        "body_kb": len(body) // 1024,
+        "peak_kb": peak // 1024,
+        "rss_delta_kb": rss - baseline_rss
+    }
+
+
+def main():
+    print(f"{'payload':<18}{'mode':<10}{'rows':>7}{'body KB':>9}{'py peak KB':>12}{'RSS +KB':>10}")
+    for name, scenario in SCENARIOS.items():
+        for mode in ("buffered", "stream"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--scenario", scenario, "--mode", mode],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{name:<18}{mode:<10}{result['rows']:>7}{result['body_kb']:>9}"
+                  f"{result['peak_kb']:>12}{result['rss_delta_kb']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=SCENARIOS.values())
+    parser.add_argument("--mode", choices=("buffered", "stream"))
+    args = parser.parse_args()
+    
+    if args.scenario:
+        print(json.dumps(asyncio.run(run_scenario(args.scenario, args.mode))))
+    else:
+        main()
@@ -0,0 +1,126 @@
+"""
+Время до первого байта и пиковая память ответа /hourly_sales в зависимости
+от длины периода: обычный JSON против потоковой выдачи NDJSON.
+
+Приложение вызывается напрямую через ASGI, апстрим отдаёт тело чанками
+через MockTransport, отправленные клиенту байты не накапливаются.
+    
+    python benchmarks/bench_streaming_output.py
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import httpx
+
+from payloads import DEPARTMENT_ID, make_hourly_sales
+
+from app.api.v1 import endpoints
+from app.core.config import get_settings
+from app.main import app
+from app.utils.cache import cache_manager
+
+CHUNK_SIZE = 65536
+PERIODS = (30, 90, 365, 730)
+START = date(2025, 1, 1)
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    """Тело ответа, отдаваемое чанками, как из сети"""
+    
+    def __init__(self, body: bytes):
+        self.body = body
+    
+    async def __aiter__(self):
+        for start in range(0, len(self.body), CHUNK_SIZE):
+            await asyncio.sleep(0)
+            yield self.body[start:start + CHUNK_SIZE]
+
+
+async def measure(body: bytes, days: int, accept: str) -> dict:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=ChunkedStream(body), headers={"Content-Type": "application/json"})
+    
+    class MockedHTTPClient(endpoints.HTTPClient):
+        async def __aenter__(self):
+            self._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            return self
+    
+    endpoints.HTTPClient = MockedHTTPClient
+    cache_manager.clear()
+    
+    request_body = json.dumps({
+        "department_id": DEPARTMENT_ID,
+        "date_start": START.isoformat(),
+        "date_end": (START + timedelta(days=days - 1)).isoformat()
+    }).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/v1/mcp/hourly_sales",
+        "raw_path": b"/api/v1/mcp/hourly_sales",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"accept", accept.encode())],
+        "client": ("127.0.0.1", 12345),
+        "server": ("test", 80)
+    }
+    state = {"body_sent": False, "first_byte": None, "bytes": 0}
+    done = asyncio.Event()
+    
+    async def receive():
+        if not state["body_sent"]:
+            state["body_sent"] = True
+            return {"type": "http.request", "body": request_body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        if message["type"] == "http.response.body":
+            if message.get("body") and state["first_byte"] is None:
+                state["first_byte"] = time.perf_counter()
+            state["bytes"] += len(message.get("body", b""))
+            if not message.get("more_body"):
+                done.set()
+    
+    tracemalloc.start()
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        "ttfb_ms": (state["first_byte"] - started) * 1000,
+        "total_ms": elapsed * 1000,
+        "peak_kb": peak // 1024,
+        "sent_kb": state["bytes"] // 1024
+    }
+
+
+async def main():
+    settings = get_settings()
+    settings.upstream_chunk_min_days = 0
+    settings.stream_hourly_min_days = 1
+    
+    # Прогрев: первые запросы платят за инициализацию маршрутов и кодировщиков
+    warm_up_body = json.dumps(make_hourly_sales(1, START)).encode()
+    for accept in ("application/json", "application/x-ndjson"):
+        await measure(warm_up_body, 1, accept)
+    
+    print(f"{'days':>5}  {'mode':<8}{'sent KB':>9}{'TTFB ms':>10}{'total ms':>10}{'py peak KB':>12}")
+    for days in PERIODS:
+        body = json.dumps(make_hourly_sales(days, START)).encode()
+        for mode, accept in (("json", "application/json"), ("ndjson", "application/x-ndjson")):
+            result = await measure(body, days, accept)
+            print(f"{days:>5}  {mode:<8}{result['sent_kb']:>9}{result['ttfb_ms']:>10.1f}"
+                  f"{result['total_ms']:>10.1f}{result['peak_kb']:>12}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
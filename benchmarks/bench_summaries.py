@@ -0,0 +1,44 @@
+"""
+Сводки для результатов инструментов MCP: размер сводки против строк
+и время её построения.
+    
+    python benchmarks/bench_summaries.py
+"""
+import time
+
+from payloads import make_hourly_sales, make_payroll, make_plan_vs_fact, make_reviews
+
+from app.models.responses import PayrollResponse, HOURLY_SALES_ITEMS, PLAN_VS_FACT_ITEMS, REVIEWS
+from app.services import summaries
+from app.utils import json_codec
+
+ROUNDS = 20
+
+
+def timed(func) -> float:
+    func()
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - started) / ROUNDS * 1000
+
+
+def main():
+    cases = {
+        "hourly_sales 90d": (summaries.hourly_sales, HOURLY_SALES_ITEMS.validate_python(make_hourly_sales(90))),
+        "hourly_sales 365d": (summaries.hourly_sales, HOURLY_SALES_ITEMS.validate_python(make_hourly_sales(365))),
+        "plan_vs_fact 365d": (summaries.plan_vs_fact, PLAN_VS_FACT_ITEMS.validate_python(make_plan_vs_fact(365))),
+        "reviews x1000": (summaries.reviews, REVIEWS.validate_python(make_reviews(1000))),
+        "payroll 60x90": (summaries.payroll, PayrollResponse.model_validate(make_payroll(60, 90)).data)
+    }
+    
+    print(f"{'result':<20}{'rows KB':>9}{'summary KB':>12}{'summary ms':>12}")
+    for name, (summarize, rows) in cases.items():
+        rows_size = len(json_codec.dumps([row.model_dump(mode="json") for row in rows]))
+        summary_size = len(json_codec.dumps(summarize(rows)))
+        ms = timed(lambda: summarize(rows))
+        print(f"{name:<20}{rows_size / 1024:>9.1f}{summary_size / 1024:>12.1f}{ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Синтетические ответы внешних API для бенчмарков
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+# Бенчмарки запускаются из корня репозитория как скрипты
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AQNIET_API_TOKEN", "benchmark-token")
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+
+
+def make_hourly_sales(days: int = 365, start: date = date(2025, 1, 1)) -> list:
+    """Ответ sales/hourly: 24 строки на каждый день периода"""
+    return [
+        {
+            "date": (start + timedelta(days=day)).isoformat(),
+            "hour": hour,
+            "sales_amount": round(1000.0 + day * 3.5 + hour * 125.25, 2)
+        }
+        for day in range(days)
+        for hour in range(24)
+    ]
+
+
+def make_forecast(days: int = 365, start: date = date(2025, 1, 1)) -> list:
+    """Ответ forecast/batch"""
+    return [
+        {
+            "date": (start + timedelta(days=day)).isoformat(),
+            "predicted_sales": 150000.0 + day * 250.5
+        }
+        for day in range(days)
+    ]
+
+
+def make_plan_vs_fact(days: int = 365, start: date = date(2025, 1, 1)) -> list:
+    """Ответ forecast/comparison"""
+    items = []
+    for day in range(days):
+        predicted = 150000.0 + day * 250.5
+        actual = predicted * (0.9 + (day % 20) / 100)
+        items.append({
+            "date": (start + timedelta(days=day)).isoformat(),
+            "predicted_sales": predicted,
+            "actual_sales": actual,
+            "error": actual - predicted,
+            "error_percentage": round((actual - predicted) / predicted * 100, 2)
+        })
+    return items
+
+
+def make_reviews(count: int = 1000) -> list:
+    """Ответ reviews.aqniet.site/api/v1/by-iiko/{id}/{count}"""
+    created = datetime(2025, 7, 1, 12, 0, 0)
+    return [
+        {
+            "review_id": f"review-{i}",
+            "branch_id": "70000001234567890",
+            "branch_name": "Ресторан Центральный",
+            "user_name": f"Гость {i}",
+            "rating": float(1 + i % 5),
+            "text": "Отличная кухня, быстрое обслуживание, обязательно придём ещё. " * (1 + i % 4),
+            "date_created": (created - timedelta(hours=i * 7)).isoformat(),
+            "date_edited": None if i % 3 else (created - timedelta(hours=i * 5)).isoformat(),
+            "is_verified": bool(i % 2),
+            "likes_count": i % 17,
+            "comments_count": i % 3,
+            "photos_count": i % 4,
+            "photos_urls": [f"https://photos.example/{i}/{n}.jpg" for n in range(i % 4)]
+        }
+        for i in range(count)
+    ]
+
+
+def make_payroll(employees: int = 60, days: int = 90, start: date = date(2025, 1, 1)) -> dict:
+    """Ответ admin/payroll/attendance"""
+    return {
+        "success": True,
+        "data": [
+            {
+                "employee_name": f"Сотрудник {e}",
+                "payroll_total": 2250.0 * (days // 2),
+                "shifts": [
+                    {
+                        "date": (start + timedelta(days=day)).isoformat(),
+                        "payroll_for_shift": 2250.0,
+                        "schedule_name": "2/2 дневная",
+                        "work_hours": 12.0
+                    }
+                    for day in range(e % 2, days, 2)
+                ]
+            }
+            for e in range(employees)
+        ]
+    }
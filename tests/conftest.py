@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.main import app
 from app.core.config import Settings
+from app.utils.cache import cache_manager
 
 
 @pytest.fixture(scope="session")
@@ -209,4 +210,24 @@ def disable_cache():
     with patch('app.utils.cache.cache_manager.cached') as mock_cached:
         # Возвращаем декоратор, который просто возвращает функцию без изменений
         mock_cached.return_value = lambda func: func
-        yield
\ No newline at end of file
+        yield
+
+@pytest.fixture
+def clear_cache():
+    """Пустой кэш загрузчиков до и после теста"""
+    cache_manager.clear()
+    yield
+    cache_manager.clear()
+
+
+@pytest.fixture
+def mock_upstream():
+    """
+    Мок HTTPClient эндпоинтов без заданных ответов: тест настраивает
+    методы клиента сам, например mock_upstream.get_aqniet.return_value = [...]
+    """
+    with patch('app.api.v1.endpoints.HTTPClient') as mock_http_client:
+        mock_client = AsyncMock()
+        mock_http_client.return_value.__aenter__.return_value = mock_client
+        mock_http_client.return_value.__aexit__.return_value = None
+        yield mock_client
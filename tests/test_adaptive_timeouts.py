@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+import httpx
+
+from app.core.exceptions import ExternalAPIError
+from app.services.http_client import HTTPClient, upstream_timeouts, validator_cache
+from app.utils.latency import AdaptiveTimeouts, LatencyWindow, endpoint_key
+
+
+def test_endpoint_key_normalizes_ids():
+    assert endpoint_key("admin/departments/4cb558ca-a8bc-4b81-871e-043f65218c50") == "admin/departments/{id}"
+    assert endpoint_key("v1/by-iiko/4cb558ca-a8bc-4b81-871e-043f65218c50/1000") == "v1/by-iiko/{id}/{id}"
+    assert endpoint_key("/forecast/comparison") == "forecast/comparison"
+
+
+def test_latency_window_quantile():
+    window = LatencyWindow(size=100)
+    for ms in range(1, 101):
+        window.add(ms / 1000)
+    assert window.quantile(0.5) == 0.05
+    assert window.quantile(0.99) == 0.099
+    assert window.quantile(0.999) == 0.1
+
+
+def test_timeout_derived_from_history_and_clamped():
+    """Быстрый эндпоинт получает короткий таймаут, но не меньше минимума"""
+    timeouts = AdaptiveTimeouts(default_timeout=30.0, factor=3.0, min_timeout=0.5, min_samples=10)
+    assert timeouts.timeout_for("admin/departments/{id}") == 30.0
+
+    for _ in range(10):
+        timeouts.record("admin/departments/{id}", 0.04)
+    assert timeouts.timeout_for("admin/departments/{id}") == 0.5
+
+    for _ in range(10):
+        timeouts.record("admin/departments/{id}", 0.4)
+    assert timeouts.timeout_for("admin/departments/{id}") == pytest.approx(1.2)
+
+
+def test_timeout_may_exceed_default_up_to_max():
+    """Медленный эндпоинт может получить таймаут больше api_timeout, но не больше максимума"""
+    timeouts = AdaptiveTimeouts(default_timeout=30.0, factor=3.0, max_timeout=60.0, min_samples=5)
+    for _ in range(5):
+        timeouts.record("forecast/comparison", 15.0)
+    assert timeouts.timeout_for("forecast/comparison") == 45.0
+
+    for _ in range(5):
+        timeouts.record("forecast/comparison", 40.0)
+    assert timeouts.timeout_for("forecast/comparison") == 60.0
+
+
+def test_static_override_wins():
+    timeouts = AdaptiveTimeouts(default_timeout=30.0, min_samples=1, overrides={"forecast/comparison": 90.0})
+    timeouts.record("forecast/comparison", 0.1)
+    assert timeouts.timeout_for("forecast/comparison") == 90.0
+
+
+def test_disabled_uses_default():
+    timeouts = AdaptiveTimeouts(default_timeout=30.0, min_samples=1, enabled=False)
+    timeouts.record("sales/hourly", 0.1)
+    assert timeouts.timeout_for("sales/hourly") == 30.0
+
+
+@pytest.mark.asyncio
+async def test_http_client_applies_and_records_timeouts(monkeypatch):
+    """HTTPClient передаёт в запрос таймаут эндпоинта и пополняет историю"""
+    seen_timeouts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_timeouts.append(request.extensions["timeout"]["read"])
+        return httpx.Response(200, json={"object_name": "Ресторан"})
+
+    upstream_timeouts.reset()
+    validator_cache.clear()
+    monkeypatch.setitem(upstream_timeouts.overrides, "admin/departments/{id}", 1.5)
+
+    client = HTTPClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    await client.get_madlen("admin/departments/4cb558ca-a8bc-4b81-871e-043f65218c50")
+    await client._client.aclose()
+
+    assert seen_timeouts == [1.5]
+    assert upstream_timeouts.stats()["admin/departments/{id}"]["samples"] == 1
+    upstream_timeouts.reset()
+
+
+@pytest.mark.asyncio
+async def test_timeout_is_recorded_as_latency():
+    """Таймаут попадает в историю как задержка, равная таймауту"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ReadTimeout("timeout", request=request)
+
+    upstream_timeouts.reset()
+    client = HTTPClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with pytest.raises(ExternalAPIError):
+        await client.get_aqniet("forecast/comparison")
+    await client._client.aclose()
+
+    stats = upstream_timeouts.stats()["forecast/comparison"]
+    assert stats["p50"] == upstream_timeouts.timeout_for("forecast/comparison")
+    upstream_timeouts.reset()
+
+
+@pytest.mark.asyncio
+async def test_slow_stream_consumer_not_recorded_as_latency():
+    """Время обработки пачек потребителем не попадает в задержку эндпоинта"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=[{"hour": hour} for hour in range(24)])
+
+    upstream_timeouts.reset()
+    client = HTTPClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    async for _ in client.stream_aqniet("sales/hourly"):
+        await asyncio.sleep(0.2)
+    await client._client.aclose()
+
+    assert upstream_timeouts.stats()["sales/hourly"]["p50"] < 0.1
+    upstream_timeouts.reset()
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from httpx import AsyncClient
+
+from app.main import app
+from app.core.config import get_settings
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_IDS = [
+    "4cb558ca-a8bc-4b81-871e-043f65218c50",
+    "5cb558ca-a8bc-4b81-871e-043f65218c51",
+    "6cb558ca-a8bc-4b81-871e-043f65218c52"
+]
+FAILING_ID = DEPARTMENT_IDS[1]
+PERIOD = {"date_start": "2025-07-01", "date_end": "2025-07-01"}
+
+
+@pytest.mark.asyncio
+async def test_batch_returns_partial_results(mock_upstream):
+    """Ошибка одного подразделения не прерывает пакет"""
+    async def get_aqniet(endpoint, params=None):
+        if params["department_id"] == FAILING_ID:
+            raise Exception("Upstream unavailable")
+        return [{"date": "2025-07-01", "predicted_sales": 150000.0}]
+    
+    mock_upstream.get_aqniet.side_effect = get_aqniet
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/forecast/batch",
+            json={"department_ids": DEPARTMENT_IDS, **PERIOD}
+        )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["succeeded"] == 2
+    assert data["failed"] == 1
+    assert [item["department_id"] for item in data["results"]] == DEPARTMENT_IDS
+    
+    failed = data["results"][1]
+    assert failed["data"] is None
+    assert failed["error"]["type"] == "external_api_error"
+    assert data["results"][0]["data"] == [{"date": "2025-07-01", "predicted_sales": 150000.0}]
+    assert data["results"][0]["error"] is None
+
+
+@pytest.mark.asyncio
+async def test_batch_bounded_concurrency(monkeypatch, mock_upstream):
+    """Одновременно загружается не больше batch_max_concurrency подразделений"""
+    monkeypatch.setattr(get_settings(), "batch_max_concurrency", 2)
+    state = {"active": 0, "peak": 0}
+    
+    async def get_aqniet(endpoint, params=None):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return [{"date": "2025-07-01", "hour": 10, "sales_amount": 5000.0}]
+    
+    department_ids = [f"{i:08d}-a8bc-4b81-871e-043f65218c50" for i in range(6)]
+    mock_upstream.get_aqniet.side_effect = get_aqniet
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/hourly_sales/batch",
+            json={"department_ids": department_ids, **PERIOD}
+        )
+    
+    assert response.status_code == 200
+    assert response.json()["succeeded"] == 6
+    assert state["peak"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_shares_cache_with_single_endpoint(mock_upstream):
+    """Подразделение, уже загруженное одиночным запросом, берётся из кэша"""
+    async def get_aqniet(endpoint, params=None):
+        return [{
+            "date": "2025-07-01",
+            "predicted_sales": 150000.0,
+            "actual_sales": 145000.0,
+            "error": -5000.0,
+            "error_percentage": -3.33
+        }]
+    
+    mock_upstream.get_aqniet.side_effect = get_aqniet
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post(
+            "/api/v1/mcp/plan_vs_fact",
+            json={"department_id": DEPARTMENT_IDS[0], **PERIOD}
+        )
+        response = await client.post(
+            "/api/v1/mcp/plan_vs_fact/batch",
+            json={"department_ids": DEPARTMENT_IDS[:2] + [DEPARTMENT_IDS[0]], **PERIOD}
+        )
+    
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 2
+    assert mock_upstream.get_aqniet.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_too_many_departments(monkeypatch):
+    monkeypatch.setattr(get_settings(), "batch_max_departments", 2)
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/forecast/batch",
+            json={"department_ids": DEPARTMENT_IDS, **PERIOD}
+        )
+    
+    assert response.status_code == 400
+    assert response.json()["error"]["details"]["field"] == "department_ids"
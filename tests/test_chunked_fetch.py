@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+from datetime import date
+from httpx import AsyncClient
+
+from app.main import app
+from app.core.config import get_settings
+from app.core.exceptions import ExternalAPIError
+from app.utils.periods import split_period
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(get_settings(), "upstream_chunk_retry_delay", 0)
+
+
+def test_split_period_by_month():
+    assert split_period(date(2025, 1, 15), date(2025, 3, 10)) == [
+        (date(2025, 1, 15), date(2025, 1, 31)),
+        (date(2025, 2, 1), date(2025, 2, 28)),
+        (date(2025, 3, 1), date(2025, 3, 10))
+    ]
+
+
+def test_split_period_by_days():
+    assert split_period(date(2025, 1, 1), date(2025, 1, 25), chunk_days=10) == [
+        (date(2025, 1, 1), date(2025, 1, 10)),
+        (date(2025, 1, 11), date(2025, 1, 20)),
+        (date(2025, 1, 21), date(2025, 1, 25))
+    ]
+    assert split_period(date(2025, 1, 1), date(2025, 1, 1)) == [(date(2025, 1, 1), date(2025, 1, 1))]
+
+
+def hourly_rows(params):
+    """По одной строке на первый и последний день части"""
+    return [
+        {"date": params["from_date"], "hour": 0, "sales_amount": 1.0},
+        {"date": params["to_date"], "hour": 23, "sales_amount": 2.0}
+    ]
+
+
+async def post_hourly(date_start: str, date_end: str):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        return await client.post(
+            "/api/v1/mcp/hourly_sales",
+            json={"department_id": DEPARTMENT_ID, "date_start": date_start, "date_end": date_end}
+        )
+
+
+@pytest.mark.asyncio
+async def test_long_period_fetched_by_month_in_order(monkeypatch, mock_upstream):
+    """Части загружаются параллельно с ограничением и склеиваются в порядке дат"""
+    monkeypatch.setattr(get_settings(), "upstream_chunk_concurrency", 3)
+    state = {"active": 0, "peak": 0}
+    
+    async def get_aqniet(endpoint, params=None):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        # Ранние месяцы отвечают дольше поздних
+        await asyncio.sleep(0.02 - date.fromisoformat(params["from_date"]).month * 0.001)
+        state["active"] -= 1
+        return hourly_rows(params)
+    
+    mock_upstream.get_aqniet.side_effect = get_aqniet
+    response = await post_hourly("2025-01-01", "2025-12-31")
+    
+    assert response.status_code == 200
+    dates = [item["date"] for item in response.json()["data"]]
+    assert dates == sorted(dates)
+    assert len(dates) == 24
+    assert mock_upstream.get_aqniet.call_count == 12
+    assert state["peak"] == 3
+
+
+@pytest.mark.asyncio
+async def test_chunks_cached_across_periods(mock_upstream):
+    """Полные месяцы, общие для разных периодов, повторно не загружаются"""
+    async def get_aqniet(endpoint, params=None):
+        return hourly_rows(params)
+    
+    mock_upstream.get_aqniet.side_effect = get_aqniet
+    await post_hourly("2025-01-01", "2025-06-30")
+    response = await post_hourly("2025-03-01", "2025-08-31")
+    
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 12
+    # Второй период догружает только июль и август
+    assert mock_upstream.get_aqniet.call_count == 8
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_retried_independently(mock_upstream):
+    attempts = {}
+    
+    async def get_aqniet(endpoint, params=None):
+        attempts[params["from_date"]] = attempts.get(params["from_date"], 0) + 1
+        if params["from_date"] == "2025-02-01" and attempts[params["from_date"]] == 1:
+            raise ExternalAPIError(message="Service Unavailable", endpoint=endpoint, status_code=503)
+        return hourly_rows(params)
+    
+    mock_upstream.get_aqniet.side_effect = get_aqniet
+    response = await post_hourly("2025-01-01", "2025-04-30")
+    
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 8
+    assert attempts == {"2025-01-01": 1, "2025-02-01": 2, "2025-03-01": 1, "2025-04-01": 1}
+
+
+@pytest.mark.asyncio
+async def test_client_error_not_retried(mock_upstream):
+    attempts = []
+    
+    async def get_aqniet(endpoint, params=None):
+        attempts.append(params["from_date"])
+        if params["from_date"] == "2025-02-01":
+            raise ExternalAPIError(message="Not Found", endpoint=endpoint, status_code=404)
+        return hourly_rows(params)
+    
+    mock_upstream.get_aqniet.side_effect = get_aqniet
+    response = await post_hourly("2025-01-01", "2025-04-30")
+    
+    assert response.status_code == 502
+    assert attempts.count("2025-02-01") == 1
@@ -0,0 +1,108 @@
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+
+from app.main import app
+from app.utils.columnar import column_arrays
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+PERIOD = {"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-02"}
+HOURLY = [
+    {"date": "2025-07-01", "hour": 10, "sales_amount": 5000.0},
+    {"date": "2025-07-01", "hour": 11, "sales_amount": 7500.5},
+    {"date": "2025-07-02", "hour": 10, "sales_amount": 6000.0}
+]
+PLAN_VS_FACT = [{
+    "date": "2025-07-02",
+    "predicted_sales": 150000.0,
+    "actual_sales": 145000.0,
+    "error": -5000.0,
+    "error_percentage": -3.33
+}]
+
+
+@pytest.mark.asyncio
+async def test_hourly_sales_columnar(mock_upstream):
+    mock_upstream.get_aqniet.return_value = HOURLY
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/mcp/hourly_sales?format=columnar", json=PERIOD)
+    
+    assert response.status_code == 200
+    assert response.json() == {
+        "format": "columnar",
+        "start_date": "2025-07-01",
+        "rows": 3,
+        "columns": {
+            "day": [0, 0, 1],
+            "hour": [10, 11, 10],
+            "sales_amount": [5000.0, 7500.5, 6000.0]
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_columnar_with_fields_and_filters(mock_upstream):
+    mock_upstream.get_aqniet.return_value = HOURLY
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/hourly_sales?format=columnar&hours=10&fields=date,sales_amount",
+            json=PERIOD
+        )
+    
+    assert response.json()["columns"] == {"day": [0, 1], "sales_amount": [5000.0, 6000.0]}
+
+
+@pytest.mark.asyncio
+async def test_columns_built_once_per_cache_entry(mock_upstream):
+    with patch('app.api.v1.endpoints.column_arrays', wraps=column_arrays) as mock_column_arrays:
+        mock_upstream.get_aqniet.return_value = HOURLY
+        
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            full = await client.post("/api/v1/mcp/hourly_sales?format=columnar", json=PERIOD)
+            projected = await client.post("/api/v1/mcp/hourly_sales?format=columnar&fields=hour", json=PERIOD)
+    
+    assert full.json()["columns"]["hour"] == [10, 11, 10]
+    assert projected.json()["columns"] == {"hour": [10, 11, 10]}
+    assert mock_column_arrays.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_plan_vs_fact_columnar_offsets_from_period_start(mock_upstream):
+    mock_upstream.get_aqniet.return_value = PLAN_VS_FACT
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/mcp/plan_vs_fact?format=columnar", json=PERIOD)
+    
+    columns = response.json()["columns"]
+    assert columns["day"] == [1]
+    assert columns["error_percentage"] == [-3.33]
+    assert list(columns) == ["day", "predicted_sales", "actual_sales", "error", "error_percentage"]
+
+
+@pytest.mark.asyncio
+async def test_unknown_format_rejected():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/mcp/forecast?format=xml", json=PERIOD)
+    
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_explicit_json_format_overrides_accept(mock_upstream):
+    mock_upstream.get_aqniet.return_value = HOURLY
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/hourly_sales?format=json",
+            json=PERIOD,
+            headers={"Accept": "application/x-ndjson"}
+        )
+    
+    assert response.headers["content-type"] == "application/json"
+    assert len(response.json()["data"]) == 3
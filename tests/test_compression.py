@@ -0,0 +1,131 @@
+import gzip
+import zlib
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+
+from app.main import app
+from app.core import compression
+from app.utils import metrics
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+PERIOD = {"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-02"}
+HOURLY_SALES = [
+    {"date": f"2025-07-0{day}", "hour": hour, "sales_amount": 1000.0 + hour}
+    for day in (1, 2)
+    for hour in range(24)
+]
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "BROTLI_AVAILABLE", False)
+    assert compression.choose_encoding("gzip, deflate, br") == "gzip"
+    assert compression.choose_encoding("gzip;q=0, deflate") is None
+    assert compression.choose_encoding("*") == "gzip"
+    assert compression.choose_encoding("identity") is None
+    assert compression.choose_encoding(None) is None
+
+
+def test_stream_compressor_flushes_every_chunk():
+    """Каждая сжатая часть декодируется сразу, без ожидания конца потока"""
+    compressor = compression.StreamCompressor("gzip", 6)
+    decoder = zlib.decompressobj(31)
+    assert decoder.decompress(compressor.compress(b'{"a":1}\n')) == b'{"a":1}\n'
+    assert decoder.decompress(compressor.finish(b'{"a":2}\n')) == b'{"a":2}\n'
+
+
+@pytest.mark.asyncio
+async def test_large_response_is_compressed(mock_upstream):
+    mock_upstream.get_aqniet.return_value = HOURLY_SALES
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/mcp/hourly_sales", json=PERIOD, headers=GZIP)
+    
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert len(response.json()["data"]) == 48
+
+
+@pytest.mark.asyncio
+async def test_small_and_identity_responses_are_not_compressed(mock_upstream):
+    mock_upstream.get_aqniet.return_value = HOURLY_SALES
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        small = await client.get("/health", headers=GZIP)
+        identity = await client.post(
+            "/api/v1/mcp/hourly_sales", json=PERIOD, headers={"Accept-Encoding": "identity"}
+        )
+    
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in identity.headers
+    assert "Accept-Encoding" in identity.headers["vary"]
+    assert len(identity.json()["data"]) == 48
+
+
+@pytest.mark.asyncio
+async def test_cached_response_is_compressed_once(mock_upstream):
+    """Тело ответа с ETag сжимается один раз, повторные ответы берут готовые байты"""
+    mock_upstream.get_aqniet.return_value = HOURLY_SALES
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.post("/api/v1/mcp/hourly_sales", json=PERIOD, headers=GZIP)
+        with patch('app.core.compression.compress', side_effect=AssertionError("compressed again")):
+            second = await client.post("/api/v1/mcp/hourly_sales", json=PERIOD, headers=GZIP)
+    
+    assert second.content == first.content
+    assert second.headers["content-encoding"] == "gzip"
+    assert metrics.snapshot()["compression.cache_misses"] == 1
+    assert metrics.snapshot()["compression.cache_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_etag_depends_on_encoding(mock_upstream):
+    mock_upstream.get_aqniet.return_value = HOURLY_SALES
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        compressed = await client.post("/api/v1/mcp/hourly_sales", json=PERIOD, headers=GZIP)
+        plain = await client.post(
+            "/api/v1/mcp/hourly_sales", json=PERIOD, headers={"Accept-Encoding": "identity"}
+        )
+        not_modified = await client.post(
+            "/api/v1/mcp/hourly_sales",
+            json=PERIOD,
+            headers={**GZIP, "If-None-Match": compressed.headers["etag"]}
+        )
+    
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    assert not_modified.status_code == 304
+    assert "content-encoding" not in not_modified.headers
+    assert not_modified.headers["vary"] == compressed.headers["vary"] == "Accept, Accept-Encoding"
+
+
+@pytest.mark.asyncio
+async def test_ndjson_stream_is_compressed(mock_upstream):
+    async def batches(*args, **kwargs):
+        yield HOURLY_SALES[:24]
+        yield HOURLY_SALES[24:]
+    
+    mock_upstream.stream_aqniet = batches
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        async with client.stream(
+            "POST", "/api/v1/mcp/hourly_sales?format=ndjson", json=PERIOD, headers=GZIP
+        ) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+    
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = gzip.decompress(raw).splitlines()
+    assert len(lines) == 48
@@ -0,0 +1,97 @@
+import pytest
+import httpx
+
+from app.services.http_client import HTTPClient, validator_cache
+
+
+def make_client(handler) -> HTTPClient:
+    """HTTPClient поверх MockTransport вместо реальной сети"""
+    client = HTTPClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+@pytest.fixture(autouse=True)
+def clear_validators():
+    validator_cache.clear()
+    yield
+    validator_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_revalidation_with_etag_returns_cached_body():
+    """На 304 возвращается сохранённое тело, повторно тело не скачивается"""
+    seen_headers = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_headers.append(dict(request.headers))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json={"object_name": "Ресторан"}, headers={"ETag": '"v1"'})
+
+    client = make_client(handler)
+    first = await client.get_madlen("admin/departments/1")
+    second = await client.get_madlen("admin/departments/1")
+    await client._client.aclose()
+
+    assert first == {"object_name": "Ресторан"}
+    assert second is first
+    assert "if-none-match" not in seen_headers[0]
+    assert seen_headers[1]["if-none-match"] == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_revalidation_with_last_modified():
+    """Last-Modified отправляется обратно как If-Modified-Since"""
+    last_modified = "Wed, 01 Jul 2025 10:00:00 GMT"
+    seen_headers = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_headers.append(dict(request.headers))
+        if request.headers.get("if-modified-since") == last_modified:
+            return httpx.Response(304)
+        return httpx.Response(
+            200,
+            json=[{"date": "2025-07-01", "hour": 10, "sales_amount": 5000.0}],
+            headers={"Last-Modified": last_modified}
+        )
+
+    client = make_client(handler)
+    params = {"department_id": "1", "from_date": "2025-07-01", "to_date": "2025-07-01"}
+    first = await client.get_aqniet("sales/hourly", params=params)
+    second = await client.get_aqniet("sales/hourly", params=params)
+    await client._client.aclose()
+
+    assert second == first
+    assert seen_headers[1]["if-modified-since"] == last_modified
+
+
+@pytest.mark.asyncio
+async def test_no_validators_means_no_conditional_request():
+    """Без ETag / Last-Modified ответ не сохраняется"""
+    seen_headers = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_headers.append(dict(request.headers))
+        return httpx.Response(200, json={"object_name": "Ресторан"})
+
+    client = make_client(handler)
+    await client.get_madlen("admin/departments/1")
+    await client.get_madlen("admin/departments/1")
+    await client._client.aclose()
+
+    assert "if-none-match" not in seen_headers[1]
+    assert "if-modified-since" not in seen_headers[1]
+
+
+@pytest.mark.asyncio
+async def test_revalidation_depends_on_params():
+    """Валидаторы хранятся отдельно для разных параметров запроса"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert "if-none-match" not in request.headers
+        return httpx.Response(200, json=[], headers={"ETag": '"v1"'})
+
+    client = make_client(handler)
+    await client.get_aqniet("sales/hourly", params={"department_id": "1"})
+    await client.get_aqniet("sales/hourly", params={"department_id": "2"})
+    await client._client.aclose()
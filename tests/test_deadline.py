@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+import httpx
+from httpx import AsyncClient
+from unittest.mock import patch, AsyncMock
+
+from app.main import app
+from app.core.config import get_settings
+from app.core.exceptions import DeadlineExceededError
+from app.services.http_client import HTTPClient, upstream_timeouts
+from app.utils import deadline
+from app.utils.cache import CacheManager, cache_manager
+
+
+FORECAST_BODY = {
+    "department_id": "4cb558ca-a8bc-4b81-871e-043f65218c50",
+    "date_start": "2025-07-01",
+    "date_end": "2025-07-31"
+}
+
+
+@pytest.fixture
+def slow_upstream():
+    """Апстрим, отвечающий дольше бюджета клиента"""
+    state = {"cancelled": False}
+
+    async def slow_get_aqniet(endpoint, params=None):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+        return []
+
+    with patch('app.api.v1.endpoints.HTTPClient') as mock_http_client:
+        mock_client = AsyncMock()
+        mock_client.get_aqniet = slow_get_aqniet
+        mock_http_client.return_value.__aenter__.return_value = mock_client
+        mock_http_client.return_value.__aexit__.return_value = None
+        cache_manager.clear()
+        yield state
+        cache_manager.clear()
+
+
+@pytest.mark.asyncio
+async def test_header_deadline_cancels_upstream_work(slow_upstream):
+    """По истечении X-Request-Timeout запрос к апстриму отменяется, клиент получает 504"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/forecast", json=FORECAST_BODY, headers={"X-Request-Timeout": "0.05"}
+        )
+
+    assert response.status_code == 504
+    assert response.json()["error"]["type"] == "deadline_exceeded"
+    assert slow_upstream["cancelled"]
+
+
+@pytest.mark.asyncio
+async def test_query_parameter_deadline(slow_upstream):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/mcp/forecast?request_timeout=0.05", json=FORECAST_BODY)
+
+    assert response.status_code == 504
+
+
+@pytest.mark.asyncio
+async def test_route_default_deadline(slow_upstream, monkeypatch):
+    monkeypatch.setattr(get_settings(), "request_timeout_routes", {"/api/v1/mcp/forecast": 0.05})
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/mcp/forecast", json=FORECAST_BODY)
+
+    assert response.status_code == 504
+
+
+@pytest.mark.asyncio
+async def test_upstream_gets_only_remaining_budget():
+    """Таймаут запроса к апстриму не превышает оставшийся бюджет"""
+    seen_timeouts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_timeouts.append(request.extensions["timeout"]["read"])
+        return httpx.Response(200, json=[])
+
+    upstream_timeouts.reset()
+    client = HTTPClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    token = deadline.set_deadline(0.5)
+    try:
+        await client.get_aqniet("forecast/batch")
+    finally:
+        deadline.reset_deadline(token)
+        await client._client.aclose()
+
+    assert 0 < seen_timeouts[0] <= 0.5
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_skips_upstream_call():
+    """С исчерпанным бюджетом запрос к апстриму не отправляется"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise AssertionError("upstream must not be called")
+
+    client = HTTPClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    token = deadline.set_deadline(0.001)
+    await asyncio.sleep(0.01)
+    try:
+        with pytest.raises(DeadlineExceededError):
+            await client.get_aqniet("forecast/batch")
+    finally:
+        deadline.reset_deadline(token)
+        await client._client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cache_layer_checks_deadline():
+    """Промах кэша с исчерпанным бюджетом не запускает загрузку"""
+    manager = CacheManager()
+    calls = []
+
+    @manager.cached()
+    async def load(value):
+        calls.append(value)
+        return value
+
+    token = deadline.set_deadline(0.001)
+    await asyncio.sleep(0.01)
+    try:
+        with pytest.raises(DeadlineExceededError):
+            await load(1)
+    finally:
+        deadline.reset_deadline(token)
+
+    assert calls == []
+    assert await load(1) == 1
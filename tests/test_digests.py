@@ -0,0 +1,209 @@
+import asyncio
+import sqlite3
+import pytest
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock
+from httpx import AsyncClient
+
+from app.main import app
+from app.services.digests import digest_store, refresh_digests, seconds_until
+from app.utils.cache import cache_manager
+from app.utils import metrics
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+DAY = date(2025, 7, 14)
+
+
+def plan_vs_fact(params):
+    start = date.fromisoformat(params["from_date"])
+    days = (date.fromisoformat(params["to_date"]) - start).days + 1
+    # Первая неделя - 100 000 в день, вторая - 110 000 при прогнозе 100 000
+    return [
+        {
+            "date": (start + timedelta(days=day)).isoformat(),
+            "predicted_sales": 100000.0,
+            "actual_sales": 100000.0 if day < 7 else 110000.0,
+            "error": 0.0 if day < 7 else 10000.0,
+            "error_percentage": 0.0 if day < 7 else 10.0
+        }
+        for day in range(days)
+    ]
+
+
+def hourly_sales(params):
+    start = date.fromisoformat(params["from_date"])
+    return [
+        {"date": (start + timedelta(days=day)).isoformat(), "hour": hour, "sales_amount": 1000.0 if hour in (13, 19, 20) else 100.0 + hour}
+        for day in range(28)
+        for hour in range(10, 23)
+    ]
+
+
+async def get_aqniet(endpoint, params=None):
+    return plan_vs_fact(params) if endpoint == "forecast/comparison" else hourly_sales(params)
+
+
+PAYROLL = {
+    "success": True,
+    "data": [{
+        "employee_name": "Иванов",
+        "payroll_total": 77000.0,
+        "shifts": [
+            {"date": (DAY - timedelta(days=day)).isoformat(), "payroll_for_shift": 11000.0, "schedule_name": "День", "work_hours": 12.0}
+            for day in range(7)
+        ]
+    }]
+}
+
+
+def review(i: int, rating: float, created: date) -> dict:
+    return {
+        "review_id": str(i), "branch_id": "1", "branch_name": "Ресторан", "user_name": "Гость",
+        "rating": rating, "text": "Отзыв", "date_created": datetime.combine(created, datetime.min.time()).isoformat(),
+        "is_verified": True, "likes_count": 0, "comments_count": 0, "photos_count": 0, "photos_urls": []
+    }
+
+
+REVIEWS = [review(1, 5, DAY), review(2, 4, DAY - timedelta(days=3)), review(3, 3, DAY - timedelta(days=40))]
+
+
+async def stream_reviews(endpoint):
+    # Выборка дайджеста достаточно большая, чтобы отзывы читались потоком
+    yield REVIEWS
+
+
+@pytest.fixture(autouse=True)
+def isolated_store(tmp_path, monkeypatch):
+    cache_manager.clear()
+    metrics.reset()
+    digest_store.close()
+    monkeypatch.setattr(digest_store, "path", str(tmp_path / "digests.sqlite3"))
+    yield
+    digest_store.close()
+    cache_manager.clear()
+
+
+@pytest.fixture
+def upstream(mock_upstream):
+    mock_upstream.get_aqniet.side_effect = get_aqniet
+    mock_upstream.get_madlen.return_value = PAYROLL
+    mock_upstream.stream_reviews = stream_reviews
+    return mock_upstream
+
+
+@pytest.mark.asyncio
+async def test_digest_is_computed_stored_and_served(upstream):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        computed = await client.post(f"/api/v1/mcp/digest/{DEPARTMENT_ID}?day={DAY}")
+        calls = upstream.get_aqniet.call_count + upstream.get_madlen.call_count
+        served = await client.get(f"/api/v1/mcp/digest/{DEPARTMENT_ID}")
+        tool = await client.post("/api/v1/mcp/rpc", json={
+            "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+            "params": {"name": "get_department_digest", "arguments": {"department_id": DEPARTMENT_ID}}
+        })
+    
+    # Готовый дайджест отдаётся без обращений к внешним API
+    assert upstream.get_aqniet.call_count + upstream.get_madlen.call_count == calls
+    
+    digest = computed.json()
+    assert digest["errors"] == {}
+    assert digest["last_week"]["date_start"] == "2025-07-08"
+    assert digest["last_week"]["actual_sales"] == 770000.0
+    assert digest["last_week"]["error_percentage"] == 10.0
+    assert digest["last_week"]["week_over_week"] == 10.0
+    assert digest["peak_hours"]["top_hours"] == [13, 19, 20]
+    assert digest["payroll"]["payroll_share"] == 10.0
+    assert digest["reviews"]["recent_count"] == 2
+    assert digest["reviews"]["rating_trend"] == 1.5
+    
+    assert served.status_code == 200
+    assert served.json() == digest
+    assert tool.json()["result"]["isError"] is False
+
+
+@pytest.mark.asyncio
+async def test_digest_part_errors(upstream):
+    upstream.stream_reviews = AsyncMock(side_effect=Exception("Reviews API недоступен"))
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(f"/api/v1/mcp/digest/{DEPARTMENT_ID}?day={DAY}")
+    
+    digest = response.json()
+    assert digest["reviews"] is None
+    assert digest["errors"]["reviews"]["type"] == "external_api_error"
+    assert digest["last_week"] is not None
+
+
+@pytest.mark.asyncio
+async def test_missing_digest():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(f"/api/v1/mcp/digest/{DEPARTMENT_ID}")
+    
+    assert response.status_code == 404
+    assert response.json()["error"]["type"] == "digest_not_found"
+
+
+@pytest.mark.asyncio
+async def test_refresh_skips_computed_and_survives_failures():
+    built = []
+    
+    async def build(department_id: str, day: date) -> bytes:
+        built.append(department_id)
+        if department_id == "broken":
+            raise RuntimeError("upstream")
+        return b'{"department_id": "%s"}' % department_id.encode()
+    
+    digest_store.put("done", DAY, b"{}")
+    await refresh_digests(["done", "new", "broken"], build, DAY, concurrency=2)
+    
+    assert sorted(built) == ["broken", "new"]
+    assert digest_store.get("new") == b'{"department_id": "new"}'
+    assert digest_store.digest_date("new") == DAY
+    assert metrics.snapshot()["digests.failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_compute_each_digest_once():
+    built = []
+    
+    async def build(department_id: str, day: date) -> bytes:
+        built.append(department_id)
+        await asyncio.sleep(0.01)
+        return b"{}"
+    
+    # Два воркера запускают ночной пересчёт одновременно
+    await asyncio.gather(
+        refresh_digests(["a", "b"], build, DAY, concurrency=2),
+        refresh_digests(["a", "b"], build, DAY, concurrency=2)
+    )
+    
+    assert sorted(built) == ["a", "b"]
+    assert digest_store.digest_date("a") == DAY
+
+
+@pytest.mark.asyncio
+async def test_claim_error_does_not_stop_refresh(monkeypatch):
+    built = []
+    real_claim = digest_store.claim
+    
+    def claim(department_id, day, timeout):
+        if department_id == "locked":
+            raise sqlite3.OperationalError("database is locked")
+        return real_claim(department_id, day, timeout)
+    
+    async def build(department_id: str, day: date) -> bytes:
+        built.append(department_id)
+        return b"{}"
+    
+    monkeypatch.setattr(digest_store, "claim", claim)
+    await refresh_digests(["locked", "free"], build, DAY, concurrency=2)
+    
+    assert built == ["free"]
+    assert digest_store.digest_date("free") == DAY
+    assert metrics.snapshot()["digests.failed"] == 1
+
+
+def test_seconds_until():
+    assert seconds_until(3, datetime(2025, 7, 14, 2, 30)) == 1800
+    assert seconds_until(3, datetime(2025, 7, 14, 3, 0)) == 86400
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from app.main import app
+from app.utils import metrics
+from app.utils.cache import CacheManager, cache_manager
+
+
+FORECAST_BODY = {
+    "department_id": "4cb558ca-a8bc-4b81-871e-043f65218c50",
+    "date_start": "2025-07-01",
+    "date_end": "2025-07-31"
+}
+
+
+def http_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"test")],
+        "client": ("127.0.0.1", 12345),
+        "server": ("test", 80)
+    }
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    metrics.reset()
+    cache_manager.clear()
+    yield
+    cache_manager.clear()
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_upstream_call():
+    """Отключение клиента отменяет ожидание апстрима, кэш не заполняется"""
+    state = {"started": False, "cancelled": False}
+    
+    async def slow_get_aqniet(endpoint, params=None):
+        state["started"] = True
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+        return []
+    
+    body = json.dumps(FORECAST_BODY).encode()
+    body_sent = False
+    sent_messages = []
+    
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        while not state["started"]:
+            await asyncio.sleep(0.01)
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        sent_messages.append(message)
+    
+    with patch('app.api.v1.endpoints.HTTPClient') as mock_http_client:
+        mock_client = AsyncMock()
+        mock_client.get_aqniet = slow_get_aqniet
+        mock_http_client.return_value.__aenter__.return_value = mock_client
+        mock_http_client.return_value.__aexit__.return_value = None
+        
+        await asyncio.wait_for(app(http_scope("/api/v1/mcp/forecast"), receive, send), timeout=2)
+    
+    assert state["cancelled"]
+    assert sent_messages == []
+    assert len(cache_manager.cache) == 0
+    counters = metrics.snapshot()
+    assert counters["disconnect.requests_cancelled"] == 1
+    assert counters["singleflight.loads_cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_one_load():
+    """Одновременные промахи кэша ждут одну загрузку"""
+    manager = CacheManager()
+    calls = []
+    
+    @manager.cached()
+    async def load(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+    
+    results = await asyncio.gather(load(21), load(21), load(21))
+    
+    assert results == [42, 42, 42]
+    assert calls == [21]
+    assert metrics.snapshot()["singleflight.shared_waits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_load_survives_while_another_waiter_needs_it():
+    """Отмена одного ожидающего не отменяет загрузку, нужную другому"""
+    manager = CacheManager()
+    release = asyncio.Event()
+    
+    @manager.cached()
+    async def load(value):
+        await release.wait()
+        return value
+    
+    first = asyncio.create_task(load(1))
+    second = asyncio.create_task(load(1))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    
+    assert await second == 1
+    assert first.cancelled()
+    assert "singleflight.loads_cancelled" not in metrics.snapshot()
+
+
+@pytest.mark.asyncio
+async def test_load_cancelled_when_last_waiter_leaves():
+    manager = CacheManager()
+    state = {"cancelled": False}
+    
+    @manager.cached()
+    async def load(value):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+        return value
+    
+    waiter = asyncio.create_task(load(1))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    
+    assert state["cancelled"]
+    assert len(manager.cache) == 0
+    assert metrics.snapshot()["singleflight.loads_cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_new_request_does_not_join_cancelled_load():
+    """Запрос, пришедший пока отменённая загрузка завершается, загружает заново"""
+    manager = CacheManager()
+    calls = []
+    
+    @manager.cached()
+    async def load(value):
+        calls.append(value)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                # Отмена завершается не сразу, например, пока закрывается соединение
+                await asyncio.sleep(0.05)
+                raise
+        return value
+    
+    waiter = asyncio.create_task(load(1))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.sleep(0.01)
+    
+    # Отменённая загрузка ещё завершается
+    assert await load(1) == 1
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert calls == [1, 1]
@@ -0,0 +1,138 @@
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+
+from app.main import app
+from app.core.config import get_settings
+from app.core.conditional import etag_matches
+from app.utils.cache import cache_manager
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+PERIOD = {"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-02"}
+FORECAST = [
+    {"date": "2025-07-01", "predicted_sales": 150000.0},
+    {"date": "2025-07-02", "predicted_sales": 155000.0}
+]
+DEPARTMENT = {"object_name": "Ресторан", "object_company": "ТОО Ресторан", "object_bin": "123456789012"}
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"old", "abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"old"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+@pytest.mark.asyncio
+async def test_forecast_not_modified(mock_upstream):
+    """Повторный запрос с If-None-Match получает пустой 304"""
+    mock_upstream.get_aqniet.return_value = FORECAST
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.post("/api/v1/mcp/forecast", json=PERIOD)
+        etag = first.headers["etag"]
+        second = await client.post("/api/v1/mcp/forecast", json=PERIOD, headers={"If-None-Match": etag})
+        stale = await client.post("/api/v1/mcp/forecast", json=PERIOD, headers={"If-None-Match": '"stale"'})
+    
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert stale.status_code == 200
+    assert stale.headers["etag"] == etag
+    assert stale.json() == first.json()
+    assert mock_upstream.get_aqniet.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_etag_depends_on_representation(mock_upstream):
+    """Поля, фильтры, формат и Accept дают разные ETag для одних данных"""
+    mock_upstream.get_aqniet.return_value = FORECAST
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        responses = [
+            await client.post("/api/v1/mcp/forecast", json=PERIOD),
+            await client.post("/api/v1/mcp/forecast?fields=predicted_sales", json=PERIOD),
+            await client.post("/api/v1/mcp/forecast?dates=2025-07-01", json=PERIOD),
+            await client.post("/api/v1/mcp/forecast?format=columnar", json=PERIOD)
+        ]
+        again = await client.post("/api/v1/mcp/forecast?dates=2025-07-01", json=PERIOD)
+    
+    etags = [response.headers["etag"] for response in responses]
+    assert len(set(etags)) == len(etags)
+    assert again.headers["etag"] == etags[2]
+
+
+@pytest.mark.asyncio
+async def test_etag_changes_with_data(mock_upstream):
+    """Новые данные после сброса кэша получают новый ETag"""
+    mock_upstream.get_aqniet.return_value = FORECAST
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.post("/api/v1/mcp/forecast", json=PERIOD)
+        cache_manager.clear()
+        mock_upstream.get_aqniet.return_value = [{"date": "2025-07-01", "predicted_sales": 1.0}]
+        second = await client.post(
+            "/api/v1/mcp/forecast", json=PERIOD, headers={"If-None-Match": first.headers["etag"]}
+        )
+    
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+
+
+@pytest.mark.asyncio
+async def test_etag_without_cache_entry(mock_upstream):
+    """Если записи в кэше нет, ETag считается по телу ответа"""
+    with patch('app.utils.cache.CacheManager.digest', return_value=None):
+        mock_upstream.get_aqniet.return_value = FORECAST
+        
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            first = await client.post("/api/v1/mcp/forecast", json=PERIOD)
+            second = await client.post(
+                "/api/v1/mcp/forecast", json=PERIOD, headers={"If-None-Match": first.headers["etag"]}
+            )
+    
+    assert first.status_code == 200
+    assert second.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_department_info_passthrough_not_modified(monkeypatch, mock_upstream):
+    """В режиме pass-through хэшируется тело апстрима"""
+    monkeypatch.setattr(get_settings(), "passthrough_responses", True)
+    body = '{"object_name": "Ресторан", "object_company": "ТОО Ресторан", "object_bin": "123456789012"}'.encode()
+    
+    mock_upstream.get_madlen_raw.return_value = body
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.post("/api/v1/mcp/department_info", json={"department_id": DEPARTMENT_ID})
+        second = await client.post(
+            "/api/v1/mcp/department_info",
+            json={"department_id": DEPARTMENT_ID},
+            headers={"If-None-Match": first.headers["etag"]}
+        )
+    
+    assert first.content == body
+    assert second.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_department_info_etag(mock_upstream):
+    mock_upstream.get_madlen.return_value = DEPARTMENT
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.post("/api/v1/mcp/department_info", json={"department_id": DEPARTMENT_ID})
+        second = await client.post(
+            "/api/v1/mcp/department_info",
+            json={"department_id": DEPARTMENT_ID},
+            headers={"If-None-Match": f'W/{first.headers["etag"]}'}
+        )
+    
+    assert first.json()["object_name"] == "Ресторан"
+    assert second.status_code == 304
@@ -0,0 +1,118 @@
+import io
+import pytest
+from datetime import date
+from httpx import AsyncClient
+
+from app.main import app
+from app.core.config import get_settings
+from app.services import export
+from app.utils.cache import cache_manager
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_IDS = [
+    "4cb558ca-a8bc-4b81-871e-043f65218c50",
+    "5cb558ca-a8bc-4b81-871e-043f65218c51"
+]
+PERIOD = {"date_start": "2025-07-01", "date_end": "2025-07-02"}
+PAYROLL = {
+    "success": True,
+    "data": [
+        {
+            "employee_name": "Иванов Иван",
+            "payroll_total": 4500.0,
+            "shifts": [
+                {"date": "2025-07-01", "payroll_for_shift": 2250.0, "schedule_name": "2/2", "work_hours": 12.0},
+                {"date": "2025-07-02", "payroll_for_shift": 2250.0, "schedule_name": "2/2", "work_hours": 12.0}
+            ]
+        },
+        {"employee_name": "Петров Пётр", "payroll_total": 0.0, "shifts": []}
+    ]
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache_manager.clear()
+    yield
+    cache_manager.clear()
+
+
+@pytest.fixture(autouse=True)
+def upstream(mock_upstream):
+    async def get_aqniet(endpoint, params=None):
+        return [
+            {"date": "2025-07-01", "hour": hour, "sales_amount": 100.0 * hour}
+            for hour in (10, 11)
+        ]
+    
+    mock_upstream.get_aqniet.side_effect = get_aqniet
+    mock_upstream.get_madlen.return_value = PAYROLL
+    return mock_upstream
+
+
+async def post_export(dataset: str, format: str, period: dict = PERIOD):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        return await client.post(
+            f"/api/v1/mcp/export/{dataset}?format={format}",
+            json={"department_ids": DEPARTMENT_IDS, **period}
+        )
+
+
+@pytest.mark.asyncio
+async def test_export_hourly_sales_arrow_stream():
+    pa = pytest.importorskip("pyarrow")
+    
+    response = await post_export("hourly_sales", "arrow")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == 4
+    assert table.column("department_id").to_pylist() == [DEPARTMENT_IDS[0]] * 2 + [DEPARTMENT_IDS[1]] * 2
+    assert table.column("hour").to_pylist() == [10, 11, 10, 11]
+    assert table.column("date").to_pylist()[0] == date(2025, 7, 1)
+
+
+@pytest.mark.asyncio
+async def test_export_does_not_populate_cache(monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    # Длинный период загружается по месяцам - части тоже не должны кэшироваться
+    monkeypatch.setattr(get_settings(), "upstream_chunk_min_days", 2)
+    
+    response = await post_export("hourly_sales", "arrow", {"date_start": "2025-07-01", "date_end": "2025-08-31"})
+    
+    assert response.status_code == 200
+    # Две части по 2 строки на каждое подразделение
+    assert pa.ipc.open_stream(response.content).read_all().num_rows == 8
+    assert len(cache_manager.cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_export_payroll_shifts_parquet():
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    
+    response = await post_export("payroll_shifts", "parquet")
+    
+    assert response.status_code == 200
+    assert 'payroll_shifts_2025-07-01_2025-07-02.parquet' in response.headers["content-disposition"]
+    parquet_file = pq.ParquetFile(io.BytesIO(response.content))
+    # Одна группа строк на подразделение
+    assert parquet_file.num_row_groups == 2
+    table = parquet_file.read()
+    assert table.num_rows == 4
+    assert table.column("employee_name").to_pylist() == ["Иванов Иван"] * 4
+    assert table.column("work_hours").to_pylist() == [12.0] * 4
+
+
+@pytest.mark.asyncio
+async def test_export_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(export, "PYARROW_AVAILABLE", False)
+    
+    response = await post_export("forecast", "arrow")
+    
+    assert response.status_code == 501
+    assert response.json()["error"]["details"]["dependency"] == "pyarrow"
@@ -0,0 +1,216 @@
+import asyncio
+import os
+import time
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.main import app
+from app.core.config import get_settings
+from app.services.jobs import job_manager
+from app.utils.cache import cache_manager
+from app.utils import metrics
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_IDS = [
+    "4cb558ca-a8bc-4b81-871e-043f65218c50",
+    "5cb558ca-a8bc-4b81-871e-043f65218c51"
+]
+PERIOD = {"date_start": "2025-07-01", "date_end": "2025-07-02"}
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def isolated_jobs(tmp_path, monkeypatch):
+    cache_manager.clear()
+    metrics.reset()
+    job_manager.store.close()
+    monkeypatch.setattr(job_manager.store, "path", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(job_manager, "results_dir", str(tmp_path / "jobs"))
+    yield
+    await job_manager.stop()
+    job_manager.store.close()
+    cache_manager.clear()
+
+
+def fake_upstream(mock_client, get_aqniet=None):
+    async def hourly_sales(endpoint, params=None):
+        return [
+            {"date": "2025-07-01", "hour": hour, "sales_amount": 100.0 * hour}
+            for hour in (10, 11)
+        ]
+    
+    mock_client.get_aqniet.side_effect = get_aqniet or hourly_sales
+
+
+async def wait_finished(client: AsyncClient, job_id: str) -> dict:
+    for _ in range(200):
+        job = (await client.get(f"/api/v1/mcp/jobs/{job_id}")).json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Задание {job_id} не завершилось")
+
+
+@pytest.mark.asyncio
+async def test_export_job_lifecycle(mock_upstream):
+    pa = pytest.importorskip("pyarrow")
+    
+    fake_upstream(mock_upstream)
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        submitted = await client.post(
+            "/api/v1/mcp/jobs/export/hourly_sales?format=arrow",
+            json={"department_ids": DEPARTMENT_IDS, **PERIOD}
+        )
+        job_id = submitted.json()["job_id"]
+        job = await wait_finished(client, job_id)
+        result = await client.get(job["result_url"])
+        events = await client.get(f"/api/v1/mcp/jobs/{job_id}/events")
+    
+    assert submitted.status_code == 202
+    assert submitted.headers["location"] == f"/api/v1/mcp/jobs/{job_id}"
+    assert submitted.json()["status"] == "queued"
+    assert submitted.json()["total"] == 2
+    
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 2
+    assert job["size"] == len(result.content)
+    assert job["expires_at"] is not None
+    
+    assert result.status_code == 200
+    assert result.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    assert "hourly_sales_2025-07-01_2025-07-02.arrows" in result.headers["content-disposition"]
+    assert pa.ipc.open_stream(result.content).read_all().num_rows == 4
+    
+    # Завершённое задание: одно событие done с итоговым статусом
+    assert events.headers["content-type"].startswith("text/event-stream")
+    assert events.text.startswith("event: done\ndata: ")
+    assert events.text.count("event:") == 1
+    assert metrics.snapshot()["jobs.succeeded"] == 1
+
+
+@pytest.mark.asyncio
+async def test_payroll_export_job(mock_upstream):
+    payroll = {
+        "success": True,
+        "data": [{
+            "employee_name": "Иванов Иван",
+            "payroll_total": 2250.0,
+            "shifts": [{"date": "2025-07-01", "payroll_for_shift": 2250.0, "schedule_name": "2/2", "work_hours": 12.0}]
+        }]
+    }
+    
+    fake_upstream(mock_upstream)
+    mock_upstream.get_madlen.return_value = payroll
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        submitted = await client.post(
+            "/api/v1/mcp/jobs/payroll/export?format=csv",
+            json={"department_ids": DEPARTMENT_IDS, **PERIOD}
+        )
+        job = await wait_finished(client, submitted.json()["job_id"])
+        result = await client.get(job["result_url"])
+    
+    # Страница - подразделение за месяц: по одной на каждое из двух подразделений
+    assert job["status"] == "succeeded"
+    assert (job["progress"], job["total"]) == (2, 2)
+    assert result.headers["content-type"].startswith("text/csv")
+    lines = result.content.decode("utf-8-sig").splitlines()
+    assert len(lines) == 3
+    assert lines[1] == f"{DEPARTMENT_IDS[0]},Иванов Иван,2025-07-01,2250.0,2/2,12.0"
+
+
+@pytest.mark.asyncio
+async def test_failed_job_has_error_and_no_result(mock_upstream):
+    pytest.importorskip("pyarrow")
+    
+    fake_upstream(mock_upstream)
+    mock_upstream.get_aqniet.side_effect = Exception("Aqniet API недоступен")
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        submitted = await client.post(
+            "/api/v1/mcp/jobs/export/hourly_sales",
+            json={"department_ids": DEPARTMENT_IDS, **PERIOD}
+        )
+        job = await wait_finished(client, submitted.json()["job_id"])
+        result = await client.get(f"/api/v1/mcp/jobs/{job['job_id']}/result")
+    
+    assert job["status"] == "failed"
+    assert job["error"]["type"] == "external_api_error"
+    assert job["result_url"] is None
+    assert result.status_code == 409
+    assert result.json()["error"]["type"] == "job_not_ready"
+    assert os.listdir(job_manager.results_dir) == []
+
+
+@pytest.mark.asyncio
+async def test_cancel_running_job(mock_upstream):
+    pytest.importorskip("pyarrow")
+    release = asyncio.Event()
+    
+    async def blocked(endpoint, params=None):
+        await release.wait()
+        return []
+    
+    fake_upstream(mock_upstream, get_aqniet=blocked)
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        submitted = await client.post(
+            "/api/v1/mcp/jobs/export/hourly_sales",
+            json={"department_ids": DEPARTMENT_IDS, **PERIOD}
+        )
+        job_id = submitted.json()["job_id"]
+        await asyncio.sleep(0.05)
+        cancelled = await client.delete(f"/api/v1/mcp/jobs/{job_id}")
+        job = await wait_finished(client, job_id)
+        removed = await client.delete(f"/api/v1/mcp/jobs/{job_id}")
+        missing = await client.get(f"/api/v1/mcp/jobs/{job_id}")
+    
+    assert cancelled.json()["status"] == "cancelled"
+    assert job["status"] == "cancelled"
+    assert removed.status_code == 204
+    assert missing.status_code == 404
+    assert missing.json()["error"]["type"] == "job_not_found"
+
+
+@pytest.mark.asyncio
+async def test_queue_full(monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(get_settings(), "job_queue_size", 1)
+    monkeypatch.setattr(get_settings(), "job_workers", 0)
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        request = {"department_ids": DEPARTMENT_IDS, **PERIOD}
+        first = await client.post("/api/v1/mcp/jobs/export/hourly_sales", json=request)
+        second = await client.post("/api/v1/mcp/jobs/export/hourly_sales", json=request)
+    
+    assert first.status_code == 202
+    assert second.status_code == 503
+    assert second.json()["error"]["type"] == "job_queue_full"
+
+
+def test_cleanup_expires_results_and_interrupts_stale_jobs(monkeypatch):
+    store = job_manager.store
+    os.makedirs(job_manager.results_dir)
+    store.create("finished", "export", {}, 1, "text/csv", "report.csv", job_manager.owner)
+    store.finish("finished", "succeeded", size=3)
+    with open(job_manager.result_path("finished"), "wb") as result:
+        result.write(b"a,b")
+    store.create("orphaned", "export", {}, 1, "text/csv", "report.csv", "stopped-process")
+    store.create("own", "export", {}, 1, "text/csv", "report.csv", job_manager.owner)
+    
+    monkeypatch.setattr(get_settings(), "job_result_ttl", 0)
+    monkeypatch.setattr(get_settings(), "job_heartbeat_timeout", 0)
+    job_manager.cleanup()
+    
+    assert store.get("finished") is None
+    assert not os.path.exists(job_manager.result_path("finished"))
+    # heartbeat своих заданий обновляется до проверки, чужое задание без heartbeat завершается
+    orphaned = store.get("orphaned")
+    assert orphaned["status"] == "failed"
+    assert orphaned["error"]["type"] == "job_interrupted"
+    assert orphaned["finished_at"] <= time.time()
+    assert store.get("own")["status"] == "queued"
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import pytest
+
+from app.core.config import get_settings
+from app.utils import json_codec
+
+
+PAYLOAD = [
+    {"date": "2025-07-01", "hour": 10, "sales_amount": 5000.0},
+    {"date": "2025-07-01", "hour": 11, "sales_amount": 7500.5, "comment": "Обед"}
+]
+
+
+def test_loads_matches_stdlib():
+    """Быстрый декодер даёт тот же результат, что и stdlib json"""
+    body = json.dumps(PAYLOAD, ensure_ascii=False).encode()
+    assert json_codec.loads(body) == json.loads(body)
+
+
+def test_loads_stdlib_fallback(monkeypatch):
+    """Без orjson используется stdlib json"""
+    monkeypatch.setattr(json_codec, "ORJSON_AVAILABLE", False)
+    body = json.dumps(PAYLOAD, ensure_ascii=False).encode()
+    assert json_codec.loads(body) == PAYLOAD
+
+
+@pytest.mark.asyncio
+async def test_small_body_parsed_on_loop(monkeypatch):
+    """Небольшие тела разбираются прямо в event loop"""
+    async def fail_to_thread(*args, **kwargs):
+        raise AssertionError("small body must not be offloaded")
+
+    monkeypatch.setattr(asyncio, "to_thread", fail_to_thread)
+    body = json.dumps(PAYLOAD).encode()
+    assert await json_codec.loads_async(body) == PAYLOAD
+
+
+@pytest.mark.asyncio
+async def test_large_body_parsed_in_thread(monkeypatch):
+    """Тела больше порога разбираются в пуле потоков"""
+    calls = []
+    original_to_thread = asyncio.to_thread
+
+    async def tracking_to_thread(func, *args, **kwargs):
+        calls.append(func)
+        return await original_to_thread(func, *args, **kwargs)
+
+    monkeypatch.setattr(get_settings(), "json_offload_threshold", 16)
+    monkeypatch.setattr(asyncio, "to_thread", tracking_to_thread)
+    body = json.dumps(PAYLOAD).encode()
+
+    assert await json_codec.loads_async(body) == PAYLOAD
+    assert calls == [json_codec.loads]
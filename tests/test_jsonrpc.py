@@ -0,0 +1,153 @@
+import asyncio
+import json
+import pytest
+from httpx import AsyncClient
+
+from app.main import app
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+PERIOD = {"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-02"}
+FORECAST = [
+    {"date": "2025-07-01", "predicted_sales": 150000.0},
+    {"date": "2025-07-02", "predicted_sales": 155000.0}
+]
+DEPARTMENT = {"object_name": "Ресторан", "object_company": "ООО Рестораны"}
+RPC_URL = "/api/v1/mcp/rpc"
+
+
+def call(id, name, **arguments):
+    return {"jsonrpc": "2.0", "id": id, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+
+
+def tool_result(response: dict):
+    return json.loads(response["result"]["content"][0]["text"])
+
+
+@pytest.mark.asyncio
+async def test_initialize_and_list_tools():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        initialized = await client.post(RPC_URL, json={
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {"protocolVersion": "2025-03-26", "capabilities": {}, "clientInfo": {"name": "test"}}
+        })
+        notification = await client.post(RPC_URL, json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+        tools = await client.post(RPC_URL, json={"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+    
+    assert initialized.json()["result"]["protocolVersion"] == "2025-03-26"
+    assert "tools" in initialized.json()["result"]["capabilities"]
+    assert notification.status_code == 202
+    
+    definitions = {tool["name"]: tool for tool in tools.json()["result"]["tools"]}
+    assert "get_forecast" in definitions
+    assert "get_department_snapshot" in definitions
+    schema = definitions["get_forecast"]["inputSchema"]
+    assert set(schema["required"]) == {"department_id", "date_start", "date_end"}
+    assert "fields" in schema["properties"]
+
+
+@pytest.mark.asyncio
+async def test_initialize_offers_batching_revision_to_newer_clients():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        initialized = await client.post(RPC_URL, json={
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "test"}}
+        })
+    
+    assert initialized.json()["result"]["protocolVersion"] == "2025-03-26"
+
+
+@pytest.mark.asyncio
+async def test_tools_call_with_fields(mock_upstream):
+    mock_upstream.get_aqniet.return_value = FORECAST
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(RPC_URL, json=call(1, "get_forecast", **PERIOD, fields="predicted_sales"))
+    
+    body = response.json()
+    assert body["id"] == 1
+    assert body["result"]["isError"] is False
+    assert tool_result(body) == {"data": [{"predicted_sales": 150000.0}, {"predicted_sales": 155000.0}]}
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_concurrently_and_shares_loads(mock_upstream):
+    """Вызовы пакета идут конкурентно, одинаковые делят одну загрузку"""
+    started = 0
+    
+    async def slow_forecast(*args, **kwargs):
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.05)
+        return FORECAST
+    
+    mock_upstream.get_madlen.return_value = DEPARTMENT
+    mock_upstream.get_aqniet.side_effect = slow_forecast
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(RPC_URL, json=[
+            call(1, "get_forecast", **PERIOD),
+            call(2, "get_forecast", **PERIOD),
+            call(3, "get_department_info", department_id=DEPARTMENT_ID),
+            {"jsonrpc": "2.0", "method": "notifications/initialized"}
+        ])
+    
+    responses = {item["id"]: item for item in response.json()}
+    assert set(responses) == {1, 2, 3}
+    assert tool_result(responses[1]) == tool_result(responses[2])
+    assert tool_result(responses[3])["object_name"] == "Ресторан"
+    assert started == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_as_sse(mock_upstream):
+    mock_upstream.get_aqniet.return_value = FORECAST
+    mock_upstream.get_madlen.return_value = DEPARTMENT
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            RPC_URL,
+            json=[call(1, "get_forecast", **PERIOD), call(2, "get_department_info", department_id=DEPARTMENT_ID)],
+            headers={"Accept": "application/json, text/event-stream"}
+        )
+    
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(line[len("data: "):])
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert {event["id"] for event in events} == {1, 2}
+
+
+@pytest.mark.asyncio
+async def test_errors(mock_upstream):
+    mock_upstream.get_aqniet.side_effect = Exception("Aqniet API недоступен")
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(RPC_URL, json=[
+            {"jsonrpc": "2.0", "id": 1, "method": "resources/list"},
+            call(2, "unknown_tool"),
+            call(3, "get_forecast", department_id="not-a-uuid", date_start="2025-07-01", date_end="2025-07-02"),
+            call(4, "get_forecast", **PERIOD, fields="unknown"),
+            call(5, "get_forecast", **PERIOD),
+            {"id": 6}
+        ])
+        parse_error = await client.post(RPC_URL, content=b"{not json")
+        empty_batch = await client.post(RPC_URL, json=[])
+    
+    responses = {item["id"]: item for item in response.json()}
+    assert responses[1]["error"]["code"] == -32601
+    assert responses[2]["error"]["code"] == -32602
+    assert responses[3]["error"]["code"] == -32602
+    assert responses[4]["error"]["code"] == -32602
+    # Ошибка апстрима - результат инструмента с isError
+    assert responses[5]["result"]["isError"] is True
+    assert tool_result(responses[5])["error"]["type"] == "external_api_error"
+    assert responses[None]["error"]["code"] == -32600
+    
+    assert parse_error.json()["error"]["code"] == -32700
+    assert empty_batch.json()["error"]["code"] == -32600
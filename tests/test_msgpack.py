@@ -0,0 +1,103 @@
+import pytest
+from httpx import AsyncClient
+
+from app.main import app
+from app.core import negotiation
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+msgpack = pytest.importorskip("msgpack")
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+PERIOD = {"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-02"}
+FORECAST = [
+    {"date": "2025-07-01", "predicted_sales": 150000.0},
+    {"date": "2025-07-02", "predicted_sales": 155000.0}
+]
+MSGPACK = {"Accept": "application/msgpack"}
+
+
+def test_negotiate():
+    assert negotiation.negotiate("application/msgpack") == "application/msgpack"
+    assert negotiation.negotiate("application/json, application/x-msgpack;q=0.5") == "application/msgpack"
+    assert negotiation.negotiate("application/msgpack;q=0") == "application/json"
+    assert negotiation.negotiate("*/*") == "application/json"
+    assert negotiation.negotiate(None) == "application/json"
+
+
+@pytest.mark.asyncio
+async def test_forecast_in_msgpack(mock_upstream):
+    mock_upstream.get_aqniet.return_value = FORECAST
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        packed = await client.post("/api/v1/mcp/forecast", json=PERIOD, headers=MSGPACK)
+        plain = await client.post("/api/v1/mcp/forecast", json=PERIOD)
+    
+    assert packed.status_code == 200
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert "Accept" in packed.headers["vary"]
+    assert msgpack.unpackb(packed.content) == plain.json() == {"data": FORECAST}
+
+
+@pytest.mark.asyncio
+async def test_columnar_and_projection_in_msgpack(mock_upstream):
+    mock_upstream.get_aqniet.return_value = FORECAST
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        columnar = await client.post("/api/v1/mcp/forecast?format=columnar", json=PERIOD, headers=MSGPACK)
+        projected = await client.post("/api/v1/mcp/forecast?fields=date", json=PERIOD, headers=MSGPACK)
+    
+    assert msgpack.unpackb(columnar.content)["columns"] == {"day": [0, 1], "predicted_sales": [150000.0, 155000.0]}
+    assert msgpack.unpackb(projected.content) == {"data": [{"date": "2025-07-01"}, {"date": "2025-07-02"}]}
+
+
+@pytest.mark.asyncio
+async def test_errors_in_msgpack():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        invalid_fields = await client.post("/api/v1/mcp/forecast?fields=amount", json=PERIOD, headers=MSGPACK)
+        invalid_body = await client.post("/api/v1/mcp/forecast", json={}, headers=MSGPACK)
+    
+    assert invalid_fields.status_code == 400
+    assert invalid_fields.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(invalid_fields.content)["error"]["type"] == "validation_error"
+    
+    assert invalid_body.status_code == 422
+    assert invalid_body.headers["content-type"] == "application/msgpack"
+    assert "detail" in msgpack.unpackb(invalid_body.content)
+
+
+@pytest.mark.asyncio
+async def test_passthrough_in_msgpack(monkeypatch, mock_upstream):
+    from app.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "passthrough_responses", True)
+    body = '{"object_name": "Ресторан", "object_company": "ООО Рестораны"}'.encode()
+    
+    mock_upstream.get_madlen_raw.return_value = body
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/department_info",
+            json={"department_id": DEPARTMENT_ID},
+            headers=MSGPACK
+        )
+        # Закэшированный ответ не зависит от формата запроса, который его загрузил
+        plain = await client.post("/api/v1/mcp/department_info", json={"department_id": DEPARTMENT_ID})
+    
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content)["object_name"] == "Ресторан"
+    assert plain.headers["content-type"] == "application/json"
+    assert plain.content == body
+    assert plain.headers["etag"] != response.headers["etag"]
+
+
+@pytest.mark.asyncio
+async def test_json_when_msgpack_unavailable(monkeypatch):
+    monkeypatch.setattr(negotiation, "MSGPACK_AVAILABLE", False)
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/health", headers=MSGPACK)
+    
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["status"] == "healthy"
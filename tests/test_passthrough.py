@@ -0,0 +1,104 @@
+import json
+import pytest
+from httpx import AsyncClient
+from unittest.mock import patch, AsyncMock
+
+from app.main import app
+from app.core.config import get_settings
+from app.utils.cache import cache_manager
+from app.utils import json_codec
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+
+
+@pytest.fixture
+def passthrough_enabled(monkeypatch):
+    monkeypatch.setattr(get_settings(), "passthrough_responses", True)
+    cache_manager.clear()
+    yield
+    cache_manager.clear()
+
+
+def mock_madlen_raw(body: bytes):
+    patcher = patch('app.api.v1.endpoints.HTTPClient')
+    mock_http_client = patcher.start()
+    mock_client = AsyncMock()
+    mock_client.get_madlen_raw.return_value = body
+    mock_http_client.return_value.__aenter__.return_value = mock_client
+    mock_http_client.return_value.__aexit__.return_value = None
+    return patcher, mock_client
+
+
+@pytest.mark.asyncio
+async def test_payroll_passthrough_returns_upstream_bytes(passthrough_enabled, mock_payroll_response):
+    """ФОТ отдаётся байт в байт как пришёл от апстрима"""
+    body = json.dumps(mock_payroll_response, ensure_ascii=False).encode()
+    patcher, mock_client = mock_madlen_raw(body)
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/mcp/payroll",
+                json={"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-31"}
+            )
+    finally:
+        patcher.stop()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == body
+    mock_client.get_madlen.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_department_info_passthrough(passthrough_enabled, mock_department_info_response):
+    """Информация о подразделении отдаётся без повторной сериализации"""
+    body = json.dumps(mock_department_info_response, ensure_ascii=False).encode()
+    patcher, _ = mock_madlen_raw(body)
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post("/api/v1/mcp/department_info", json={"department_id": DEPARTMENT_ID})
+    finally:
+        patcher.stop()
+
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.json()["object_name"] == "Ресторан Центральный"
+
+
+@pytest.mark.asyncio
+async def test_passthrough_rejects_unexpected_shape(passthrough_enabled):
+    """Тело неожиданной формы не передаётся клиенту"""
+    patcher, _ = mock_madlen_raw(b'{"success": true, "data": [{"employee_name": "X"}]}')
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/mcp/payroll",
+                json={"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-31"}
+            )
+    finally:
+        patcher.stop()
+
+    assert response.status_code == 502
+    assert response.json()["error"]["type"] == "external_api_error"
+
+
+@pytest.mark.asyncio
+async def test_sampled_validation_parses_body_asynchronously(passthrough_enabled, monkeypatch, mock_payroll_response):
+    """Тело для выборочной проверки разбирается через loads_async с выносом в пул потоков"""
+    monkeypatch.setattr(get_settings(), "passthrough_validation_sample", 1)
+    body = json.dumps(mock_payroll_response, ensure_ascii=False).encode()
+    patcher, _ = mock_madlen_raw(body)
+    try:
+        with patch('app.core.responses.json_codec.loads_async', wraps=json_codec.loads_async) as mock_loads_async:
+            async with AsyncClient(app=app, base_url="http://test") as client:
+                response = await client.post(
+                    "/api/v1/mcp/payroll",
+                    json={"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-31"}
+                )
+    finally:
+        patcher.stop()
+
+    assert response.status_code == 200
+    assert response.content == body
+    mock_loads_async.assert_called_once_with(body)
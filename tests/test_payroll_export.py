@@ -0,0 +1,177 @@
+import csv
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+import pytest
+from datetime import date
+from httpx import AsyncClient
+
+from app.main import app
+from app.services import spreadsheet
+from app.utils.cache import cache_manager
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_IDS = [
+    "4cb558ca-a8bc-4b81-871e-043f65218c50",
+    "5cb558ca-a8bc-4b81-871e-043f65218c51"
+]
+# Период захватывает два календарных месяца - две страницы на подразделение
+PERIOD = {"date_start": "2025-06-30", "date_end": "2025-07-01"}
+SHEET_NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache_manager.clear()
+    yield
+    cache_manager.clear()
+
+
+async def get_madlen(endpoint, params=None):
+    # Одна смена на страницу: сотрудник и дата берутся из параметров запроса
+    return {
+        "success": True,
+        "data": [{
+            "employee_name": f"Иванов & <{params['department_id'][:4]}>",
+            "payroll_total": 2250.0,
+            "shifts": [{
+                "date": params["from_date"],
+                "payroll_for_shift": 2250.0,
+                "schedule_name": "2/2",
+                "work_hours": 12.0
+            }]
+        }]
+    }
+
+
+@pytest.fixture(autouse=True)
+def upstream(mock_upstream):
+    mock_upstream.get_madlen.side_effect = get_madlen
+    return mock_upstream
+
+
+async def post_export(query: str = "", department_ids=DEPARTMENT_IDS):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        return await client.post(
+            f"/api/v1/mcp/payroll/export{query}",
+            json={"department_ids": department_ids, **PERIOD}
+        )
+
+
+@pytest.mark.asyncio
+async def test_payroll_csv_export(upstream):
+    response = await post_export()
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert 'filename="payroll_2025-06-30_2025-07-01.csv"' in response.headers["content-disposition"]
+    # Excel распознаёт UTF-8 по BOM
+    assert response.content.startswith(b"\xef\xbb\xbf")
+    
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert rows[0] == ["department_id", "employee_name", "date", "payroll_for_shift", "schedule_name", "work_hours"]
+    assert rows[1:] == [
+        [DEPARTMENT_IDS[0], "Иванов & <4cb5>", "2025-06-30", "2250.0", "2/2", "12.0"],
+        [DEPARTMENT_IDS[0], "Иванов & <4cb5>", "2025-07-01", "2250.0", "2/2", "12.0"],
+        [DEPARTMENT_IDS[1], "Иванов & <5cb5>", "2025-06-30", "2250.0", "2/2", "12.0"],
+        [DEPARTMENT_IDS[1], "Иванов & <5cb5>", "2025-07-01", "2250.0", "2/2", "12.0"]
+    ]
+    
+    # Страница апстрима - подразделение за календарный месяц
+    periods = [(call.kwargs["params"]["from_date"], call.kwargs["params"]["to_date"])
+               for call in upstream.get_madlen.call_args_list]
+    assert periods == [("2025-06-30", "2025-06-30"), ("2025-07-01", "2025-07-01")] * 2
+
+
+@pytest.mark.asyncio
+async def test_payroll_csv_delimiter():
+    response = await post_export("?delimiter=;")
+    
+    lines = response.content.decode("utf-8-sig").splitlines()
+    assert lines[0] == "department_id;employee_name;date;payroll_for_shift;schedule_name;work_hours"
+    assert lines[1].split(";")[2] == "2025-06-30"
+
+
+@pytest.mark.asyncio
+async def test_payroll_xlsx_export():
+    response = await post_export("?format=xlsx")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == spreadsheet.SPREADSHEET_MEDIA_TYPES["xlsx"]
+    
+    workbook = zipfile.ZipFile(io.BytesIO(response.content))
+    assert workbook.testzip() is None
+    assert {"[Content_Types].xml", "_rels/.rels", "xl/workbook.xml", "xl/styles.xml",
+            "xl/worksheets/sheet1.xml"} <= set(workbook.namelist())
+    
+    sheet = ET.fromstring(workbook.read("xl/worksheets/sheet1.xml"))
+    rows = sheet.findall("s:sheetData/s:row", SHEET_NS)
+    assert len(rows) == 5
+    header = [cell.findtext("s:is/s:t", namespaces=SHEET_NS) for cell in rows[0]]
+    assert header[:3] == ["department_id", "employee_name", "date"]
+    
+    department, employee, day, amount, schedule, hours = rows[1]
+    assert employee.findtext("s:is/s:t", namespaces=SHEET_NS) == "Иванов & <4cb5>"
+    # Дата - серийный номер Excel со стилем даты
+    assert day.get("s") == "1"
+    assert int(day.findtext("s:v", namespaces=SHEET_NS)) == (date(2025, 6, 30) - date(1899, 12, 30)).days
+    assert float(amount.findtext("s:v", namespaces=SHEET_NS)) == 2250.0
+
+
+@pytest.mark.asyncio
+async def test_xlsx_starts_new_sheet_at_row_limit(monkeypatch):
+    monkeypatch.setattr(spreadsheet, "XLSX_MAX_ROWS", 3)
+    
+    async def pages():
+        yield [("a", 1), ("b", 2)]
+        yield [("c", 3), ("d", 4), ("e", 5)]
+    
+    body = b"".join([chunk async for chunk in spreadsheet.encode_rows(pages(), ["name", "value"], "xlsx")])
+    workbook = zipfile.ZipFile(io.BytesIO(body))
+    
+    counts = [
+        len(ET.fromstring(workbook.read(f"xl/worksheets/sheet{n}.xml")).findall("s:sheetData/s:row", SHEET_NS))
+        for n in (1, 2, 3)
+    ]
+    # Каждый лист начинается с заголовка
+    assert counts == [3, 3, 2]
+    assert workbook.read("xl/workbook.xml").count(b"<sheet ") == 3
+
+
+@pytest.mark.asyncio
+async def test_csv_escapes_formulas():
+    async def pages():
+        yield [("=cmd|' /C calc'!A0", -1.5), ("@SUM(A1)", 2), ("Иванов Иван", 3)]
+    
+    body = b"".join([chunk async for chunk in spreadsheet.encode_rows(pages(), ["name", "value"], "csv")])
+    rows = list(csv.reader(io.StringIO(body.decode("utf-8-sig"))))
+    
+    assert rows[1:] == [["'=cmd|' /C calc'!A0", "-1.5"], ["'@SUM(A1)", "2"], ["Иванов Иван", "3"]]
+
+
+@pytest.mark.asyncio
+async def test_payroll_export_upstream_error(upstream):
+    upstream.get_madlen.side_effect = Exception("Madlen API недоступен")
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/payroll/export",
+            json={"department_ids": DEPARTMENT_IDS, **PERIOD}
+        )
+    
+    assert response.status_code == 502
+    assert response.json()["error"]["type"] == "external_api_error"
+
+
+@pytest.mark.asyncio
+async def test_payroll_export_department_limit(monkeypatch):
+    from app.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "export_max_departments", 1)
+    
+    response = await post_export()
+    
+    assert response.status_code == 400
+    assert response.json()["error"]["details"]["field"] == "department_ids"
@@ -0,0 +1,120 @@
+import json
+import pytest
+from httpx import AsyncClient
+
+from app.main import app
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+PERIOD = {"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-03"}
+FORECAST = [
+    {"date": "2025-07-01", "predicted_sales": 150000.0},
+    {"date": "2025-07-02", "predicted_sales": 155000.0},
+    {"date": "2025-07-03", "predicted_sales": 160000.0}
+]
+HOURLY = [
+    {"date": f"2025-07-0{day}", "hour": hour, "sales_amount": 1000.0 * hour}
+    for day in (1, 2, 3)
+    for hour in range(24)
+]
+REVIEWS = [
+    {
+        "review_id": str(i),
+        "branch_id": "2",
+        "branch_name": "Ресторан",
+        "user_name": "Гость",
+        "rating": float(i),
+        "text": f"Отзыв {i}",
+        "date_created": "2025-07-01T12:00:00",
+        "is_verified": True,
+        "likes_count": 0,
+        "comments_count": 0,
+        "photos_count": 1,
+        "photos_urls": ["https://photos.example/1.jpg"]
+    }
+    for i in range(1, 6)
+]
+
+
+@pytest.mark.asyncio
+async def test_forecast_fields_and_dates(mock_upstream):
+    mock_upstream.get_aqniet.return_value = FORECAST
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        projected = await client.post(
+            "/api/v1/mcp/forecast?fields=predicted_sales&dates=2025-07-02..2025-07-03",
+            json=PERIOD
+        )
+        full = await client.post("/api/v1/mcp/forecast", json=PERIOD)
+    
+    assert projected.status_code == 200
+    assert projected.json() == {"data": [{"predicted_sales": 155000.0}, {"predicted_sales": 160000.0}]}
+    # Кэшированная модель не изменилась
+    assert full.json() == {"data": FORECAST}
+
+
+@pytest.mark.asyncio
+async def test_hourly_sales_hours_filter(mock_upstream):
+    mock_upstream.get_aqniet.return_value = HOURLY
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/hourly_sales?hours=12-13&dates=2025-07-02&fields=hour,sales_amount",
+            json=PERIOD
+        )
+    
+    assert response.json() == {"data": [
+        {"hour": 12, "sales_amount": 12000.0},
+        {"hour": 13, "sales_amount": 13000.0}
+    ]}
+
+
+@pytest.mark.asyncio
+async def test_reviews_min_rating_and_fields(mock_upstream):
+    mock_upstream.get_reviews.return_value = REVIEWS
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(
+            f"/api/v1/mcp/reviews/{DEPARTMENT_ID}/5?min_rating=4&fields=rating,text"
+        )
+    
+    assert response.json() == {"data": [
+        {"rating": 4.0, "text": "Отзыв 4"},
+        {"rating": 5.0, "text": "Отзыв 5"}
+    ]}
+
+
+@pytest.mark.asyncio
+async def test_projection_applies_to_ndjson(mock_upstream):
+    async def stream_aqniet(endpoint, params=None):
+        yield HOURLY[:24]
+        yield HOURLY[24:]
+    
+    mock_upstream.stream_aqniet = stream_aqniet
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/hourly_sales?format=ndjson&hours=10&fields=date",
+            json=PERIOD
+        )
+    
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == [{"date": "2025-07-01"}, {"date": "2025-07-02"}, {"date": "2025-07-03"}]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("query, field", [
+    ("fields=amount", "fields"),
+    ("hours=25", "hours"),
+    ("hours=morning", "hours"),
+    ("dates=2025-07-03..2025-07-01", "dates")
+])
+async def test_invalid_selection_rejected(query, field):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(f"/api/v1/mcp/hourly_sales?{query}", json=PERIOD)
+    
+    assert response.status_code == 400
+    assert response.json()["error"]["details"]["field"] == field
@@ -0,0 +1,101 @@
+import json
+import pytest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient
+
+from app.main import app
+from app.core.responses import FastJSONResponse
+from app.models.responses import ReviewsResponse
+from app.utils import json_codec
+from app.utils.cache import cache_manager
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+
+CONTENT = {
+    "id": UUID(DEPARTMENT_ID),
+    "date": date(2025, 7, 1),
+    "created": datetime(2025, 7, 1, 12, 30, 15),
+    "edited": datetime(2025, 7, 1, 12, 30, 15, 250000, tzinfo=timezone.utc),
+    "amount": Decimal("1250.50"),
+    "name": "Ресторан Центральный"
+}
+
+EXPECTED = {
+    "id": DEPARTMENT_ID,
+    "date": "2025-07-01",
+    "created": "2025-07-01T12:30:15",
+    "edited": "2025-07-01T12:30:15.250000+00:00",
+    "amount": 1250.5,
+    "name": "Ресторан Центральный"
+}
+
+
+@pytest.mark.parametrize("orjson_available", [True, False])
+def test_dumps_special_types(monkeypatch, orjson_available):
+    """date / datetime / UUID / Decimal кодируются одинаково с orjson и без него"""
+    if orjson_available and not json_codec.ORJSON_AVAILABLE:
+        pytest.skip("orjson не установлен")
+    monkeypatch.setattr(json_codec, "ORJSON_AVAILABLE", orjson_available)
+    
+    body = json_codec.dumps(CONTENT)
+    
+    assert json.loads(body) == EXPECTED
+    assert "Ресторан Центральный".encode("utf-8") in body
+
+
+def test_response_matches_pydantic_serialization():
+    """Ответ совпадает с сериализацией модели pydantic"""
+    reviews = ReviewsResponse(data=[{
+        "review_id": "1",
+        "branch_id": "2",
+        "branch_name": "Ресторан",
+        "user_name": "Гость",
+        "rating": 5.0,
+        "text": "Всё отлично",
+        "date_created": "2025-07-01T12:00:00",
+        "date_edited": None,
+        "is_verified": True,
+        "likes_count": 0,
+        "comments_count": 0,
+        "photos_count": 0,
+        "photos_urls": []
+    }])
+    
+    response = FastJSONResponse(reviews.model_dump(mode="json"))
+    
+    assert json.loads(response.body) == json.loads(reviews.model_dump_json())
+    assert response.headers["content-type"] == "application/json"
+
+
+@pytest.mark.asyncio
+async def test_endpoint_uses_fast_response():
+    """Эндпоинты отдают кириллицу без экранирования"""
+    cache_manager.clear()
+    mock_data = {
+        "object_name": "Ресторан Центральный",
+        "object_company": "ООО Рестораны",
+        "hall_area": 250.5,
+        "kitchen_area": 75.0,
+        "seats_count": 120
+    }
+    
+    with patch('app.api.v1.endpoints.HTTPClient') as mock_http_client:
+        mock_client = AsyncMock()
+        mock_client.get_madlen.return_value = mock_data
+        mock_http_client.return_value.__aenter__.return_value = mock_client
+        mock_http_client.return_value.__aexit__.return_value = None
+        
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/mcp/department_info",
+                json={"department_id": DEPARTMENT_ID}
+            )
+    
+    cache_manager.clear()
+    assert response.status_code == 200
+    assert "Ресторан Центральный".encode("utf-8") in response.content
+    assert response.json()["object_name"] == "Ресторан Центральный"
@@ -0,0 +1,72 @@
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient
+
+from app.main import app
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+
+FORECAST_REQUEST = {
+    "department_id": DEPARTMENT_ID,
+    "date_start": "2025-07-01",
+    "date_end": "2025-07-02"
+}
+
+
+@pytest.mark.asyncio
+async def test_response_not_revalidated_by_fastapi(mock_upstream):
+    """Ответ валидируется в загрузчике, FastAPI не сериализует его по response_model"""
+    data = [
+        {"date": "2025-07-01", "predicted_sales": 150000.0, "extra": "не попадает в ответ"},
+        {"date": "2025-07-02", "predicted_sales": "160000.5"}
+    ]
+    
+    with patch('fastapi.routing.serialize_response') as serialize_response:
+        mock_upstream.get_aqniet.return_value = data
+        
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post("/api/v1/mcp/forecast", json=FORECAST_REQUEST)
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"data": [
+        {"date": "2025-07-01", "predicted_sales": 150000.0},
+        {"date": "2025-07-02", "predicted_sales": 160000.5}
+    ]}
+    serialize_response.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_invalid_upstream_row_is_rejected(mock_upstream):
+    """Некорректная строка апстрима отклоняется при единственной валидации"""
+    data = [
+        {"date": "2025-07-01", "hour": 10, "sales_amount": 5000.0},
+        {"date": "not-a-date", "hour": 11, "sales_amount": 7500.0}
+    ]
+    
+    mock_upstream.get_aqniet.return_value = data
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/mcp/hourly_sales", json=FORECAST_REQUEST)
+    
+    assert response.status_code == 502
+    assert response.json()["error"]["type"] == "external_api_error"
+
+
+@pytest.mark.asyncio
+async def test_cached_model_served_without_upstream_call(mock_upstream):
+    """В кэше хранится модель; повторный запрос отдаётся без обращения к апстриму"""
+    data = [{"date": "2025-07-01", "predicted_sales": 150000.0}]
+    
+    mock_upstream.get_aqniet.return_value = data
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.post("/api/v1/mcp/forecast", json=FORECAST_REQUEST)
+        second = await client.post("/api/v1/mcp/forecast", json=FORECAST_REQUEST)
+    
+    assert first.content == second.content
+    assert mock_upstream.get_aqniet.call_count == 1
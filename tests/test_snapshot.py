@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from httpx import AsyncClient
+
+from app.main import app
+from app.utils.cache import cache_manager
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+PERIOD = {"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-01"}
+
+AQNIET_DATA = {
+    "forecast/batch": [{"date": "2025-07-01", "predicted_sales": 150000.0}],
+    "sales/hourly": [{"date": "2025-07-01", "hour": 10, "sales_amount": 5000.0}],
+    "forecast/comparison": [{
+        "date": "2025-07-01",
+        "predicted_sales": 150000.0,
+        "actual_sales": 145000.0,
+        "error": -5000.0,
+        "error_percentage": -3.33
+    }]
+}
+DEPARTMENT = {"object_name": "Ресторан Центральный", "object_company": "ООО Рестораны"}
+PAYROLL = {
+    "success": True,
+    "data": [{
+        "employee_name": "Иванов Иван",
+        "payroll_total": 2250.0,
+        "shifts": [{"date": "2025-07-01", "payroll_for_shift": 2250.0, "schedule_name": "2/2", "work_hours": 12.0}]
+    }]
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache_manager.clear()
+    yield
+    cache_manager.clear()
+
+
+def fake_upstream(mock_client, aqniet_delay: float = 0, madlen_error: bool = False):
+    state = {"active": 0, "peak": 0}
+    
+    async def track(result):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return result
+    
+    async def get_aqniet(endpoint, params=None):
+        await asyncio.sleep(aqniet_delay)
+        return await track(AQNIET_DATA[endpoint])
+    
+    async def get_madlen(endpoint, params=None):
+        if madlen_error:
+            raise Exception("Madlen unavailable")
+        return await track(PAYROLL if endpoint == "admin/payroll/attendance" else DEPARTMENT)
+    
+    mock_client.get_aqniet.side_effect = get_aqniet
+    mock_client.get_madlen.side_effect = get_madlen
+    return state
+
+
+@pytest.mark.asyncio
+async def test_snapshot_loads_all_parts_concurrently(mock_upstream):
+    state = fake_upstream(mock_upstream)
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/mcp/snapshot", json=PERIOD)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["department_info"]["object_name"] == "Ресторан Центральный"
+    assert data["forecast"] == AQNIET_DATA["forecast/batch"]
+    assert data["hourly_sales"] == AQNIET_DATA["sales/hourly"]
+    assert data["plan_vs_fact"] == AQNIET_DATA["forecast/comparison"]
+    assert data["payroll"][0]["employee_name"] == "Иванов Иван"
+    assert data["errors"] == {}
+    assert state["peak"] == 5
+
+
+@pytest.mark.asyncio
+async def test_snapshot_selected_parts(mock_upstream):
+    fake_upstream(mock_upstream)
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/snapshot",
+            json={**PERIOD, "parts": ["forecast", "department_info"]}
+        )
+    
+    data = response.json()
+    assert data["forecast"] == AQNIET_DATA["forecast/batch"]
+    assert data["department_info"] is not None
+    assert data["hourly_sales"] is None
+    assert data["payroll"] is None
+
+
+@pytest.mark.asyncio
+async def test_snapshot_part_errors_and_timeouts(mock_upstream):
+    """Ошибки и таймауты частей попадают в errors, остальные части возвращаются"""
+    fake_upstream(mock_upstream, aqniet_delay=1, madlen_error=True)
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/mcp/snapshot",
+            json={**PERIOD, "parts": ["forecast", "payroll"], "part_timeout": 0.05}
+        )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["forecast"] is None
+    assert data["payroll"] is None
+    assert data["errors"]["forecast"]["type"] == "timeout"
+    assert data["errors"]["payroll"]["type"] == "external_api_error"
+
+
+@pytest.mark.asyncio
+async def test_snapshot_rejects_unknown_part():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/v1/mcp/snapshot", json={**PERIOD, "parts": ["reviews"]})
+    
+    assert response.status_code == 422
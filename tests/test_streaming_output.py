@@ -0,0 +1,125 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from httpx import AsyncClient
+
+from app.main import app
+from app.core.exceptions import ExternalAPIError
+from app.utils.cache import cache_manager
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+HOURLY_REQUEST = {"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-02"}
+BATCHES = [
+    [{"date": "2025-07-01", "hour": 10, "sales_amount": 5000.0}],
+    [],
+    [{"date": "2025-07-02", "hour": 11, "sales_amount": 7500.0}, {"date": "2025-07-02", "hour": 12, "sales_amount": 8000.0}]
+]
+REVIEW = {
+    "review_id": "1",
+    "branch_id": "2",
+    "branch_name": "Ресторан",
+    "user_name": "Гость",
+    "rating": 5.0,
+    "text": "Всё отлично",
+    "date_created": "2025-07-01T12:00:00",
+    "is_verified": True,
+    "likes_count": 0,
+    "comments_count": 0,
+    "photos_count": 0,
+    "photos_urls": []
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache_manager.clear()
+    yield
+    cache_manager.clear()
+
+
+def mock_stream(mock_http_client, name: str, batches, error_after: int = None):
+    async def stream(endpoint, params=None):
+        for index, batch in enumerate(batches):
+            if index == error_after:
+                raise ExternalAPIError(message="Connection reset", endpoint=endpoint)
+            yield batch
+    
+    mock_client = MagicMock()
+    setattr(mock_client, name, stream)
+    mock_http_client.return_value.__aenter__.return_value = mock_client
+    mock_http_client.return_value.__aexit__.return_value = None
+
+
+@pytest.mark.asyncio
+async def test_hourly_sales_ndjson_by_accept_header():
+    with patch('app.api.v1.endpoints.HTTPClient') as mock_http_client:
+        mock_stream(mock_http_client, "stream_aqniet", BATCHES)
+        
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/mcp/hourly_sales",
+                json=HOURLY_REQUEST,
+                headers={"Accept": "application/x-ndjson"}
+            )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["hour"] for row in rows] == [10, 11, 12]
+    assert rows[0] == {"date": "2025-07-01", "hour": 10, "sales_amount": 5000.0}
+
+
+@pytest.mark.asyncio
+async def test_hourly_sales_json_stream_matches_regular_response():
+    """format=json-stream отдаёт тот же документ, что и обычный ответ"""
+    rows = [row for batch in BATCHES for row in batch]
+    
+    with patch('app.api.v1.endpoints.HTTPClient') as mock_http_client:
+        mock_stream(mock_http_client, "stream_aqniet", BATCHES)
+        
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post("/api/v1/mcp/hourly_sales?format=json-stream", json=HOURLY_REQUEST)
+    
+    assert response.status_code == 200
+    assert response.json() == {"data": rows}
+
+
+@pytest.mark.asyncio
+async def test_reviews_ndjson_by_format():
+    with patch('app.api.v1.endpoints.HTTPClient') as mock_http_client:
+        mock_stream(mock_http_client, "stream_reviews", [[REVIEW, {**REVIEW, "review_id": "2"}]])
+        
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.get(f"/api/v1/mcp/reviews/{DEPARTMENT_ID}/2?format=ndjson")
+    
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["review_id"] for row in rows] == ["1", "2"]
+    assert rows[0]["branch_name"] == "Ресторан"
+
+
+@pytest.mark.asyncio
+async def test_error_before_first_row_keeps_status():
+    with patch('app.api.v1.endpoints.HTTPClient') as mock_http_client:
+        mock_stream(mock_http_client, "stream_aqniet", BATCHES, error_after=0)
+        
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post("/api/v1/mcp/hourly_sales?format=ndjson", json=HOURLY_REQUEST)
+    
+    assert response.status_code == 502
+    assert response.json()["error"]["type"] == "external_api_error"
+
+
+@pytest.mark.asyncio
+async def test_error_mid_stream_reported_as_last_line():
+    with patch('app.api.v1.endpoints.HTTPClient') as mock_http_client:
+        mock_stream(mock_http_client, "stream_aqniet", BATCHES, error_after=2)
+        
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post("/api/v1/mcp/hourly_sales?format=ndjson", json=HOURLY_REQUEST)
+    
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows[0]["hour"] == 10
+    assert rows[-1]["error"]["type"] == "external_api_error"
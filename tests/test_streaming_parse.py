@@ -0,0 +1,134 @@
+import json
+import pytest
+import httpx
+from httpx import AsyncClient
+from unittest.mock import patch, MagicMock
+
+from app.main import app
+from app.core.config import get_settings
+from app.core.exceptions import ExternalAPIError
+from app.services.http_client import HTTPClient
+from app.utils.cache import cache_manager
+from app.utils.json_codec import iter_json_array
+
+
+async def chunked(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def collect(body: bytes, size: int) -> list:
+    items = []
+    async for batch in iter_json_array(chunked(body, size)):
+        items.extend(batch)
+    return items
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    def __init__(self, body: bytes, size: int = 7):
+        self.body = body
+        self.size = size
+
+    async def __aiter__(self):
+        async for chunk in chunked(self.body, self.size):
+            yield chunk
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 64, 65536])
+async def test_iter_json_array_any_chunk_boundaries(chunk_size):
+    """Элементы разбираются корректно при любых границах чанков"""
+    payload = [
+        {"date": "2025-07-01", "hour": 10, "sales_amount": 5000.0},
+        {"text": "Строка с , ] } \\\" внутри", "nested": [1, {"a": [2]}]},
+        123456,
+        2.5e10,
+        None,
+        True
+    ]
+    body = json.dumps(payload, ensure_ascii=False, indent=1).encode()
+    assert await collect(body, chunk_size) == payload
+
+
+@pytest.mark.asyncio
+async def test_iter_json_array_empty():
+    assert await collect(b"[ ]", 1) == []
+
+
+@pytest.mark.asyncio
+async def test_iter_json_array_rejects_non_array():
+    with pytest.raises(ValueError):
+        await collect(b'{"data": []}', 4)
+
+
+@pytest.mark.asyncio
+async def test_iter_json_array_rejects_truncated_body():
+    with pytest.raises(ValueError):
+        await collect(b'[{"a": 1}, {"a": 2', 4)
+
+
+@pytest.mark.asyncio
+async def test_stream_aqniet_yields_batches():
+    """HTTPClient отдаёт элементы массива пачками по мере чтения тела"""
+    payload = [{"date": "2025-07-01", "hour": hour, "sales_amount": 100.0 * hour} for hour in range(24)]
+    body = json.dumps(payload).encode()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=ChunkedStream(body))
+
+    client = HTTPClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    batches = [batch async for batch in client.stream_aqniet("sales/hourly", params={"department_id": "1"})]
+    await client._client.aclose()
+
+    assert len(batches) > 1
+    assert [item for batch in batches for item in batch] == payload
+
+
+@pytest.mark.asyncio
+async def test_stream_reviews_maps_http_errors():
+    """Ошибки потокового запроса преобразуются так же, как и у обычного"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404, text="not found")
+
+    client = HTTPClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with pytest.raises(ExternalAPIError) as exc_info:
+        async for _ in client.stream_reviews("v1/by-iiko/1/1000"):
+            pass
+    await client._client.aclose()
+
+    assert exc_info.value.detail["error"]["details"]["status_code"] == 404
+
+
+@pytest.mark.asyncio
+async def test_hourly_sales_long_period_uses_stream(monkeypatch):
+    """Длинный период почасовых продаж получается потоково"""
+    monkeypatch.setattr(get_settings(), "stream_hourly_min_days", 30)
+
+    async def stream_aqniet(endpoint, params=None):
+        assert endpoint == "sales/hourly"
+        yield [{"date": "2025-07-01", "hour": 10, "sales_amount": 5000.0}]
+        yield [{"date": "2025-07-02", "hour": 11, "sales_amount": 7500.0}]
+
+    with patch('app.api.v1.endpoints.HTTPClient') as mock_http_client:
+        mock_client = MagicMock()
+        mock_client.stream_aqniet = stream_aqniet
+        mock_http_client.return_value.__aenter__.return_value = mock_client
+        mock_http_client.return_value.__aexit__.return_value = None
+        cache_manager.clear()
+
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/mcp/hourly_sales",
+                json={
+                    "department_id": "4cb558ca-a8bc-4b81-871e-043f65218c50",
+                    "date_start": "2025-07-01",
+                    "date_end": "2025-08-31"
+                }
+            )
+
+        cache_manager.clear()
+
+    assert response.status_code == 200
+    assert [item["hour"] for item in response.json()["data"]] == [10, 11]
@@ -0,0 +1,162 @@
+import json
+import pytest
+from datetime import date, datetime, timedelta
+from httpx import AsyncClient
+
+from app.main import app
+from app.models.responses import HOURLY_SALES_ITEMS, REVIEWS
+from app.services import summaries
+from app.utils import metrics
+
+
+pytestmark = pytest.mark.usefixtures("clear_cache")
+
+
+DEPARTMENT_ID = "4cb558ca-a8bc-4b81-871e-043f65218c50"
+PERIOD = {"department_id": DEPARTMENT_ID, "date_start": "2025-07-01", "date_end": "2025-07-30"}
+HOURLY_SALES = [
+    {"date": (date(2025, 7, 1) + timedelta(days=day)).isoformat(), "hour": hour, "sales_amount": 100.0 * hour + day}
+    for day in range(30)
+    for hour in range(24)
+]
+RPC_URL = "/api/v1/mcp/rpc"
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+
+
+def call(id, name, **arguments):
+    return {"jsonrpc": "2.0", "id": id, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+
+
+def test_hourly_sales_summary():
+    rows = HOURLY_SALES_ITEMS.validate_python(HOURLY_SALES)
+    summary = summaries.hourly_sales(rows, top=3)
+    
+    assert summary["rows"] == 720
+    assert summary["days"] == 30
+    assert summary["date_start"] == "2025-07-01"
+    assert summary["sales_amount"]["total"] == round(sum(item["sales_amount"] for item in HOURLY_SALES), 2)
+    assert summary["hourly_mean"][0] == 14.5
+    assert summary["daily"]["2025-07-01"] == sum(100.0 * hour for hour in range(24))
+    assert [row["sales_amount"] for row in summary["top"]] == [2329.0, 2328.0, 2327.0]
+    assert summary["bottom"][0]["sales_amount"] == 0.0
+
+
+def test_reviews_summary():
+    rows = REVIEWS.validate_python([
+        {
+            "review_id": str(i), "branch_id": "1", "branch_name": "Ресторан", "user_name": "Гость",
+            "rating": rating, "text": "Очень " * 100, "date_created": datetime(2025, 7, 1 + i).isoformat(),
+            "is_verified": True, "likes_count": 0, "comments_count": 0, "photos_count": 0, "photos_urls": []
+        }
+        for i, rating in enumerate([5, 5, 4, 1, 3])
+    ])
+    summary = summaries.reviews(rows, top=2)
+    
+    assert summary["histogram"] == {1: 1, 2: 0, 3: 1, 4: 1, 5: 2}
+    assert summary["rating"]["mean"] == 3.6
+    assert summary["lowest"][0]["rating"] == 1
+    assert len(summary["lowest"][0]["text"]) == 201
+
+
+FORECAST_TOTALS = {
+    "summarized": True,
+    "rows": 30,
+    "predicted_sales": {"total": 4500000.0, "mean": 150000.0, "min": 100000.0, "max": 200000.0}
+}
+
+
+def forecast_summary():
+    return {
+        **FORECAST_TOTALS,
+        "weekday_mean": {weekday: 150000.0 for weekday in range(1, 8)},
+        "top": [{"date": "2025-07-01", "predicted_sales": 200000.0}] * 5,
+        "bottom": [{"date": "2025-07-02", "predicted_sales": 100000.0}] * 5
+    }
+
+
+def test_fit_budget_drops_rows_before_aggregates():
+    summary = forecast_summary()
+    body = summaries.fit_budget(summary, 250)
+    
+    assert len(body) <= 250
+    assert json.loads(body) == {
+        **FORECAST_TOTALS,
+        "weekday_mean": {str(weekday): 150000.0 for weekday in range(1, 8)},
+        "omitted": ["top", "bottom"]
+    }
+    # Закэшированная сводка не изменяется
+    assert summary == forecast_summary()
+
+
+def test_fit_budget_always_keeps_totals():
+    body = summaries.fit_budget(forecast_summary(), 160)
+    
+    assert json.loads(body) == {**FORECAST_TOTALS, "omitted": ["top", "bottom", "weekday_mean"]}
+    assert summaries.fit_budget(forecast_summary(), 100) is None
+
+
+def test_fit_budget_drops_sections_of_snapshot_parts():
+    summary = {"department_id": DEPARTMENT_ID, "forecast": forecast_summary(), "payroll": None}
+    body = json.loads(summaries.fit_budget(summary, 270))
+    
+    assert body["forecast"]["predicted_sales"] == FORECAST_TOTALS["predicted_sales"]
+    assert body["omitted"] == ["forecast.top", "forecast.bottom", "forecast.weekday_mean"]
+
+
+@pytest.mark.asyncio
+async def test_tool_call_within_budget_returns_rows(mock_upstream):
+    mock_upstream.get_aqniet.return_value = HOURLY_SALES
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(RPC_URL, json=call(1, "get_hourly_sales", **PERIOD, max_bytes=1_000_000))
+    
+    result = json.loads(response.json()["result"]["content"][0]["text"])
+    assert len(result["data"]) == 720
+
+
+@pytest.mark.asyncio
+async def test_tool_call_over_budget_returns_cached_summary(mock_upstream):
+    mock_upstream.get_aqniet.return_value = HOURLY_SALES
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.post(RPC_URL, json=call(1, "get_hourly_sales", **PERIOD, max_tokens=1000))
+        second = await client.post(RPC_URL, json=call(2, "get_hourly_sales", **PERIOD, max_bytes=1000))
+    
+    text = first.json()["result"]["content"][0]["text"]
+    result = json.loads(text)
+    assert len(text.encode()) <= 4000
+    assert result["summarized"] is True
+    assert result["budget_bytes"] == 4000
+    assert result["rows"] == 720
+    assert "data" not in result
+    
+    # Подробные разделы отброшены, чтобы уложиться в меньший бюджет
+    small = json.loads(second.json()["result"]["content"][0]["text"])
+    assert "daily" in small["omitted"]
+    assert small["sales_amount"] == result["sales_amount"]
+    
+    assert metrics.snapshot()["summaries.cache_hits"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_budget():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(RPC_URL, json=call(1, "get_hourly_sales", **PERIOD, max_bytes=0))
+    
+    assert response.json()["error"]["code"] == -32602
+
+
+@pytest.mark.asyncio
+async def test_tool_call_error_when_totals_exceed_budget(mock_upstream):
+    mock_upstream.get_aqniet.return_value = HOURLY_SALES
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(RPC_URL, json=call(1, "get_hourly_sales", **PERIOD, max_bytes=50))
+    
+    result = response.json()["result"]
+    assert result["isError"] is True
+    assert json.loads(result["content"][0]["text"])["error"]["type"] == "result_too_large"
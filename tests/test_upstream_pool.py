@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+import httpx
+import httpcore
+from httpx import AsyncClient
+
+from app.main import app, warm_up_upstreams
+from app.core.config import get_settings
+from app.services.dns_cache import DNSCache, CachingDNSBackend
+from app.services.http_client import HTTPClient, UpstreamTransport, upstream_pool
+
+
+class CountingDNSCache(DNSCache):
+    def __init__(self, ttl: int = 300):
+        super().__init__(ttl)
+        self.lookups = []
+
+    async def _lookup(self, host: str, port: int) -> list:
+        self.lookups.append(host)
+        return ["10.0.0.1", "10.0.0.2"]
+
+
+class RecordingBackend(httpcore.AsyncNetworkBackend):
+    def __init__(self, failing: set = frozenset(), response: bytes = b""):
+        self.failing = failing
+        self.response = response
+        self.attempts = []
+        self.local_addresses = []
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.attempts.append(host)
+        self.local_addresses.append(local_address)
+        if host in self.failing:
+            raise httpcore.ConnectError(f"connection refused: {host}")
+        return httpcore.AsyncMockStream([self.response] if self.response else [])
+
+
+@pytest.mark.asyncio
+async def test_dns_cache_reuses_fresh_entry():
+    """Свежая запись не вызывает повторного разрешения"""
+    dns_cache = CountingDNSCache()
+    assert await dns_cache.resolve("aqniet.site", 443) == ["10.0.0.1", "10.0.0.2"]
+    assert await dns_cache.resolve("aqniet.site", 443) == ["10.0.0.1", "10.0.0.2"]
+    assert dns_cache.lookups == ["aqniet.site"]
+
+
+@pytest.mark.asyncio
+async def test_dns_cache_serves_stale_and_refreshes_in_background():
+    """Просроченная запись отдаётся сразу, а обновляется в фоне"""
+    dns_cache = CountingDNSCache(ttl=0)
+    await dns_cache.resolve("madlen.space", 443)
+    assert await dns_cache.resolve("madlen.space", 443) == ["10.0.0.1", "10.0.0.2"]
+
+    await asyncio.sleep(0)
+    assert dns_cache.lookups == ["madlen.space", "madlen.space"]
+    await dns_cache.stop_refresh()
+
+
+@pytest.mark.asyncio
+async def test_caching_backend_falls_back_to_next_address():
+    """Если первый адрес недоступен, соединение идёт на следующий"""
+    backend = RecordingBackend(failing={"10.0.0.1"})
+    caching_backend = CachingDNSBackend(CountingDNSCache(), backend)
+
+    await caching_backend.connect_tcp("reviews.aqniet.site", 443)
+    assert backend.attempts == ["10.0.0.1", "10.0.0.2"]
+
+
+@pytest.mark.asyncio
+async def test_upstream_transport_uses_dns_cache():
+    """
+    Запросы идут через пул с CachingDNSBackend и параметрами транспорта.
+    Падает, если httpx перестанет брать пул транспорта из _pool.
+    """
+    dns_cache = CountingDNSCache()
+    backend = RecordingBackend(response=b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+    transport = UpstreamTransport(
+        dns_cache, limits=httpx.Limits(), local_address="0.0.0.0", network_backend=backend
+    )
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.get("http://aqniet.site/api")
+
+    assert response.json() == {}
+    assert dns_cache.lookups == ["aqniet.site"]
+    assert backend.attempts == ["10.0.0.1"]
+    assert backend.local_addresses == ["0.0.0.0"]
+
+
+@pytest.mark.asyncio
+async def test_http_client_uses_shared_pool():
+    """При открытом пуле HTTPClient использует общий клиент и не закрывает его"""
+    shared = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={})))
+    upstream_pool.client = shared
+    try:
+        async with HTTPClient() as client:
+            assert client._client is shared
+        assert not shared.is_closed
+    finally:
+        upstream_pool.client = None
+        await shared.aclose()
+
+
+@pytest.mark.asyncio
+async def test_ready_gated_until_warm_up(monkeypatch):
+    """/ready отвечает 503 до завершения прогрева и 200 после"""
+    monkeypatch.setattr(get_settings(), "upstream_prewarm_connections", 0)
+    app.state.ready = False
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming_up"
+
+        await warm_up_upstreams(app)
+
+        response = await client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"